@@ -2,36 +2,48 @@ from pathlib import Path
 import json
 from datetime import datetime
 from dotenv import load_dotenv
-from src.document_processor import DocumentProcessor
-from src.rag_chain import RAGChain
-from src.utils import load_config, ensure_directory
+from src.knowledge_base import KnowledgeBase
+from src.context_packer import get_token_counter
+from src.history import Message, get_summarizer
+from src.session_store import SessionJournal, list_sessions
+from src.rag_chain import RAGChain, split_reasoning
+from src.router import get_router
+from src.search import get_web_searcher
+from src.utils import load_config
 
 load_dotenv()
 
+# Memory a journal keeps per message (its byte offset in a list)
+JOURNAL_BYTES_PER_MESSAGE = 36
+
 
 class ChatSession:
-    def __init__(self, config_path: str | Path = "./config.yaml"):
+    def __init__(
+        self,
+        config_path: str | Path = "./config.yaml",
+        knowledge_base: KnowledgeBase | None = None,
+        session_id: str | None = None,
+    ):
         self.config = load_config(config_path)
-        self.processor = self._initialize_processor()
-        self.vectorstore = self._initialize_vectorstore()
+        # The index is shared when provided (e.g. by the server); a session only
+        # owns its conversation state.
+        self.knowledge_base = knowledge_base or KnowledgeBase.from_config(self.config)
+        self.processor = self.knowledge_base.processor
+        self.vectorstore = self.knowledge_base.vectorstore
         self.chain = self._initialize_chain()
         self.session_start = datetime.now()
-        self.session_id = self.session_start.strftime("%Y%m%d_%H%M%S")
+        self.session_id = session_id or self.session_start.strftime("%Y%m%d_%H%M%S")
+        # Every message is journaled as it is added; the file only appears
+        # once the session has a message
+        self.history_dir = Path(self.config.get("history_dir", "./chat_history"))
+        self.journal = self._open_journal(self.session_id, self.session_start)
+        # Picking up a session that was saved earlier (e.g. a reconnect)
+        self.resumed = self.journal.exists
+        if self.resumed:
+            self._restore(self.journal)
+        self.chain.chat_context.journal = self.journal
         print("[DEBUG] Chat session initialized with ID:", self.session_id)
 
-    def _initialize_processor(self) -> DocumentProcessor:
-        print("[DEBUG] Initializing document processor...")
-        return DocumentProcessor()
-
-    def _initialize_vectorstore(self):
-        print("[DEBUG] Loading documents from:", self.config["codebase_path"])
-        docs = self.processor.load_directory(self.config["codebase_path"])
-        print(f"[DEBUG] Loaded {len(docs)} documents")
-
-        # No more splits needed - docs are already processed
-        persist_dir = ensure_directory(self.config["persist_directory"])
-        return self.processor.create_vectorstore(docs, persist_dir)
-
     def _initialize_chain(self):
         print("[DEBUG] Initializing RAG chain...")
         return RAGChain(
@@ -44,81 +56,201 @@ class ChatSession:
             project_description=self.config.get(
                 "project_description", "No project description provided."
             ),
+            prefetch_web=self.config.get("prefetch_web_search", False),
+            symbol_store=self.knowledge_base.symbol_store,
+            k_symbols=self.config.get("k_symbols", 8),
+            context_window=self.config.get("context_window", 8192),
+            reserve_tokens=self.config.get("response_token_reserve", 1024),
+            context_shares=self.config.get("context_shares"),
+            token_counter=get_token_counter(self.config.get("tokenizer")),
+            answer_cache=self.knowledge_base.answer_cache,
+            web_searcher=get_web_searcher(
+                self.config.get("web_cache_dir"),
+                ttl_hours=self.config.get("web_cache_ttl_hours", 24),
+                max_cache_mb=self.config.get("web_cache_max_mb", 32),
+                timeout=self.config.get("web_search_timeout", 10.0),
+                hedge_after=self.config.get("web_search_hedge_after", 2.0),
+                max_attempts=self.config.get("web_search_max_attempts", 3),
+            ),
+            web_research=self.config.get("web_research", False),
+            web_max_queries=self.config.get("web_max_queries", 4),
+            web_concurrency=self.config.get("web_concurrency", 3),
+            web_deadline=self.config.get("web_deadline_seconds", 8.0),
+            keep_alive=self.config.get("keep_alive", "30m"),
+            router=get_router(
+                self.config.get("router", "keywords"),
+                model=self.config.get("router_model"),
+                keep_alive=self.config.get("keep_alive", "30m"),
+                embedding_model=self.config.get("embedding_model", "nomic-embed-text"),
+                cache_dir=(
+                    self.config.get("embedding_cache_dir", "./data/embedding_cache")
+                    if self.config.get("cache_embeddings", False)
+                    else None
+                ),
+                max_cache_mb=self.config.get("embedding_cache_max_mb", 512),
+                examples_path=self.config.get("router_examples"),
+            ),
+            history_tokens=self.config.get("history_tokens"),
+            summarizer=get_summarizer(
+                self.config.get("summary_model"),
+                keep_alive=self.config.get("keep_alive", "30m"),
+                max_tokens=self.config.get("summary_tokens", 256),
+            ),
+            summary_tokens=self.config.get("summary_tokens", 256),
         )
 
     def refresh_context(self):
         """Refresh the vectorstore with latest changes from codebase"""
         print("[DEBUG] Refreshing vectorstore...")
-        self.processor.refresh_vectorstore(
-            self.config["codebase_path"], self.vectorstore
-        )
+        self.knowledge_base.refresh()
         print("\nVectorstore refreshed with latest changes")
 
+    def _open_journal(
+        self, session_id: str, start_time: datetime | None = None
+    ) -> SessionJournal:
+        return SessionJournal(
+            self.history_dir,
+            session_id,
+            start_time=start_time,
+            model_name=self.config["model_name"],
+            sync_every=self.config.get("journal_sync_every", 8),
+            sync_interval=self.config.get("journal_sync_interval_seconds", 1.0),
+        )
+
+    def transcript(self, start: int = 0, count: int | None = None) -> list[Message]:
+        """Messages of the session from the journal, including summarised ones."""
+        return self.journal.page(start, len(self.journal) if count is None else count)
+
+    def clear_context(self):
+        self.chain.chat_context.clear()
+
     def save_session(self):
-        """Save the current chat session history with ISO format timestamps"""
-        history_dir = ensure_directory("./chat_history")
-        history_file = history_dir / f"session_{self.session_id}.json"
-
-        messages = self.chain.chat_context.messages
-        print(f"[DEBUG] Saving {len(messages)} messages to session history")
-
-        session_data = {
-            "session_id": self.session_id,
-            "start_time": self.session_start.isoformat(),
-            "end_time": datetime.now().isoformat(),
-            "model_name": self.config["model_name"],
-            "messages": [
-                {
-                    "role": msg.role,
-                    "content": msg.content,
-                    "timestamp": msg.timestamp.isoformat(),  # Save in ISO format
-                }
-                for msg in messages
-            ],
-        }
-
-        with open(history_file, "w") as f:
-            json.dump(session_data, f, indent=2)
-
-        print(f"\nChat history saved to {history_file}")
+        """Make the session journal durable and compact it if worthwhile"""
+        if not self.journal.exists:
+            print("\nNothing to save yet")
+            return
+        compacted = self.journal.snapshot()
+        print(f"[DEBUG] Journal holds {len(self.journal)} messages, compacted: {compacted}")
+        print(f"\nChat history saved to {self.journal.path}")
 
     def load_session(self, session_id: str) -> bool:
-        """Load a previous chat session preserving original timestamps"""
-        history_file = Path("./chat_history") / f"session_{session_id}.json"
-        if not history_file.exists():
+        """Continue a previous chat session from its journal"""
+        if session_id == self.session_id:
+            return True
+        try:
+            journal = self._open_journal(session_id)
+        except ValueError:
+            print(f"\nInvalid session ID: {session_id}")
+            return False
+        if not journal.exists and not self._import_legacy_session(journal):
             print(f"\nSession {session_id} not found")
             return False
 
-        print(f"[DEBUG] Loading session from {history_file}")
+        print(f"[DEBUG] Loading session from {journal.path}")
+        self.journal.close()
+        self._restore(journal)
+        print(f"\nLoaded chat history from session {session_id}")
+        return True
+
+    def estimated_bytes(self) -> int:
+        """Rough size of the state this session owns; the index and model
+        clients are shared and not counted"""
+        chat_context = self.chain.chat_context
+        text = sum(
+            len(msg.content) + len(msg.reasoning or "") for msg in chat_context.messages
+        )
+        return (
+            self.config.get("session_overhead_kb", 256) * 1024
+            + text
+            + len(chat_context.get_summary())
+            + JOURNAL_BYTES_PER_MESSAGE * len(self.journal)
+        )
+
+    def close(self):
+        """Persist the session and release its journal"""
+        try:
+            # Let a summary still being written reach the journal
+            self.chain.chat_context.wait(timeout=30)
+        except Exception as e:
+            print(f"[DEBUG] Closing before the history summary finished: {e}")
+        if self.journal.exists:
+            self.journal.snapshot()
+        self.journal.close()
+
+    def list_sessions(self) -> list[dict]:
+        return list_sessions(self.history_dir)
+
+    def _restore(self, journal: SessionJournal):
+        """Continue ``journal``, reading only its recent tail into the prompt"""
+        self.journal = journal
+        self.session_id = journal.session_id
+        self.session_start = journal.start_time
+        chat_context = self.chain.chat_context
+        chat_context.restore(journal.tail(chat_context.max_messages), journal.summary)
+        chat_context.journal = journal
+        print(f"[DEBUG] Restored {len(chat_context.messages)} of {len(journal)} messages")
+
+    def _import_legacy_session(self, journal: SessionJournal) -> bool:
+        """Convert a session saved as a single JSON file into a journal"""
+        history_file = self.history_dir / f"session_{journal.session_id}.json"
+        if not history_file.exists():
+            return False
         with open(history_file, "r") as f:
             session_data = json.load(f)
-
-        # Clear existing context and load historical messages
-        self.chain.chat_context.messages.clear()
+        journal.start_time = datetime.fromisoformat(session_data["start_time"])
+        journal.model_name = session_data.get("model_name")
         for msg in session_data["messages"]:
-            # Parse the ISO format timestamp and preserve it
-            timestamp = datetime.fromisoformat(msg["timestamp"])
-            self.chain.chat_context.add_message(
-                msg["role"],
-                msg["content"],
-                timestamp=timestamp,  # Pass the original timestamp
+            # Older sessions saved <think> blocks inside the answer
+            reasoning, content = split_reasoning(msg["content"])
+            journal.append(
+                Message(
+                    msg["role"],
+                    content,
+                    timestamp=datetime.fromisoformat(msg["timestamp"]),
+                    reasoning=msg.get("reasoning") or reasoning or None,
+                )
             )
-
-        print(f"[DEBUG] Loaded {len(session_data['messages'])} messages")
-        print(f"\nLoaded chat history from session {session_id}")
+        journal.sync()
         return True
 
     def debug_context(self) -> str:
         """Return debug information about current context"""
-        messages = self.chain.chat_context.messages
+        chat_context = self.chain.chat_context
+        messages = chat_context.messages
         debug_info = [
             "\n=== Chat Context Debug Info ===",
             f"Current session ID: {self.session_id}",
             f"Session start time: {self.session_start}",
-            f"Messages in context: {len(messages)}",
-            "\nMessage Timeline:",
+            f"Messages in context: {len(messages)} "
+            f"({chat_context.tokens}/{chat_context.max_tokens} tokens)",
+            f"Summarised messages: {chat_context.evicted}",
+            f"Pinned files: {', '.join(self.chain.pinned) or 'none'}",
         ]
 
+        cache_stats = self.knowledge_base.embedding_cache_stats()
+        if cache_stats:
+            debug_info.append(
+                f"Embedding cache: {cache_stats['hits']} hits, "
+                f"{cache_stats['misses']} misses, {cache_stats['entries']} vectors"
+            )
+        content_stats = self.knowledge_base.content_store.stats()
+        debug_info.append(
+            f"File contents: {content_stats['files']} files, "
+            f"{content_stats['cached_files']} cached "
+            f"({content_stats['cached_bytes'] // 1024} KB)"
+        )
+        answer_cache = self.knowledge_base.answer_cache
+        if answer_cache is not None:
+            answer_stats = answer_cache.stats()
+            debug_info.append(
+                f"Answer cache: {answer_stats['hits']} hits, "
+                f"{answer_stats['misses']} misses, {answer_stats['entries']} answers"
+            )
+        summary = chat_context.get_summary()
+        if summary:
+            debug_info.append(f"\nSummary of earlier conversation:\n{summary}")
+        debug_info.append("\nMessage Timeline:")
+
         for i, msg in enumerate(messages, 1):
             debug_info.append(
                 f"\n{i}. [{msg.timestamp}] {msg.role}:"
@@ -135,8 +267,11 @@ def display_help():
     print("  /help     - Show this help message")
     print("  /refresh  - Refresh the vectorstore with latest changes")
     print("  /save     - Save current chat session")
+    print("  /sessions - List saved chat sessions")
     print("  /load ID  - Load a previous chat session by ID")
     print("  /clear    - Clear current chat context")
+    print("  /pin PATH - Keep a file in every prompt of this session")
+    print("  /unpin PATH - Stop pinning a file")
     print("  /debug    - Show debug information about current context")
     print("  /quit     - Exit the program")
 
@@ -164,11 +299,25 @@ def main():
                     session.refresh_context()
                 elif command == "/save":
                     session.save_session()
+                elif command == "/sessions":
+                    for info in session.list_sessions():
+                        print(
+                            f"  {info['session_id']}  started {info['start_time']}"
+                            f"  last active {info['updated']}"
+                        )
                 elif command == "/load" and len(parts) > 1:
                     session.load_session(parts[1])
                 elif command == "/clear":
-                    session.chain.chat_context.messages.clear()
+                    session.clear_context()
                     print("\nChat context cleared")
+                elif command == "/pin" and len(parts) > 1:
+                    if session.chain.pin(parts[1]):
+                        print(f"\nPinned {parts[1]}")
+                    else:
+                        print(f"\nNo indexed file at {parts[1]}")
+                elif command == "/unpin" and len(parts) > 1:
+                    session.chain.unpin(parts[1])
+                    print(f"\nUnpinned {parts[1]}")
                 elif command == "/debug":
                     print(session.debug_context())
                 else:
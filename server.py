@@ -1,7 +1,10 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, WebSocket
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse
 import json
+import os
 from datetime import datetime
 from pathlib import Path
 import uvicorn
@@ -19,41 +22,145 @@ logger.info(f"Added project root to path: {PROJECT_ROOT}")
 
 try:
     from main import ChatSession
+    from src.knowledge_base import KnowledgeBase
+    from src.session_manager import SessionLimitError, SessionManager
+    from src.session_store import encode_page
+    from src.scheduler import InferenceScheduler, QueueFullError
+    from src.utils import load_config
 
     logger.info("Successfully imported ChatSession")
 except ImportError as e:
     logger.error(f"Failed to import ChatSession: {e}")
     raise
 
-app = FastAPI()
+CONFIG_PATH = Path(__file__).parent / "config.yaml"
+
+# Codebase index shared by every connection, built once at startup
+knowledge_base: KnowledgeBase | None = None
+
+# Bounds concurrent requests to Ollama and queues the rest fairly
+scheduler: InferenceScheduler | None = None
+
+# Live chat sessions (conversation state only; the index is shared), evicted
+# when idle or over the configured caps and rehydrated from their journals
+sessions: SessionManager | None = None
+
+
+def create_session(session_id: str) -> ChatSession:
+    return ChatSession(CONFIG_PATH, knowledge_base=knowledge_base, session_id=session_id)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global knowledge_base, scheduler, sessions
+    config = load_config(CONFIG_PATH)
+    scheduler = InferenceScheduler(
+        max_concurrent=config.get("max_concurrent_requests", 1),
+        max_queue=config.get("max_queued_requests", 16),
+        max_queue_per_session=config.get("max_queued_per_session", 4),
+    )
+    sessions = SessionManager(
+        create_session,
+        max_sessions=config.get("max_live_sessions", 32),
+        max_bytes=config.get("max_session_memory_mb", 256) * 1024 * 1024,
+        idle_ttl=config.get("session_idle_ttl_minutes", 30) * 60,
+    )
+    logger.info("Building shared knowledge base...")
+    knowledge_base = KnowledgeBase.from_config(config)
+    logger.info("Knowledge base ready")
+    sweeper = asyncio.create_task(
+        sessions.run(config.get("session_sweep_seconds", 60))
+    )
+    yield
+    sweeper.cancel()
+    # Persist every live session before exiting
+    await sessions.close_all()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Mount static files
 app.mount(
     "/static", StaticFiles(directory=Path(__file__).parent / "static"), name="static"
 )
 
-# Store active chat sessions
-chat_sessions = {}
-
-
 @app.get("/")
 async def get_html():
     return HTMLResponse((Path(__file__).parent / "static" / "index.html").read_text())
 
 
+@app.get("/stats")
+async def get_stats():
+    """Gauges for live sessions, the inference queue and process memory."""
+    return {
+        "sessions": sessions.stats(),
+        "scheduler": scheduler.stats(),
+        "rss_bytes": _rss_bytes(),
+    }
+
+
+def _rss_bytes() -> int | None:
+    """Current resident set size, where the platform exposes it."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def session_info(chat_session: ChatSession) -> dict:
+    return {
+        "session_id": chat_session.session_id,
+        "start_time": chat_session.session_start.isoformat(),
+        "model_name": chat_session.config["model_name"],
+        "total": len(chat_session.journal),
+    }
+
+
+def history_page(
+    chat_session: ChatSession, before: int | None = None, limit: int | None = None
+) -> dict:
+    """The journaled messages just before index ``before`` (default: the end).
+
+    Pages carry their start index and the session's message count so the
+    client knows what to ask for next; large pages are sent deflated.
+    """
+    total = len(chat_session.journal)
+    end = total if before is None else min(max(int(before), 0), total)
+    page_size = chat_session.config.get("history_page_size", 50)
+    limit = min(int(limit or page_size), page_size)
+    start = max(end - limit, 0)
+    return {
+        "type": "history_page",
+        "start": start,
+        "total": total,
+        **encode_page(
+            chat_session.transcript(start, end - start),
+            chat_session.config.get("history_compress_min_bytes", 1024),
+        ),
+        "timestamp": datetime.now().isoformat(),
+    }
+
+
 async def handle_command(
     websocket: WebSocket, command: str, chat_session: ChatSession, data: dict = None
 ):
     """Handle different command types."""
     try:
         if command == "help":
-            help_text = """Available commands:\n
-            /refresh  - Refresh the context with latest changes\n
-            /save    - Save current chat session\n
-            /load    - Load a previous chat session\n
-            /debug   - Show debug information
-            /toggle_rag - Toggle between RAG and conversation-only modes
-            """
+            help_text = "\n".join(
+                [
+                    "Available commands:",
+                    "  /help       - Show this help message",
+                    "  /refresh    - Refresh the context with latest changes",
+                    "  /save       - Save current chat session",
+                    "  /sessions   - List saved chat sessions",
+                    "  /load ID    - Load a saved chat session by ID",
+                    "  /history    - Show earlier messages, a page at a time",
+                    "  /debug      - Show debug information about current context",
+                    "  /toggle_rag - Toggle between RAG and conversation-only modes",
+                ]
+            )
             await websocket.send_json(
                 {
                     "type": "system",
@@ -63,7 +170,8 @@ async def handle_command(
             )
 
         elif command == "refresh":
-            chat_session.refresh_context()
+            # Re-indexing is slow and synchronous, keep it off the event loop
+            await asyncio.to_thread(chat_session.refresh_context)
             await websocket.send_json(
                 {
                     "type": "system",
@@ -73,7 +181,7 @@ async def handle_command(
             )
 
         elif command == "save":
-            chat_session.save_session()
+            await asyncio.to_thread(chat_session.save_session)
             await websocket.send_json(
                 {
                     "type": "system",
@@ -82,83 +190,76 @@ async def handle_command(
                 }
             )
 
+        elif command == "sessions":
+            saved = await asyncio.to_thread(chat_session.list_sessions)
+            await websocket.send_json(
+                {
+                    "type": "session_list",
+                    "sessions": saved,
+                    "current": chat_session.session_id,
+                    "timestamp": datetime.now().isoformat(),
+                }
+            )
+
         elif command == "load":
-            if not data:
+            target = (data or {}).get("session_id")
+            if not target:
                 await websocket.send_json(
                     {
                         "type": "error",
-                        "content": "No session data provided",
+                        "content": "No session ID provided",
                         "timestamp": datetime.now().isoformat(),
                     }
                 )
                 return
-
-            try:
-                logger.info(f"Loading session data: {data}")
-
-                # Extract messages from the session data
-                messages_to_load = data.get("messages", [])
-                logger.info(f"Found {len(messages_to_load)} messages to load")
-
-                # Clear existing messages
-                chat_session.chain.chat_context.messages.clear()
-
-                # Load messages from provided session data
-                for msg in messages_to_load:
-                    try:
-                        timestamp = datetime.fromisoformat(msg["timestamp"])
-                        chat_session.chain.chat_context.add_message(
-                            msg["role"], msg["content"], timestamp=timestamp
-                        )
-                        logger.info(f"Loaded message: {msg['role']} at {timestamp}")
-                    except Exception as e:
-                        logger.error(f"Error loading individual message: {str(e)}")
-
-                # Get all loaded messages
-                loaded_messages = [
-                    {
-                        "role": msg.role,
-                        "content": msg.content,
-                        "timestamp": msg.timestamp.isoformat(),
-                    }
-                    for msg in chat_session.chain.chat_context.messages
-                ]
-
-                logger.info(f"Sending {len(loaded_messages)} messages back to client")
-
-                # First send confirmation
-                await websocket.send_json(
-                    {
-                        "type": "system",
-                        "content": f"Successfully loaded {len(loaded_messages)} messages from session {data.get('session_id')}",
-                        "timestamp": datetime.now().isoformat(),
-                    }
-                )
-
-                # Then send the session data
+            # The target is reserved until this connection has switched to it,
+            # and an idle copy is persisted and dropped first, so only one
+            # live session ever writes to its journal
+            if target != chat_session.session_id and not await sessions.reserve(target):
                 await websocket.send_json(
                     {
-                        "type": "session_loaded",
-                        "messages": loaded_messages,
-                        "session_info": {
-                            "session_id": data.get("session_id"),
-                            "start_time": data.get("start_time"),
-                            "model_name": data.get("model_name"),
-                        },
+                        "type": "error",
+                        "content": f"Session {target} is open in another window",
                         "timestamp": datetime.now().isoformat(),
                     }
                 )
+                return
 
-            except Exception as e:
-                error_msg = f"Error loading session: {str(e)}"
-                logger.error(error_msg)
+            logger.info(f"Restoring session {target} from the server's history")
+            try:
+                loaded = await asyncio.to_thread(chat_session.load_session, target)
+                if loaded:
+                    sessions.rekey(chat_session, target)
+            finally:
+                sessions.unreserve(target)
+            if not loaded:
                 await websocket.send_json(
                     {
                         "type": "error",
-                        "content": error_msg,
+                        "content": f"Session {target} not found",
                         "timestamp": datetime.now().isoformat(),
                     }
                 )
+                return
+
+            # Only the latest page is sent; older pages are fetched on scroll
+            page = await asyncio.to_thread(history_page, chat_session)
+            await websocket.send_json(
+                {
+                    **page,
+                    "type": "session_loaded",
+                    "session_info": session_info(chat_session),
+                }
+            )
+
+        elif command == "history":
+            page = await asyncio.to_thread(
+                history_page,
+                chat_session,
+                (data or {}).get("before"),
+                (data or {}).get("limit"),
+            )
+            await websocket.send_json(page)
 
         elif command == "debug":
             debug_info = chat_session.debug_context()
@@ -200,38 +301,94 @@ async def handle_command(
         )
 
 
+async def process_message(
+    websocket: WebSocket, session_id: str, chat_session: ChatSession, content: str
+):
+    """Generate a response through the scheduler and stream it to the client."""
+
+    async def report_position(position: int):
+        await websocket.send_json(
+            {
+                "type": "queued",
+                "position": position,
+                "content": f"Waiting for the model (position {position} in queue)",
+                "timestamp": datetime.now().isoformat(),
+            }
+        )
+
+    event: dict = {}
+    try:
+        logger.info(f"Processing message: {content}")
+        async with scheduler.slot(session_id, on_position=report_position):
+            # Relay delta/reset/status frames as tokens arrive, finishing
+            # with a done frame carrying the full text
+            async for event in chat_session.chain.astream_response(content):
+                event["timestamp"] = datetime.now().isoformat()
+                await websocket.send_json(event)
+
+        logger.info(f"Response streamed to client: {event.get('stats')}")
+    except QueueFullError as e:
+        logger.warning(f"Rejected message for session {session_id}: {e}")
+        await websocket.send_json(
+            {
+                "type": "error",
+                "content": str(e),
+                "timestamp": datetime.now().isoformat(),
+            }
+        )
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing message: {str(e)}")
+        await websocket.send_json(
+            {
+                "type": "error",
+                "content": f"Error processing message: {str(e)}",
+                "timestamp": datetime.now().isoformat(),
+            }
+        )
+
+
 @app.websocket("/ws/{session_id}")
 async def websocket_endpoint(websocket: WebSocket, session_id: str):
     logger.info(f"New WebSocket connection request for session {session_id}")
     await websocket.accept()
     logger.info(f"WebSocket connection accepted for session {session_id}")
 
-    # Initialize chat session if it doesn't exist
-    if session_id not in chat_sessions:
-        logger.info(f"Creating new ChatSession for {session_id}")
-        try:
-            chat_sessions[session_id] = ChatSession()
-            logger.info("ChatSession created successfully")
-            
-            # Send combined initial status
-            await websocket.send_json({
-                "type": "init",
-                "rag_enabled": chat_sessions[session_id].chain.get_rag_status(),
-                "content": "Connected to server. Ready to chat!",
-                "timestamp": datetime.now().isoformat(),
-            })
-            
-        except Exception as e:
-            logger.error(f"Error creating ChatSession: {str(e)}")
-            await websocket.send_json({
-                "type": "error",
-                "content": f"Failed to create chat session: {str(e)}",
-                "timestamp": datetime.now().isoformat(),
-            })
-            await websocket.close()
-            return
-
-    chat_session = chat_sessions[session_id]
+    # Reuse the live session, or create one; a session saved under this ID
+    # earlier (e.g. before it was evicted) is picked up from its journal
+    try:
+        chat_session = await sessions.acquire(session_id)
+        logger.info(f"Session {session_id} ready: {sessions.stats()}")
+    except Exception as e:
+        logger.error(f"Error creating ChatSession: {str(e)}")
+        await websocket.send_json({
+            "type": "error",
+            "content": (
+                str(e)
+                if isinstance(e, SessionLimitError)
+                else f"Failed to create chat session: {str(e)}"
+            ),
+            "timestamp": datetime.now().isoformat(),
+        })
+        await websocket.close()
+        return
+
+    # Send combined initial status, with the latest history page when resuming
+    page = await asyncio.to_thread(history_page, chat_session)
+    await websocket.send_json({
+        **page,
+        "type": "init",
+        "rag_enabled": chat_session.chain.get_rag_status(),
+        "session_info": session_info(chat_session),
+        "content": (
+            f"Resumed session {session_id}."
+            if page["total"]
+            else "Connected to server. Ready to chat!"
+        ),
+    })
+
+    pending_tasks: set[asyncio.Task] = set()
 
     try:
         while True:
@@ -243,31 +400,30 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
                 data = json.loads(message)
                 logger.info(f"Parsed message data: {data}")
 
+                sessions.touch(chat_session)
                 if data["type"] == "message":
-                    try:
-                        logger.info(f"Processing message: {data['content']}")
-                        response = chat_session.chain(data["content"])
-                        logger.info(
-                            f"Got response from model: {response[:100]}..."
-                        )  # Log first 100 chars
-
-                        await websocket.send_json(
-                            {
-                                "type": "response",
-                                "content": response,
-                                "timestamp": datetime.now().isoformat(),
-                            }
-                        )
-                        logger.info("Response sent back to client")
-                    except Exception as e:
-                        logger.error(f"Error processing message: {str(e)}")
-                        await websocket.send_json(
-                            {
-                                "type": "error",
-                                "content": f"Error processing message: {str(e)}",
-                                "timestamp": datetime.now().isoformat(),
-                            }
+                    # Run generation as a task so this connection keeps
+                    # serving commands while its request waits or streams
+                    task = asyncio.create_task(
+                        process_message(
+                            websocket,
+                            chat_session.session_id,
+                            chat_session,
+                            data["content"],
                         )
+                    )
+                    pending_tasks.add(task)
+                    task.add_done_callback(pending_tasks.discard)
+
+                elif data["type"] == "command" and data["command"] == "load" and pending_tasks:
+                    # Answers still being generated belong to the current session
+                    await websocket.send_json(
+                        {
+                            "type": "error",
+                            "content": "Wait for the current answer before loading a session",
+                            "timestamp": datetime.now().isoformat(),
+                        }
+                    )
 
                 elif data["type"] == "command":
                     logger.info(f"Processing command: {data['command']}")
@@ -288,9 +444,12 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
 
     except Exception as e:
         logger.error(f"WebSocket error: {str(e)}")
-        # Clean up session on error
-        if session_id in chat_sessions:
-            del chat_sessions[session_id]
+    finally:
+        # Give up queued or in-flight generations for a closed socket; the
+        # session stays live until it idles out, so a reconnect resumes it
+        for task in pending_tasks:
+            task.cancel()
+        sessions.release(chat_session)
 
 
 if __name__ == "__main__":
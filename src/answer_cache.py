@@ -0,0 +1,243 @@
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    answer: str
+    similarity: float
+    sources: dict[str, str]  # relative path -> content hash the answer was based on
+
+
+class AnswerCache:
+    """
+    Answers to earlier questions, looked up by embedding similarity.
+
+    An entry records the question's embedding, the answer, and the content
+    hash of every file that was in the prompt. A new question whose embedding
+    is at least ``threshold`` cosine-similar to a stored one gets the stored
+    answer, as long as none of those files have changed since; entries for
+    changed files are dropped. Entries live in SQLite and are evicted after
+    ``ttl_seconds`` or least-recently-used beyond ``max_entries``.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str | Path,
+        embeddings: Embeddings,
+        threshold: float = 0.95,
+        max_entries: int = 1000,
+        ttl_seconds: float = 7 * 24 * 3600,
+    ):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        cache_dir = Path(cache_dir)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(cache_dir / "answers.sqlite3", check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS answers (
+                id INTEGER PRIMARY KEY,
+                scope TEXT NOT NULL,
+                question TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                sources TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+        self._expire()
+
+        # Normalised question vectors are kept in memory for the similarity scan
+        self._ids: list[int] = []
+        self._scopes: list[str] = []
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._load_vectors()
+
+    def embed(self, question: str) -> list[float]:
+        return self.embeddings.embed_query(question)
+
+    def lookup(
+        self,
+        question: str,
+        scope: str,
+        current_hash: Callable[[str], Optional[str]],
+        vector: Optional[list[float]] = None,
+    ) -> Optional[CachedAnswer]:
+        """Best cached answer for a similar question in the same scope.
+
+        ``scope`` separates answers that are not interchangeable (e.g. per
+        model or RAG mode); ``current_hash`` returns a file's current content
+        hash and is used to reject answers built from outdated code.
+        """
+        query = _normalise(vector if vector is not None else self.embed(question))
+        with self._lock:
+            if not self._ids or self._vectors.shape[1] != query.shape[0]:
+                self.misses += 1
+                return None
+            similarities = self._vectors @ query
+            order = np.argsort(-similarities)
+            candidates = [
+                (self._ids[index], float(similarities[index]))
+                for index in order
+                if similarities[index] >= self.threshold
+                and self._scopes[index] == scope
+            ]
+
+            stale = []
+            found = None
+            for entry_id, similarity in candidates:
+                row = self._conn.execute(
+                    "SELECT question, answer, sources, created FROM answers WHERE id = ?",
+                    (entry_id,),
+                ).fetchone()
+                if row is None:
+                    continue
+                cached_question, answer, sources, created = row
+                sources = json.loads(sources)
+                if time.time() - created > self.ttl_seconds or any(
+                    current_hash(path) != content_hash
+                    for path, content_hash in sources.items()
+                ):
+                    stale.append(entry_id)
+                    continue
+                found = CachedAnswer(cached_question, answer, similarity, sources)
+                self._conn.execute(
+                    "UPDATE answers SET last_used = ? WHERE id = ?",
+                    (time.time(), entry_id),
+                )
+                break
+
+            self._delete(stale)
+            self._conn.commit()
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return found
+
+    def store(
+        self,
+        question: str,
+        answer: str,
+        scope: str,
+        sources: dict[str, str],
+        vector: Optional[list[float]] = None,
+    ) -> None:
+        """Remember an answer and the file versions it was based on."""
+        query = _normalise(vector if vector is not None else self.embed(question))
+        now = time.time()
+        with self._lock:
+            if self._vectors.size and self._vectors.shape[1] != query.shape[0]:
+                return  # embedding model changed under us
+            cursor = self._conn.execute(
+                "INSERT INTO answers "
+                "(scope, question, vector, sources, answer, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (scope, question, query.tobytes(), json.dumps(sources), answer, now, now),
+            )
+            self._ids.append(cursor.lastrowid)
+            self._scopes.append(scope)
+            self._vectors = (
+                np.vstack([self._vectors, query]) if self._vectors.size else query[None, :]
+            )
+            self._evict()
+            self._conn.commit()
+
+    def prune(self, current_hash: Callable[[str], Optional[str]]) -> int:
+        """Drop expired answers and answers based on files that have changed."""
+        with self._lock:
+            self._expire()
+            stale = [
+                entry_id
+                for entry_id, sources in self._conn.execute("SELECT id, sources FROM answers")
+                if any(
+                    current_hash(path) != content_hash
+                    for path, content_hash in json.loads(sources).items()
+                )
+            ]
+            self._delete(stale)
+            self._conn.commit()
+            self._load_vectors()
+            return len(stale)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._ids),
+            }
+
+    def _load_vectors(self) -> None:
+        rows = self._conn.execute(
+            "SELECT id, scope, vector FROM answers ORDER BY id"
+        ).fetchall()
+        self._ids = [row[0] for row in rows]
+        self._scopes = [row[1] for row in rows]
+        vectors = [np.frombuffer(row[2], dtype=np.float32) for row in rows]
+        if vectors and len({len(v) for v in vectors}) == 1:
+            self._vectors = np.vstack(vectors)
+        else:
+            # Empty, or mixed dimensions from an old model: start over
+            if vectors:
+                self._conn.execute("DELETE FROM answers")
+                self._conn.commit()
+                self._ids, self._scopes = [], []
+            self._vectors = np.zeros((0, 0), dtype=np.float32)
+
+    def _expire(self) -> None:
+        self._conn.execute(
+            "DELETE FROM answers WHERE created < ?", (time.time() - self.ttl_seconds,)
+        )
+
+    def _evict(self) -> None:
+        """Drop least-recently-used answers beyond ``max_entries``."""
+        excess = len(self._ids) - self.max_entries
+        if excess > 0:
+            doomed = [
+                row[0]
+                for row in self._conn.execute(
+                    "SELECT id FROM answers ORDER BY last_used LIMIT ?", (excess,)
+                )
+            ]
+            self._delete(doomed)
+
+    def _delete(self, entry_ids: list[int]) -> None:
+        if not entry_ids:
+            return
+        self._conn.executemany(
+            "DELETE FROM answers WHERE id = ?", [(entry_id,) for entry_id in entry_ids]
+        )
+        doomed = set(entry_ids)
+        keep = [i for i, entry_id in enumerate(self._ids) if entry_id not in doomed]
+        self._ids = [self._ids[i] for i in keep]
+        self._scopes = [self._scopes[i] for i in keep]
+        self._vectors = self._vectors[keep] if keep else np.zeros((0, 0), dtype=np.float32)
+
+
+def _normalise(vector: list[float]) -> np.ndarray:
+    query = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(query)
+    return query / norm if norm else query
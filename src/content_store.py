@@ -0,0 +1,164 @@
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+# Files at least this large are read through a memory map
+MMAP_THRESHOLD = 1024 * 1024
+
+
+def read_text(path: Path) -> str:
+    """Read a UTF-8 text file, memory-mapping large ones."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < MMAP_THRESHOLD:
+            return f.read().decode("utf-8", errors="replace")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            # Decode straight from the mapping; slicing it would copy the file
+            return str(mapped, "utf-8", "replace")
+
+
+@dataclass
+class _Entry:
+    path: Path
+    content_hash: str
+    mtime_ns: int
+    size: int
+
+
+class ContentStore:
+    """Full text of indexed files, keyed by repo-relative path.
+
+    Only each file's location, hash and stat signature are kept for the life
+    of the process. Text is read from disk on demand and the most recently
+    used files are cached up to ``max_bytes``. Every lookup re-checks the
+    file's mtime and size, so edits made since indexing are never served from
+    a stale cache entry.
+    """
+
+    def __init__(
+        self,
+        reader: Callable[[Path], str] = read_text,
+        max_bytes: int = 64 * 1024 * 1024,
+    ):
+        self.reader = reader
+        self.max_bytes = max_bytes
+        self._entries: dict[str, _Entry] = {}
+        self._cache: OrderedDict[str, tuple[int, int, str]] = OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, relative_path: str) -> bool:
+        return relative_path in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def paths(self) -> list[str]:
+        return list(self._entries)
+
+    def add(
+        self,
+        relative_path: str,
+        path: Path,
+        content_hash: str,
+        mtime_ns: int,
+        size: int,
+        content: Optional[str] = None,
+    ) -> None:
+        """Register a file, optionally caching text that was just read."""
+        with self._lock:
+            self._entries[relative_path] = _Entry(path, content_hash, mtime_ns, size)
+            self._drop(relative_path)
+            if content is not None:
+                self._remember(relative_path, mtime_ns, size, content)
+
+    def remove(self, relative_paths: Iterable[str]) -> None:
+        with self._lock:
+            for relative_path in relative_paths:
+                self._entries.pop(relative_path, None)
+                self._drop(relative_path)
+
+    def content_hash(self, relative_path: str) -> Optional[str]:
+        """Hash of the file as it was indexed."""
+        entry = self._entries.get(relative_path)
+        return entry.content_hash if entry else None
+
+    def current_hash(self, relative_path: str) -> Optional[str]:
+        """Hash of the file as it is on disk, if that is still the version indexed.
+
+        ``None`` once the file was edited (or touched) after indexing, so
+        anything keyed on the indexed hash is treated as out of date.
+        """
+        if self.changed(relative_path):
+            return None
+        return self.content_hash(relative_path)
+
+    def changed(self, relative_path: str) -> bool:
+        """Whether the file on disk no longer matches the version indexed.
+
+        Compares the stat signature recorded at indexing time, so a file that
+        was only touched also counts as changed.
+        """
+        entry = self._entries.get(relative_path)
+        if entry is None:
+            return False
+        try:
+            stat = os.stat(entry.path)
+        except OSError:
+            return True
+        return (stat.st_mtime_ns, stat.st_size) != (entry.mtime_ns, entry.size)
+
+    def get(self, relative_path: str) -> Optional[str]:
+        """Current text of a file, or ``None`` if unknown or unreadable."""
+        entry = self._entries.get(relative_path)
+        if entry is None:
+            return None
+        try:
+            stat = os.stat(entry.path)
+        except OSError:
+            return None
+
+        with self._lock:
+            cached = self._cache.get(relative_path)
+            if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+                self._cache.move_to_end(relative_path)
+                return cached[2]
+
+        try:
+            content = self.reader(entry.path)
+        except Exception as e:
+            print(f"Error reading {entry.path}: {e}")
+            return None
+        with self._lock:
+            if relative_path in self._entries:
+                self._drop(relative_path)
+                self._remember(relative_path, stat.st_mtime_ns, stat.st_size, content)
+        return content
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "files": len(self._entries),
+                "cached_files": len(self._cache),
+                "cached_bytes": self._cached_bytes,
+            }
+
+    def _remember(self, relative_path: str, mtime_ns: int, size: int, content: str) -> None:
+        # Characters stand in for bytes; source code is almost all ASCII
+        content_bytes = len(content)
+        if content_bytes > self.max_bytes:
+            return
+        self._cache[relative_path] = (mtime_ns, size, content)
+        self._cached_bytes += content_bytes
+        while self._cached_bytes > self.max_bytes:
+            _, (_, _, evicted) = self._cache.popitem(last=False)
+            self._cached_bytes -= len(evicted)
+
+    def _drop(self, relative_path: str) -> None:
+        cached = self._cache.pop(relative_path, None)
+        if cached:
+            self._cached_bytes -= len(cached[2])
@@ -0,0 +1,214 @@
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, Iterable, Optional
+
+DEFAULT_SHARES = {
+    "project_description": 0.1,
+    "history": 0.25,
+    "code": 0.45,
+    "web": 0.2,
+}
+
+# An item is only truncated to fit if at least this many tokens of it survive
+MIN_TRUNCATED_TOKENS = 64
+
+TRUNCATION_MARKER = "\n... (truncated)"
+
+
+def estimate_tokens(text: str) -> int:
+    """Conservative token estimate for when no tokenizer is configured.
+
+    Code and prose average roughly 3-4 bytes per token for current BPE
+    vocabularies; three keeps the estimate on the safe side.
+    """
+    return math.ceil(len(text.encode("utf-8")) / 3)
+
+
+class TokenCounter:
+    """Counts tokens, caching counts by content hash.
+
+    The same file snippets and history messages are measured on every turn,
+    so each distinct text is tokenized once.
+    """
+
+    def __init__(
+        self,
+        tokenize: Optional[Callable[[str], int]] = None,
+        max_entries: int = 4096,
+    ):
+        self.tokenize = tokenize or estimate_tokens
+        self.max_entries = max_entries
+        self._cache: OrderedDict[str, int] = OrderedDict()
+        self._lock = threading.Lock()  # shared by every session
+
+    @classmethod
+    def from_pretrained(cls, name: Optional[str] = None) -> "TokenCounter":
+        """Counter backed by a Hugging Face tokenizer, or the estimate."""
+        if not name:
+            return cls()
+        try:
+            from transformers import AutoTokenizer
+
+            tokenizer = AutoTokenizer.from_pretrained(name)
+        except Exception as e:  # missing package, no network, unknown model
+            print(f"[DEBUG] Could not load tokenizer {name}, estimating tokens: {e}")
+            return cls()
+        return cls(lambda text: len(tokenizer.encode(text, add_special_tokens=False)))
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        key = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            tokens = self._cache.get(key)
+            if tokens is not None:
+                self._cache.move_to_end(key)
+                return tokens
+        tokens = self.tokenize(text)
+        with self._lock:
+            self._cache[key] = tokens
+            if len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return tokens
+
+
+@lru_cache()
+def get_token_counter(tokenizer: Optional[str] = None) -> TokenCounter:
+    """Process-wide token counter, so sessions share the count cache."""
+    return TokenCounter.from_pretrained(tokenizer)
+
+
+@dataclass
+class PackedContext:
+    """What survived packing, and where the tokens went."""
+
+    budget: int  # tokens available to all sections together
+    items: dict[str, list[str]] = field(default_factory=dict)
+    tokens: dict[str, int] = field(default_factory=dict)
+    dropped: dict[str, int] = field(default_factory=dict)  # items cut or left out
+
+    @property
+    def spare(self) -> int:
+        """Budget not used by any section yet (includes reserved shares)."""
+        return max(self.budget - sum(self.tokens.values()), 0)
+
+    def report(self) -> dict[str, int]:
+        return {**self.tokens, "budget": self.budget}
+
+
+class ContextPacker:
+    """Fits prompt sections into the model's context window.
+
+    Each section (project description, history, code, web results) is
+    guaranteed its configured share of the budget left after the prompt
+    template, the question and the space reserved for the answer. Share a
+    section does not need is handed to the others, largest share first.
+    Items within a section are ranked; they are taken in order, the first one
+    that does not fit is truncated and the rest are dropped.
+    """
+
+    def __init__(
+        self,
+        counter: Optional[TokenCounter] = None,
+        context_window: int = 8192,
+        reserve_tokens: int = 1024,
+        shares: Optional[dict[str, float]] = None,
+    ):
+        self.counter = counter or TokenCounter()
+        self.context_window = context_window
+        self.reserve_tokens = reserve_tokens
+        self.shares = dict(shares or DEFAULT_SHARES)
+
+    def pack(
+        self,
+        fixed_text: str,
+        sections: dict[str, list[str]],
+        reserve: Iterable[str] = (),
+    ) -> PackedContext:
+        """Pack ranked items per section around the always-present ``fixed_text``.
+
+        Sections named in ``reserve`` are filled later (e.g. web results once
+        a search has run); their share is held back and left in ``spare``.
+        """
+        budget = max(
+            self.context_window - self.reserve_tokens - self.counter.count(fixed_text),
+            0,
+        )
+        needs = {
+            name: sum(self._item_tokens(item) for item in items)
+            for name, items in sections.items()
+        }
+        allocation = self._allocate(budget, needs, set(reserve))
+
+        packed = PackedContext(budget=budget)
+        for name, items in sections.items():
+            kept, tokens, dropped = self.fit(items, allocation[name])
+            packed.items[name] = kept
+            packed.tokens[name] = tokens
+            packed.dropped[name] = dropped
+        return packed
+
+    def fit(self, items: list[str], budget: int) -> tuple[list[str], int, int]:
+        """Take ranked items while they fit, truncating the first that does not.
+
+        Returns the kept items, the tokens they use and how many were cut or
+        dropped.
+        """
+        kept = []
+        used = 0
+        for index, item in enumerate(items):
+            tokens = self._item_tokens(item)
+            if used + tokens <= budget:
+                kept.append(item)
+                used += tokens
+                continue
+
+            remaining = budget - used
+            if remaining >= MIN_TRUNCATED_TOKENS:
+                truncated = self._truncate(item, remaining)
+                if truncated:
+                    kept.append(truncated)
+                    used += self._item_tokens(truncated)
+            return kept, used, len(items) - index
+        return kept, used, 0
+
+    def _allocate(
+        self, budget: int, needs: dict[str, int], reserved: set[str]
+    ) -> dict[str, int]:
+        """Split the budget by share, then lend unused share to hungry sections."""
+        shares = {name: self.shares.get(name, 0.0) for name in set(needs) | reserved}
+        total_share = sum(shares.values()) or 1.0
+        quota = {name: int(budget * share / total_share) for name, share in shares.items()}
+
+        allocation = {name: min(needs[name], quota[name]) for name in needs}
+        held = sum(quota[name] for name in reserved if name not in needs)
+        leftover = budget - sum(allocation.values()) - held
+        for name in sorted(needs, key=lambda n: shares[n], reverse=True):
+            extra = min(needs[name] - allocation[name], leftover)
+            if extra > 0:
+                allocation[name] += extra
+                leftover -= extra
+        return allocation
+
+    def _item_tokens(self, item: str) -> int:
+        # +1 for the separator joining items
+        return self.counter.count(item) + 1
+
+    def _truncate(self, item: str, budget: int) -> Optional[str]:
+        """Longest line-aligned head of ``item`` that fits in ``budget`` tokens."""
+        lines = item.splitlines()
+        low, high = 0, len(lines)
+        while low < high:
+            middle = (low + high + 1) // 2
+            candidate = "\n".join(lines[:middle]) + TRUNCATION_MARKER
+            if self._item_tokens(candidate) <= budget:
+                low = middle
+            else:
+                high = middle - 1
+        if low == 0:
+            return None
+        return "\n".join(lines[:low]) + TRUNCATION_MARKER
@@ -1,176 +1,175 @@
+import ast
+import hashlib
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack
+from functools import partial
 from pathlib import Path
-from typing import Optional
+from typing import Any, Callable, Iterable, Iterator, Optional
 from langchain.docstore.document import Document
-from langchain_community.document_loaders import (
-    PythonLoader,
-    TextLoader,
-    UnstructuredMarkdownLoader,
-)
+from langchain_core.embeddings import Embeddings
+from langchain_community.document_loaders import UnstructuredMarkdownLoader
 from langchain_chroma import Chroma
+from .content_store import ContentStore, read_text
 from .embeddings import get_embeddings
+from .index_manifest import FileState, IndexManifest
+from .ingest import Pipeline
+from .lexical_index import BM25Index
+from .mention_index import MentionIndex, file_mentions, symbol_mentions
+from .scanner import ScannedFile, scan_directory
+from .symbols import Symbol, extract_symbols
+
+# Bump whenever the text produced by the summary builders changes, so that
+# persisted vectors built from the old format are re-embedded.
+SUMMARY_FORMAT_VERSION = 1
+
+DEFAULT_MAX_FILE_SIZE = 512 * 1024
+
+# Below this many files, process start-up costs more than it saves
+PARALLEL_THRESHOLD = 32
+
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_QUEUE_SIZE = 256
+DEFAULT_CONTENT_CACHE_BYTES = 64 * 1024 * 1024
 
 
 class DocumentProcessor:
     """Processes documents while maintaining complete file context."""
     
-    def __init__(self):
-        self.file_contents = {}  # Cache of full file contents
+    def __init__(
+        self,
+        embeddings: Optional[Embeddings] = None,
+        exclude: Iterable[str] = (),
+        max_file_size: Optional[int] = DEFAULT_MAX_FILE_SIZE,
+        workers: Optional[int] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        content_cache_bytes: int = DEFAULT_CONTENT_CACHE_BYTES,
+    ):
+        # Full file contents by relative path, read from disk on demand
+        self.content_store = ContentStore(_read_content, max_bytes=content_cache_bytes)
+        self.embeddings = embeddings or get_embeddings()
+        self.exclude = list(exclude)  # gitignore-style patterns
+        self.max_file_size = max_file_size
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size  # summaries per embedding/vectorstore write
+        self.queue_size = queue_size  # items buffered between ingestion stages
+        self.last_report: dict[str, Any] = {}  # per-stage throughput of last run
+        # Lexical indexes kept in step with the vectorstores, keyed like them
+        self.file_index = BM25Index()
+        self.symbol_index = BM25Index()
+        # File, module and symbol names that questions can refer to
+        self.mention_index = MentionIndex()
+
+    @property
+    def embedding_model(self) -> str:
+        """Name identifying the embedding model, recorded in the index manifest."""
+        return getattr(self.embeddings, "model", type(self.embeddings).__name__)
         
     def load_directory(self, dir_path: str | Path) -> list[Document]:
         """Load all supported files from a directory."""
-        dir_path = Path(dir_path)
         documents = []
-        
-        # Define file type handlers
-        handlers = {
-            "**/*.py": self._process_python_file,
-            "**/*.md": self._process_markdown_file,
-            "**/*.txt": self._process_text_file
-        }
-        
-        # Process each file type
-        for glob_pattern, handler in handlers.items():
-            for file_path in dir_path.glob(glob_pattern):
-                try:
-                    doc = handler(file_path)
-                    if doc:
-                        documents.append(doc)
-                except Exception as e:
-                    print(f"Error processing {file_path}: {e}")
-        
+        self.ingest(self._iter_files(Path(dir_path)), sink=documents.append)
         return documents
-    
-    def _process_python_file(self, file_path: Path) -> Optional[Document]:
-        """Process a Python file, keeping complete context."""
-        try:
-            # Use PythonLoader to get initial document with metadata
-            loader = PythonLoader(str(file_path))
-            doc = loader.load()[0]
-            
-            # Store the complete file content
-            self.file_contents[file_path.name] = doc.page_content
-            
-            # Create a searchable summary
-            summary = self._create_file_summary(doc.page_content, file_path.name)
-            
-            return Document(
-                page_content=summary,
-                metadata={
-                    "file_type": "python",
-                    "file_name": file_path.name,
-                    "file_path": str(file_path),
-                    "is_summary": True,
-                    "full_content_available": True
-                }
+
+    def _iter_files(self, dir_path: Path) -> Iterator[ScannedFile]:
+        """Walk the directory once, honouring ignore rules and the size limit."""
+        return scan_directory(
+            dir_path,
+            suffixes=_LOADERS,
+            exclude=self.exclude,
+            max_file_size=self.max_file_size,
+        )
+
+    def ingest(
+        self,
+        files: Iterable[ScannedFile],
+        vectorstore: Optional[Chroma] = None,
+        is_current: Optional[Callable[[str, str], bool]] = None,
+        sink: Optional[Callable[[Document], None]] = None,
+        parallel: bool = True,
+        symbol_store: Optional[Chroma] = None,
+    ) -> dict[str, FileState]:
+        """Stream files through load -> summarise -> index.
+
+        Files are read on a thread pool, summarised on worker processes and
+        added to the vectorstore in batches (which embeds them), each stage
+        running concurrently with the others behind bounded queues. ``is_current(relative_path, hash)``
+        lets callers skip files whose stored vector is still valid; ``sink``
+        receives each summary document. When a ``symbol_store`` is given, one
+        entry per class, method and function is indexed there as well.
+        Returns the manifest state of every file that was read; per-stage
+        throughput is kept in ``last_report``.
+        """
+        states = {}
+
+        def load(scanned: ScannedFile):
+            result = _read_file(str(scanned.path))
+            if isinstance(result, str):
+                print(result)
+                return None
+            content, content_hash = result
+            self.content_store.add(
+                scanned.relative_path,
+                scanned.path,
+                content_hash,
+                scanned.mtime_ns,
+                scanned.size,
+                content,
             )
-        except Exception as e:
-            print(f"Error in Python processing {file_path}: {e}")
-            return None
-    
-    def _process_markdown_file(self, file_path: Path) -> Optional[Document]:
-        """Process a Markdown file."""
-        try:
-            loader = UnstructuredMarkdownLoader(str(file_path))
-            doc = loader.load()[0]
-            self.file_contents[file_path.name] = doc.page_content
-            
-            # For markdown, use first few lines and headers as summary
-            import re
-            headers = re.findall(r'^#{1,6}\s+.+', doc.page_content, re.MULTILINE)
-            first_para = doc.page_content.split('\n\n')[0]
-            summary = f"File: {file_path.name}\n{'=' * (len(file_path.name) + 6)}\n\n"
-            if headers:
-                summary += "Headers:\n" + "\n".join(headers) + "\n\n"
-            summary += f"Preview:\n{first_para[:500]}..."
-            
-            return Document(
-                page_content=summary,
-                metadata={
-                    "file_type": "markdown",
-                    "file_name": file_path.name,
-                    "file_path": str(file_path),
-                    "is_summary": True,
-                    "full_content_available": True
-                }
+            self.file_index.replace(
+                scanned.relative_path, {scanned.relative_path: content}
             )
-        except Exception as e:
-            print(f"Error in Markdown processing {file_path}: {e}")
-            return None
-    
-    def _process_text_file(self, file_path: Path) -> Optional[Document]:
-        """Process a text file."""
-        try:
-            loader = TextLoader(str(file_path))
-            doc = loader.load()[0]
-            self.file_contents[file_path.name] = doc.page_content
-            
-            # For text files, use first few lines as summary
-            summary = f"File: {file_path.name}\n{'=' * (len(file_path.name) + 6)}\n\n"
-            summary += f"Preview:\n{doc.page_content[:500]}..."
-            
-            return Document(
-                page_content=summary,
-                metadata={
-                    "file_type": "text",
-                    "file_name": file_path.name,
-                    "file_path": str(file_path),
-                    "is_summary": True,
-                    "full_content_available": True
-                }
+            self.mention_index.replace(
+                scanned.relative_path, file_mentions(scanned.relative_path)
             )
-        except Exception as e:
-            print(f"Error in text processing {file_path}: {e}")
-            return None
-    
-    def _create_file_summary(self, content: str, file_name: str) -> str:
-        """Create a searchable summary of Python file's key elements."""
-        import ast
-        
-        try:
-            tree = ast.parse(content)
-            elements = []
-            
-            # Start with the filename
-            file_header = f"File: {file_name}\n{'=' * (len(file_name) + 6)}"
-            elements.append(file_header)
-            
-            # Get imports
-            imports = []
-            for node in ast.walk(tree):
-                if isinstance(node, (ast.Import, ast.ImportFrom)):
-                    imports.append(ast.unparse(node))
-            if imports:
-                elements.append("Imports:\n" + "\n".join(imports))
-            
-            # Get class definitions with their methods
-            for node in tree.body:
-                if isinstance(node, ast.ClassDef):
-                    class_summary = [f"class {node.name}:"]
-                    methods = []
-                    for item in node.body:
-                        if isinstance(item, ast.FunctionDef):
-                            # Include function args for better searchability
-                            args = ast.unparse(item.args)
-                            args = args[args.find('('):args.find(')')+1]
-                            methods.append(f"    def {item.name}{args}")
-                    class_summary.extend(methods)
-                    elements.append("\n".join(class_summary))
-                
-                # Get top-level functions
-                elif isinstance(node, ast.FunctionDef):
-                    args = ast.unparse(node.args)
-                    args = args[args.find('('):args.find(')')+1]
-                    elements.append(f"def {node.name}{args}")
-            
-            return "\n\n".join(elements)
-            
-        except Exception as e:
-            print(f"Error creating summary for {file_name}: {e}")
-            return f"File: {file_name}\n\nError parsing file: {str(e)}"
-    
-    def get_full_content(self, file_name: str) -> Optional[str]:
-        """Retrieve the complete content of a file."""
-        return self.file_contents.get(file_name)
+            states[scanned.relative_path] = FileState(
+                content_hash, scanned.mtime_ns, scanned.size
+            )
+            if is_current and is_current(scanned.relative_path, content_hash):
+                return None
+            return scanned, content, content_hash
+
+        def index(batch: list[tuple[Document, list[Document]]]) -> None:
+            files = [doc for doc, _ in batch]
+            symbols = [doc for _, symbol_docs in batch for doc in symbol_docs]
+            paths = [doc.metadata["relative_path"] for doc in files]
+            vectorstore.add_documents(files, ids=paths)
+            if symbol_store is not None:
+                # Drop symbols that were renamed or removed from changed files
+                _delete_symbols(symbol_store, paths)
+                symbol_ids = [Symbol.from_metadata(doc.metadata).id for doc in symbols]
+                if symbols:
+                    symbol_store.add_documents(symbols, ids=symbol_ids)
+                self._index_symbols(paths, symbol_ids, symbols)
+
+        with ExitStack() as stack:
+            readers = stack.enter_context(ThreadPoolExecutor())
+            summarisers = None
+            if parallel and self.workers > 1:
+                summarisers = stack.enter_context(
+                    ProcessPoolExecutor(max_workers=self.workers)
+                )
+            pipeline = (
+                Pipeline(self.queue_size)
+                .add_stage("load", load, readers)
+                .add_stage(
+                    "summarise",
+                    partial(_build_documents, with_symbols=symbol_store is not None),
+                    summarisers,
+                )
+            )
+            if sink:
+                pipeline.add_stage("collect", lambda item: (sink(item[0]), item)[1])
+            if vectorstore is not None:
+                pipeline.add_batch_stage("index", index, self.batch_size)
+            self.last_report = pipeline.run(files)
+        return states
+
+    def get_full_content(self, relative_path: str) -> Optional[str]:
+        """Retrieve the complete, current content of a file."""
+        return self.content_store.get(relative_path)
     
     def create_vectorstore(
         self, 
@@ -179,15 +178,362 @@ class DocumentProcessor:
     ) -> Chroma:
         """Create a vectorstore with the file summaries."""
         kwargs = {"persist_directory": str(persist_dir)} if persist_dir else {}
+        ids = [doc.metadata.get("relative_path") for doc in docs]
+        if all(ids):
+            kwargs["ids"] = ids
         
         return Chroma.from_documents(
             documents=docs,
-            embedding=get_embeddings(),
+            embedding=self.embeddings,
             collection_metadata={"hnsw:space": "cosine"},
             **kwargs
         )
+
+    def open_vectorstore(
+        self, persist_dir: str | Path, collection_name: str = "langchain"
+    ) -> Chroma:
+        """Open a persisted collection without embedding anything."""
+        return Chroma(
+            collection_name=collection_name,
+            persist_directory=str(persist_dir),
+            embedding_function=self.embeddings,
+            collection_metadata={"hnsw:space": "cosine"},
+        )
+
+    def sync_directory(
+        self,
+        dir_path: str | Path,
+        vectorstore: Chroma,
+        manifest: Optional[IndexManifest] = None,
+        symbol_store: Optional[Chroma] = None,
+    ) -> IndexManifest:
+        """Bring a persisted vectorstore in line with a directory.
+
+        Documents are stored under their relative path, so only files that are
+        missing from the collection or whose content hash differs from the
+        manifest are summarised and embedded. Entries for files that no longer
+        exist (and any left over from older, randomly-keyed builds) are deleted.
+        """
+        with_symbols = symbol_store is not None
+        if manifest is None or not manifest.is_compatible(
+            self.embedding_model, SUMMARY_FORMAT_VERSION, with_symbols
+        ):
+            if manifest is not None:
+                print("[DEBUG] Index manifest is outdated, rebuilding collection")
+            vectorstore.reset_collection()
+            if symbol_store is not None:
+                symbol_store.reset_collection()
+            manifest = IndexManifest(
+                self.embedding_model, SUMMARY_FORMAT_VERSION, symbol_index=with_symbols
+            )
+
+        stored_ids = set(vectorstore.get(include=[])["ids"])
+        previous = manifest.files
+        if symbol_store is not None:
+            # Unchanged files are not re-summarised, so seed the lexical
+            # symbol index from what is already stored
+            stored = symbol_store.get(include=["documents", "metadatas"])
+            self._index_symbols(
+                {metadata["relative_path"] for metadata in stored["metadatas"]},
+                stored["ids"],
+                [
+                    Document(page_content=text, metadata=metadata)
+                    for text, metadata in zip(stored["documents"], stored["metadatas"])
+                ],
+            )
+
+        def is_current(rel_path: str, content_hash: str) -> bool:
+            state = previous.get(rel_path)
+            return (
+                rel_path in stored_ids
+                and state is not None
+                and state.content_hash == content_hash
+            )
+
+        current = self.ingest(
+            self._iter_files(Path(dir_path)),
+            vectorstore,
+            is_current,
+            symbol_store=symbol_store,
+        )
+        removed = [doc_id for doc_id in stored_ids if doc_id not in current]
+        self._delete(vectorstore, symbol_store, removed)
+        self.mention_index.compile()
+
+        embedded = self.last_report["stages"]["index"]["items"]
+        print(
+            f"[DEBUG] Vectorstore sync - embedded: {embedded}, "
+            f"removed: {len(removed)}, unchanged: {len(current) - embedded}"
+        )
+        self._log_report()
+
+        manifest.files = current
+        manifest.symbol_index = with_symbols
+        return manifest
     
-    def refresh_vectorstore(self, dir_path: str | Path, vectorstore: Chroma) -> None:
-        """Refresh the vectorstore with latest changes."""
-        docs = self.load_directory(dir_path)
-        vectorstore.add_documents(docs)
\ No newline at end of file
+    def refresh_vectorstore(
+        self,
+        dir_path: str | Path,
+        vectorstore: Chroma,
+        manifest: Optional[IndexManifest] = None,
+        symbol_store: Optional[Chroma] = None,
+    ) -> IndexManifest:
+        """Refresh the vectorstore with latest changes.
+
+        Files whose size and mtime match the manifest are skipped without being
+        read; files whose content hash is unchanged are not re-embedded. Changed
+        files are upserted under their relative path and entries for deleted
+        files are removed, so the cost scales with the diff, not the repo.
+        """
+        dir_path = Path(dir_path)
+        if manifest is None:
+            manifest = self._manifest_from_vectorstore(vectorstore)
+
+        candidates = []
+        seen = set()
+        for scanned in self._iter_files(dir_path):
+            seen.add(scanned.relative_path)
+            state = manifest.files.get(scanned.relative_path)
+            if state and state.matches_stat(scanned.mtime_ns, scanned.size):
+                if scanned.relative_path not in self.content_store:
+                    self._register(scanned, state.content_hash)
+                continue
+
+            if state:
+                try:
+                    content_hash = _hash_file(scanned.path)
+                except OSError as e:
+                    print(f"Error processing {scanned.path}: {e}")
+                    continue
+                if state.content_hash == content_hash:
+                    # Touched but not modified - just remember the new stat
+                    manifest.files[scanned.relative_path] = FileState(
+                        content_hash, scanned.mtime_ns, scanned.size
+                    )
+                    self._register(scanned, content_hash)
+                    continue
+            candidates.append(scanned)
+
+        changed = self.ingest(
+            candidates,
+            vectorstore,
+            parallel=len(candidates) >= PARALLEL_THRESHOLD,
+            symbol_store=symbol_store,
+        )
+        removed = [rel_path for rel_path in manifest.files if rel_path not in seen]
+        self._delete(vectorstore, symbol_store, removed)
+        self.mention_index.compile()
+
+        for rel_path in removed:
+            del manifest.files[rel_path]
+        manifest.files.update(changed)
+
+        print(
+            f"[DEBUG] Vectorstore refresh - updated: {len(changed)}, "
+            f"removed: {len(removed)}"
+        )
+        self._log_report()
+        return manifest
+
+    def _manifest_from_vectorstore(self, vectorstore: Chroma) -> IndexManifest:
+        """Reconstruct a manifest from the metadata stored with each document."""
+        stored = vectorstore.get(include=["metadatas"])
+        manifest = IndexManifest(self.embedding_model, SUMMARY_FORMAT_VERSION)
+        for doc_id, metadata in zip(stored["ids"], stored["metadatas"]):
+            metadata = metadata or {}
+            manifest.files[doc_id] = FileState(
+                content_hash=metadata.get("content_hash", ""),
+                mtime_ns=metadata.get("mtime_ns", 0),
+                size=metadata.get("size", -1),
+            )
+        return manifest
+
+    def _register(self, scanned: ScannedFile, content_hash: str) -> None:
+        """Record an unchanged file in the content store without reading it."""
+        self.content_store.add(
+            scanned.relative_path,
+            scanned.path,
+            content_hash,
+            scanned.mtime_ns,
+            scanned.size,
+        )
+
+    def _delete(
+        self,
+        vectorstore: Chroma,
+        symbol_store: Optional[Chroma],
+        relative_paths: list[str],
+    ) -> None:
+        """Remove deleted files, and their symbols, from the index."""
+        if relative_paths:
+            vectorstore.delete(ids=relative_paths)
+            self.content_store.remove(relative_paths)
+            self.file_index.remove(relative_paths)
+            self.symbol_index.remove(relative_paths)
+            self.mention_index.remove(relative_paths)
+            self.mention_index.remove(_symbols_group(path) for path in relative_paths)
+            if symbol_store is not None:
+                _delete_symbols(symbol_store, relative_paths)
+
+    def _index_symbols(
+        self, relative_paths: Iterable[str], ids: list[str], docs: list[Document]
+    ) -> None:
+        """Replace the lexical and mention entries for symbols of the given files."""
+        grouped = {path: ({}, []) for path in relative_paths}
+        for doc_id, doc in zip(ids, docs):
+            texts, symbols = grouped[doc.metadata["relative_path"]]
+            texts[doc_id] = f"{doc.metadata['qualname']}\n{doc.page_content}"
+            symbols.append(Symbol.from_metadata(doc.metadata))
+        for path, (texts, symbols) in grouped.items():
+            self.symbol_index.replace(path, texts)
+            self.mention_index.replace(_symbols_group(path), symbol_mentions(symbols))
+
+    def _log_report(self) -> None:
+        """Print per-stage throughput of the last ingestion run."""
+        report = self.last_report
+        stages = ", ".join(
+            f"{name}: {stats['items']} in {stats['busy_seconds']}s "
+            f"({stats['items_per_second']}/s)"
+            for name, stats in report["stages"].items()
+        )
+        print(f"[DEBUG] Ingestion took {report['elapsed_seconds']}s - {stages}")
+
+
+def _hash_file(file_path: Path) -> str:
+    """Content hash used to detect changed files."""
+    return hashlib.sha256(file_path.read_bytes()).hexdigest()
+
+
+def _read_markdown_file(file_path: Path) -> str:
+    return UnstructuredMarkdownLoader(str(file_path)).load()[0].page_content
+
+
+def _summarise_markdown(content: str, file_name: str) -> str:
+    """For markdown, use first few lines and headers as summary."""
+    headers = re.findall(r'^#{1,6}\s+.+', content, re.MULTILINE)
+    first_para = content.split('\n\n')[0]
+    summary = f"File: {file_name}\n{'=' * (len(file_name) + 6)}\n\n"
+    if headers:
+        summary += "Headers:\n" + "\n".join(headers) + "\n\n"
+    summary += f"Preview:\n{first_para[:500]}..."
+    return summary
+
+
+def _summarise_text(content: str, file_name: str) -> str:
+    """For text files, use first few lines as summary."""
+    summary = f"File: {file_name}\n{'=' * (len(file_name) + 6)}\n\n"
+    summary += f"Preview:\n{content[:500]}..."
+    return summary
+
+
+def _create_file_summary(content: str, file_name: str) -> str:
+    """Create a searchable summary of Python file's key elements."""
+    try:
+        tree = ast.parse(content)
+        elements = []
+        
+        # Start with the filename
+        file_header = f"File: {file_name}\n{'=' * (len(file_name) + 6)}"
+        elements.append(file_header)
+        
+        # Get imports
+        imports = []
+        for node in ast.walk(tree):
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                imports.append(ast.unparse(node))
+        if imports:
+            elements.append("Imports:\n" + "\n".join(imports))
+        
+        # Get class definitions with their methods
+        for node in tree.body:
+            if isinstance(node, ast.ClassDef):
+                class_summary = [f"class {node.name}:"]
+                methods = []
+                for item in node.body:
+                    if isinstance(item, ast.FunctionDef):
+                        # Include function args for better searchability
+                        args = ast.unparse(item.args)
+                        args = args[args.find('('):args.find(')')+1]
+                        methods.append(f"    def {item.name}{args}")
+                class_summary.extend(methods)
+                elements.append("\n".join(class_summary))
+            
+            # Get top-level functions
+            elif isinstance(node, ast.FunctionDef):
+                args = ast.unparse(node.args)
+                args = args[args.find('('):args.find(')')+1]
+                elements.append(f"def {node.name}{args}")
+        
+        return "\n\n".join(elements)
+        
+    except Exception as e:
+        print(f"Error creating summary for {file_name}: {e}")
+        return f"File: {file_name}\n\nError parsing file: {str(e)}"
+
+
+# File suffix -> (file type, reader, summariser)
+_LOADERS: dict[
+    str, tuple[str, Callable[[Path], str], Callable[[str, str], str]]
+] = {
+    ".py": ("python", read_text, _create_file_summary),
+    ".md": ("markdown", _read_markdown_file, _summarise_markdown),
+    ".txt": ("text", read_text, _summarise_text),
+}
+
+
+def _read_content(file_path: Path) -> str:
+    """Read a file the same way it was read for indexing."""
+    return _LOADERS[file_path.suffix][1](file_path)
+
+
+def _read_file(path: str) -> tuple[str, str] | str:
+    """Read and hash one file, reporting failures as an error message."""
+    file_path = Path(path)
+    file_type, reader, _ = _LOADERS[file_path.suffix]
+    try:
+        return reader(file_path), _hash_file(file_path)
+    except Exception as e:
+        return f"Error in {file_type} processing {file_path}: {e}"
+
+
+def _build_documents(
+    loaded: tuple[ScannedFile, str, str], with_symbols: bool = False
+) -> tuple[Document, list[Document]]:
+    """Summarise a loaded file and wrap the summary (and symbols) for indexing.
+
+    Runs in worker processes, so it is a module-level function.
+    """
+    scanned, content, content_hash = loaded
+    file_path = scanned.path
+    file_type, _, summarise = _LOADERS[file_path.suffix]
+    symbol_docs = []
+    if with_symbols and file_type == "python":
+        symbol_docs = [
+            symbol.to_document(file_path.name)
+            for symbol in extract_symbols(content, scanned.relative_path)
+        ]
+    document = Document(
+        page_content=summarise(content, file_path.name),
+        metadata={
+            "file_type": file_type,
+            "file_name": file_path.name,
+            "file_path": str(file_path),
+            "is_summary": True,
+            "full_content_available": True,
+            "relative_path": scanned.relative_path,
+            "content_hash": content_hash,
+            "mtime_ns": scanned.mtime_ns,
+            "size": scanned.size,
+        }
+    )
+    return document, symbol_docs
+
+
+def _symbols_group(relative_path: str) -> str:
+    """Mention index group holding the symbols of one file."""
+    return f"{relative_path}#symbols"
+
+
+def _delete_symbols(symbol_store: Chroma, relative_paths: list[str]) -> None:
+    if relative_paths:
+        symbol_store.delete(where={"relative_path": {"$in": relative_paths}})
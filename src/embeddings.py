@@ -1,4 +1,11 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
 from functools import lru_cache
+from pathlib import Path
+from langchain_core.embeddings import Embeddings
 from langchain_ollama import OllamaEmbeddings
 from typing import Any
 
@@ -11,12 +18,185 @@ from typing import Any
 #         encode_kwargs={'normalize_embeddings': True}
 #     )
 
+# SQLite caps the number of bound parameters per statement
+_SQL_BATCH = 500
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that stores vectors in a content-addressed SQLite cache.
+
+    Vectors are keyed by (model, kind, sha256 of the text) and stored as packed
+    float32 blobs, so re-embedding unchanged text or repeating a query never
+    reaches the underlying model. The cache is evicted least-recently-used once
+    it grows past ``max_bytes``.
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        cache_dir: str | Path,
+        max_bytes: int = 512 * 1024 * 1024,
+    ):
+        self.underlying = underlying
+        self.model = getattr(underlying, "model", type(underlying).__name__)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        cache_dir = Path(cache_dir)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            cache_dir / "embeddings.sqlite3", check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS vectors (
+                model TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, kind, text_hash)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS vectors_last_used ON vectors (last_used)"
+        )
+        self._conn.commit()
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM vectors"
+        ).fetchone()[0]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self._embed(texts, "document", self.underlying.embed_documents)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed(
+            [text], "query", lambda texts: [self.underlying.embed_query(texts[0])]
+        )[0]
+
+    def _embed(self, texts: list[str], kind: str, embed_fn) -> list[list[float]]:
+        hashes = [hashlib.sha256(text.encode("utf-8")).hexdigest() for text in texts]
+        cached = self._lookup(kind, set(hashes))
+
+        # Embed each distinct missing text once
+        missing = {h: text for h, text in zip(hashes, texts) if h not in cached}
+        with self._lock:
+            hits = sum(h in cached for h in hashes)
+            self.hits += hits
+            self.misses += len(hashes) - hits
+        if missing:
+            vectors = embed_fn(list(missing.values()))
+            # Round through float32 so hits and misses return identical vectors
+            fresh = {
+                h: array("f", vector) for h, vector in zip(missing.keys(), vectors)
+            }
+            self._store(kind, fresh)
+            cached.update(fresh)
+
+        return [list(cached[h]) for h in hashes]
+
+    def _lookup(self, kind: str, hashes: set[str]) -> dict[str, array]:
+        found = {}
+        keys = list(hashes)
+        with self._lock:
+            for start in range(0, len(keys), _SQL_BATCH):
+                batch = keys[start : start + _SQL_BATCH]
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM vectors "
+                    f"WHERE model = ? AND kind = ? "
+                    f"AND text_hash IN ({','.join('?' * len(batch))})",
+                    [self.model, kind, *batch],
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = array("f", blob)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE vectors SET last_used = ? "
+                    "WHERE model = ? AND kind = ? AND text_hash = ?",
+                    [(now, self.model, kind, h) for h in found],
+                )
+                self._conn.commit()
+        return found
+
+    def _store(self, kind: str, vectors: dict[str, array]) -> None:
+        now = time.time()
+        rows = [
+            (self.model, kind, h, vector.tobytes(), now)
+            for h, vector in vectors.items()
+        ]
+        keys = list(vectors)
+        with self._lock:
+            # Another thread may have stored the same text since our lookup;
+            # its row is replaced, so its size must not be counted twice
+            replaced = 0
+            for start in range(0, len(keys), _SQL_BATCH):
+                batch = keys[start : start + _SQL_BATCH]
+                replaced += self._conn.execute(
+                    f"SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM vectors "
+                    f"WHERE model = ? AND kind = ? "
+                    f"AND text_hash IN ({','.join('?' * len(batch))})",
+                    [self.model, kind, *batch],
+                ).fetchone()[0]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vectors "
+                "(model, kind, text_hash, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._total_bytes += sum(len(row[3]) for row in rows) - replaced
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Drop least-recently-used vectors until the cache is 90% of its cap."""
+        target = int(self.max_bytes * 0.9)
+        rows = self._conn.execute(
+            "SELECT rowid, LENGTH(vector) FROM vectors ORDER BY last_used"
+        )
+        doomed = []
+        for rowid, size in rows:
+            if self._total_bytes <= target:
+                break
+            doomed.append((rowid,))
+            self._total_bytes -= size
+        self._conn.executemany("DELETE FROM vectors WHERE rowid = ?", doomed)
+
+    def stats(self) -> dict[str, Any]:
+        """Hit/miss counters and current size of the cache."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": entries,
+                "bytes": self._total_bytes,
+            }
+
 
 @lru_cache()
 def get_embeddings(
-    model: str = "nomic-embed-text", **kwargs: dict[str, Any]
-) -> OllamaEmbeddings:
+    model: str = "nomic-embed-text",
+    cache_dir: str | None = None,
+    max_cache_mb: int = 512,
+    **kwargs: dict[str, Any],
+) -> Embeddings:
     """
     Get cached embedding model instance.
+
+    When ``cache_dir`` is given the model is wrapped in a disk-backed vector
+    cache so that identical texts are only ever embedded once.
     """
-    return OllamaEmbeddings(model=model, **kwargs)
+    embeddings = OllamaEmbeddings(model=model, **kwargs)
+    if cache_dir:
+        return CachedEmbeddings(
+            embeddings, cache_dir, max_bytes=max_cache_mb * 1024 * 1024
+        )
+    return embeddings
@@ -0,0 +1,252 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import lru_cache
+from typing import TYPE_CHECKING, Callable, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_ollama import ChatOllama
+
+from .context_packer import TokenCounter
+from .reasoning import split_reasoning
+
+if TYPE_CHECKING:
+    from .session_store import SessionJournal
+
+SUMMARY_PROMPT = """Update the running summary of a conversation between a user and an assistant about a Python codebase.
+Keep the facts, decisions, file and function names and open questions; drop small talk.
+Reply with the updated summary only, in at most {max_words} words.
+
+Current summary:
+{summary}
+
+Messages to add:
+{messages}"""
+
+# One worker for every session: folds run in the order they were queued and a
+# small model is never asked for more than one summary at a time
+_SUMMARY_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-summary")
+
+
+@dataclass
+class Message:
+    role: str
+    content: str
+    timestamp: datetime = field(default_factory=datetime.now)
+    # Model reasoning behind an answer; kept for display, never sent back
+    reasoning: Optional[str] = None
+
+
+Summarizer = Callable[[str, list[Message]], str]
+
+
+class ChatContext:
+    """
+    Recent messages within a token budget, plus a summary of everything older.
+
+    When the kept messages exceed ``max_tokens`` or ``max_messages``, the
+    oldest are evicted in one block, down to half of each limit, so the start
+    of the history (and the cached prompt prefix) only moves now and then.
+    Evicted messages are folded into ``summary``: by ``summarizer`` on a
+    background thread when one is given, otherwise by keeping the user's
+    earlier questions. Memory and prompt size stay bounded however long the
+    session runs; the full conversation lives in ``journal``, when set, which
+    records every message, summary and clear as it happens.
+    """
+
+    def __init__(
+        self,
+        max_messages: int = 10,
+        max_tokens: int = 2048,
+        counter: Optional[TokenCounter] = None,
+        summarizer: Optional[Summarizer] = None,
+        summary_tokens: int = 256,
+        journal: Optional["SessionJournal"] = None,
+    ):
+        self.messages: list[Message] = []
+        self.max_messages = max_messages
+        self.max_tokens = max_tokens
+        self.counter = counter or TokenCounter()
+        self.summarizer = summarizer
+        self.summary_tokens = summary_tokens
+        self.journal = journal
+        self.summary = ""
+        self.tokens = 0  # tokens in ``messages``
+        self.evicted = 0  # messages folded into the summary so far
+        self._generation = 0  # bumped by clear() so late summaries are dropped
+        self._pending: Optional[Future] = None
+        self._lock = threading.Lock()
+
+    def add_message(
+        self,
+        role: str,
+        content: str,
+        timestamp: datetime | None = None,
+        reasoning: str | None = None,
+    ):
+        """Add a message with an optional specific timestamp."""
+        message = Message(
+            role=role,
+            content=content,
+            timestamp=timestamp or datetime.now(),
+            reasoning=reasoning,
+        )
+        if self.journal is not None:
+            self.journal.append(message)
+        self._append(message)
+        if self.tokens > self.max_tokens or len(self.messages) > self.max_messages:
+            self._evict()
+
+    def restore(self, messages: list[Message], summary: str = "") -> None:
+        """Replace the context with saved state, without journaling it again.
+
+        Messages that do not fit are dropped rather than summarised; they are
+        assumed to be covered by ``summary`` already.
+        """
+        self._reset()
+        with self._lock:
+            self.summary = summary
+        for message in messages:
+            self._append(message)
+        while len(self.messages) > 1 and (
+            self.tokens > self.max_tokens or len(self.messages) > self.max_messages
+        ):
+            self.tokens -= self.counter.count(self.messages.pop(0).content)
+
+    def clear(self) -> None:
+        if self.journal is not None:
+            self.journal.clear()
+        self._reset()
+
+    def get_context_string(self) -> str:
+        """The summary and recent messages as text."""
+        rendered = "\n".join(_render(message) for message in self.messages)
+        summary = self.get_summary()
+        if not summary:
+            return rendered
+        return f"Summary of the earlier conversation: {summary}\n{rendered}"
+
+    def get_summary(self) -> str:
+        with self._lock:
+            return self.summary
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """Block until queued summaries have been folded in."""
+        pending = self._pending
+        if pending is not None:
+            pending.result(timeout)
+
+    def _append(self, message: Message) -> None:
+        self.messages.append(message)
+        self.tokens += self.counter.count(message.content)
+
+    def _reset(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self.summary = ""
+        self.messages.clear()
+        self.tokens = 0
+        self.evicted = 0
+
+    def _evict(self) -> None:
+        """Drop the oldest messages down to half of both limits."""
+        keep_tokens = self.max_tokens // 2
+        keep_messages = max(self.max_messages // 2, 1)
+        count = 0
+        tokens = self.tokens
+        # Always keep the newest message, even if it is over budget on its own
+        while count < len(self.messages) - 1 and (
+            tokens > keep_tokens or len(self.messages) - count > keep_messages
+        ):
+            tokens -= self.counter.count(self.messages[count].content)
+            count += 1
+        if not count:
+            return
+
+        evicted = self.messages[:count]
+        del self.messages[:count]
+        self.tokens = tokens
+        self.evicted += count
+
+        if self.summarizer is None:
+            with self._lock:
+                self.summary = summarize_questions(
+                    self.summary, evicted, self.summary_tokens * 4
+                )
+                self._record_summary()
+            return
+        self._pending = _SUMMARY_EXECUTOR.submit(self._fold, evicted, self._generation)
+
+    def _fold(self, evicted: list[Message], generation: int) -> None:
+        summary = self.get_summary()
+        try:
+            updated = self.summarizer(summary, evicted)
+        except Exception as e:
+            print(f"[DEBUG] History summary failed, keeping questions: {e}")
+            updated = summarize_questions(summary, evicted, self.summary_tokens * 4)
+        with self._lock:
+            if generation == self._generation:
+                self.summary = updated
+                self._record_summary()
+
+    def _record_summary(self) -> None:
+        if self.journal is not None:
+            try:
+                self.journal.record_summary(self.summary)
+            except OSError as e:
+                print(f"[DEBUG] Could not journal history summary: {e}")
+
+
+class ModelSummarizer:
+    """Folds evicted messages into the summary with a small chat model."""
+
+    def __init__(self, model: BaseChatModel, max_words: int = 150):
+        self.model = model
+        self.max_words = max_words
+
+    def __call__(self, summary: str, messages: list[Message]) -> str:
+        prompt = SUMMARY_PROMPT.format(
+            max_words=self.max_words,
+            summary=summary or "(empty)",
+            messages="\n".join(_render(message) for message in messages),
+        )
+        _, reply = split_reasoning(self.model.invoke(prompt).content)
+        return reply.strip() or summary
+
+
+def summarize_questions(summary: str, messages: list[Message], max_chars: int) -> str:
+    """Model-free summary: the user's earlier questions, most recent kept."""
+    lines = summary.splitlines() if summary else []
+    lines += [
+        f"- {message.content.strip().splitlines()[0][:200]}"
+        for message in messages
+        if message.role == "user" and message.content.strip()
+    ]
+    while len(lines) > 1 and sum(len(line) + 1 for line in lines) > max_chars:
+        lines.pop(0)
+    return "\n".join(lines)[-max_chars:] if lines else ""
+
+
+@lru_cache()
+def get_summarizer(
+    model: Optional[str] = None,
+    keep_alive: Optional[str | int] = "30m",
+    max_tokens: int = 256,
+) -> Optional[ModelSummarizer]:
+    """Process-wide summarizer, or ``None`` to keep earlier questions instead."""
+    if not model:
+        return None
+    return ModelSummarizer(
+        ChatOllama(
+            model=model,
+            temperature=0,
+            num_predict=max_tokens,
+            keep_alive=keep_alive,
+        ),
+        max_words=max_tokens * 3 // 5,
+    )
+
+
+def _render(message: Message) -> str:
+    return f"{message.role}: {message.content}"
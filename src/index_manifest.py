@@ -0,0 +1,71 @@
+import json
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Optional
+
+
+MANIFEST_FILE = "index_manifest.json"
+
+
+@dataclass
+class FileState:
+    """Content hash and stat signature of one indexed file."""
+
+    content_hash: str
+    mtime_ns: int = 0
+    size: int = -1
+
+    def matches_stat(self, mtime_ns: int, size: int) -> bool:
+        """Whether the file is unchanged according to its stat signature."""
+        return self.mtime_ns == mtime_ns and self.size == size
+
+
+@dataclass
+class IndexManifest:
+    """Record of what the persisted vectorstore was built from.
+
+    Stored next to the Chroma collection so a restart or refresh can tell which
+    documents are still current and only embed the ones that are missing or
+    stale.
+    """
+
+    embedding_model: str
+    summary_version: int
+    files: dict[str, FileState] = field(default_factory=dict)  # keyed by relative path
+    symbol_index: bool = False  # whether the per-symbol collection was built too
+
+    def is_compatible(
+        self, embedding_model: str, summary_version: int, symbol_index: bool = False
+    ) -> bool:
+        """Whether vectors built under this manifest can be reused."""
+        return (
+            self.embedding_model == embedding_model
+            and self.summary_version == summary_version
+            and (self.symbol_index or not symbol_index)
+        )
+
+    @classmethod
+    def load(cls, persist_dir: str | Path) -> Optional["IndexManifest"]:
+        """Load the manifest from a persist directory, if there is a valid one."""
+        path = Path(persist_dir) / MANIFEST_FILE
+        if not path.exists():
+            return None
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            data["files"] = {
+                rel_path: FileState(**state)
+                for rel_path, state in data.get("files", {}).items()
+            }
+            return cls(**data)
+        except (json.JSONDecodeError, TypeError) as e:
+            print(f"[DEBUG] Ignoring unreadable index manifest {path}: {e}")
+            return None
+
+    def save(self, persist_dir: str | Path) -> None:
+        """Atomically write the manifest into a persist directory."""
+        path = Path(persist_dir) / MANIFEST_FILE
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(asdict(self), f, indent=2)
+        tmp_path.replace(path)
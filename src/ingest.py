@@ -0,0 +1,181 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Optional
+
+# Marks the end of a stage's input
+_DONE = object()
+
+
+@dataclass
+class StageStats:
+    name: str
+    items: int = 0
+    busy_seconds: float = 0.0
+
+    @property
+    def items_per_second(self) -> float:
+        return self.items / self.busy_seconds if self.busy_seconds else 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "items": self.items,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "items_per_second": round(self.items_per_second, 1),
+        }
+
+
+@dataclass
+class _Stage:
+    stats: StageStats
+    func: Callable[[Any], Any]
+    batch_size: int = 0  # > 0 groups items into lists before calling func
+    executor: Optional[Executor] = None
+    window: int = 1  # items in flight on the executor
+
+
+class Pipeline:
+    """Chain of concurrent stages connected by bounded queues.
+
+    Each stage runs in its own thread and may fan work out to an executor.
+    Queues between stages are bounded, so a slow stage applies backpressure
+    upstream and the number of items in memory stays constant regardless of
+    how many flow through. A stage function returning ``None`` drops the item.
+    """
+
+    def __init__(self, queue_size: int = 64):
+        self.queue_size = queue_size
+        self._stages: list[_Stage] = []
+        self._errors: list[BaseException] = []
+
+    def add_stage(
+        self,
+        name: str,
+        func: Callable[[Any], Any],
+        executor: Optional[Executor] = None,
+        window: Optional[int] = None,
+    ) -> "Pipeline":
+        """Add a per-item stage, optionally running ``func`` on an executor."""
+        window = window or (self.queue_size if executor else 1)
+        self._stages.append(_Stage(StageStats(name), func, 0, executor, window))
+        return self
+
+    def add_batch_stage(
+        self, name: str, func: Callable[[list], Any], batch_size: int
+    ) -> "Pipeline":
+        """Add a stage that receives items in lists of up to ``batch_size``."""
+        self._stages.append(_Stage(StageStats(name), func, batch_size))
+        return self
+
+    def run(self, source: Iterable[Any], source_name: str = "discover") -> dict[str, Any]:
+        """Feed ``source`` through every stage and wait for the pipeline to drain.
+
+        Returns per-stage throughput; re-raises the first error from any stage.
+        """
+        start = time.perf_counter()
+        source_stats = StageStats(source_name)
+        queues = [queue.Queue(self.queue_size) for _ in self._stages]
+        threads = [
+            threading.Thread(
+                target=self._run_stage,
+                args=(stage, queues[i], queues[i + 1] if i + 1 < len(queues) else None),
+                name=f"ingest-{stage.stats.name}",
+                daemon=True,
+            )
+            for i, stage in enumerate(self._stages)
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            iterator = iter(source)
+            while not self._errors:
+                item_start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    source_stats.busy_seconds += time.perf_counter() - item_start
+                source_stats.items += 1
+                queues[0].put(item)
+        finally:
+            queues[0].put(_DONE)
+            for thread in threads:
+                thread.join()
+
+        if self._errors:
+            raise self._errors[0]
+        return {
+            "elapsed_seconds": round(time.perf_counter() - start, 3),
+            "stages": {
+                stats.name: stats.as_dict()
+                for stats in [source_stats] + [stage.stats for stage in self._stages]
+            },
+        }
+
+    def _run_stage(
+        self, stage: _Stage, inbox: queue.Queue, outbox: Optional[queue.Queue]
+    ) -> None:
+        pending = deque()
+        batch = []
+
+        def emit(result: Any) -> None:
+            if result is not None and outbox is not None:
+                outbox.put(result)
+
+        def call(item: Any) -> Any:
+            item_start = time.perf_counter()
+            try:
+                return stage.func(item)
+            finally:
+                stage.stats.busy_seconds += time.perf_counter() - item_start
+                stage.stats.items += len(item) if stage.batch_size else 1
+
+        def collect() -> None:
+            stage.stats.items += 1
+            emit(pending.popleft().result())
+
+        finished = False
+        active_since = None
+        try:
+            while True:
+                item = inbox.get()
+                if item is _DONE:
+                    finished = True
+                    break
+                if self._errors:
+                    continue  # drain so upstream stages can finish
+                if stage.executor:
+                    active_since = active_since or time.perf_counter()
+                    pending.append(stage.executor.submit(stage.func, item))
+                    if len(pending) >= stage.window:
+                        collect()
+                elif stage.batch_size:
+                    batch.append(item)
+                    if len(batch) >= stage.batch_size:
+                        emit(call(batch))
+                        batch = []
+                else:
+                    emit(call(item))
+
+            while pending and not self._errors:
+                collect()
+            if batch and not self._errors:
+                emit(call(batch))
+        except BaseException as e:
+            self._errors.append(e)
+            # Keep draining so upstream puts never block forever
+            while not finished:
+                finished = inbox.get() is _DONE
+        finally:
+            if active_since is not None:
+                # Work on the executor overlaps, so count the stage's wall time
+                stage.stats.busy_seconds = time.perf_counter() - active_since
+            for future in pending:
+                future.cancel()
+            if outbox is not None:
+                outbox.put(_DONE)
@@ -0,0 +1,138 @@
+import threading
+from pathlib import Path
+from typing import Any, Optional
+from langchain_chroma import Chroma
+from langchain_core.embeddings import Embeddings
+
+from .answer_cache import AnswerCache
+from .content_store import ContentStore
+from .document_processor import DocumentProcessor
+from .embeddings import get_embeddings
+from .index_manifest import IndexManifest
+from .utils import ensure_directory
+
+SYMBOL_COLLECTION = "symbols"
+
+
+class KnowledgeBase:
+    """Process-wide index of the codebase, shared by every chat session.
+
+    Owns the document processor (and with it the cached file contents) and the
+    vectorstore. It is built once and then only read by conversations; the
+    only writer is ``refresh``, which is serialised by a lock.
+    """
+
+    def __init__(
+        self,
+        codebase_path: str | Path,
+        persist_directory: str | Path,
+        embeddings: Optional[Embeddings] = None,
+        processor: Optional[DocumentProcessor] = None,
+        symbol_index: bool = True,
+        answer_cache: Optional[AnswerCache] = None,
+    ):
+        self.codebase_path = Path(codebase_path)
+        self.persist_directory = ensure_directory(persist_directory)
+        self.processor = processor or DocumentProcessor(embeddings=embeddings)
+        self._refresh_lock = threading.Lock()
+        # One entry per class/method/function, so prompts can carry just those
+        self.symbol_store: Optional[Chroma] = None
+        if symbol_index:
+            self.symbol_store = self.processor.open_vectorstore(
+                self.persist_directory, collection_name=SYMBOL_COLLECTION
+            )
+        self.vectorstore = self._initialize_vectorstore()
+        # Answers keyed by question and the versions of the files they used
+        self.answer_cache = answer_cache
+        self._prune_answer_cache()
+
+    @classmethod
+    def from_config(cls, config: dict[str, Any]) -> "KnowledgeBase":
+        """Build a knowledge base from a loaded ``config.yaml``."""
+        cache_dir = None
+        if config.get("cache_embeddings", False):
+            cache_dir = config.get("embedding_cache_dir", "./data/embedding_cache")
+        embeddings = get_embeddings(
+            config.get("embedding_model", "nomic-embed-text"),
+            cache_dir=cache_dir,
+            max_cache_mb=config.get("embedding_cache_max_mb", 512),
+        )
+        max_file_size_kb = config.get("max_file_size_kb", 512)
+        processor = DocumentProcessor(
+            embeddings=embeddings,
+            exclude=config.get("scan_exclude") or (),
+            max_file_size=max_file_size_kb * 1024 if max_file_size_kb else None,
+            workers=config.get("ingest_workers"),
+            batch_size=config.get("ingest_batch_size", 64),
+            queue_size=config.get("ingest_queue_size", 256),
+            content_cache_bytes=config.get("content_cache_mb", 64) * 1024 * 1024,
+        )
+        answer_cache = None
+        if config.get("answer_cache", False):
+            answer_cache = AnswerCache(
+                config.get("answer_cache_dir", "./data/answer_cache"),
+                embeddings,
+                threshold=config.get("answer_cache_threshold", 0.95),
+                max_entries=config.get("answer_cache_max_entries", 1000),
+                ttl_seconds=config.get("answer_cache_ttl_hours", 168) * 3600,
+            )
+        return cls(
+            codebase_path=config["codebase_path"],
+            persist_directory=config["persist_directory"],
+            processor=processor,
+            symbol_index=config.get("symbol_index", True),
+            answer_cache=answer_cache,
+        )
+
+    def _initialize_vectorstore(self) -> Chroma:
+        print("[DEBUG] Loading documents from:", self.codebase_path)
+
+        # Warm-start from the persisted collection, streaming only what the
+        # manifest says is missing or stale through summarise/index.
+        vectorstore = self.processor.open_vectorstore(self.persist_directory)
+        self.manifest = self.processor.sync_directory(
+            self.codebase_path,
+            vectorstore,
+            IndexManifest.load(self.persist_directory),
+            symbol_store=self.symbol_store,
+        )
+        print(f"[DEBUG] Loaded {len(self.manifest.files)} documents")
+        self.manifest.save(self.persist_directory)
+        self._log_embedding_cache()
+        return vectorstore
+
+    @property
+    def content_store(self) -> ContentStore:
+        return self.processor.content_store
+
+    def refresh(self) -> None:
+        """Refresh the shared vectorstore with latest changes from the codebase."""
+        with self._refresh_lock:
+            self.manifest = self.processor.refresh_vectorstore(
+                self.codebase_path,
+                self.vectorstore,
+                self.manifest,
+                symbol_store=self.symbol_store,
+            )
+            self.manifest.save(self.persist_directory)
+            self._log_embedding_cache()
+            self._prune_answer_cache()
+
+    def embedding_cache_stats(self) -> Optional[dict[str, Any]]:
+        """Hit/miss statistics of the embedding cache, if one is in use."""
+        stats = getattr(self.processor.embeddings, "stats", None)
+        return stats() if stats else None
+
+    def _prune_answer_cache(self) -> None:
+        if self.answer_cache is not None:
+            dropped = self.answer_cache.prune(self.content_store.current_hash)
+            if dropped:
+                print(f"[DEBUG] Answer cache - dropped {dropped} stale answers")
+
+    def _log_embedding_cache(self) -> None:
+        stats = self.embedding_cache_stats()
+        if stats:
+            print(
+                f"[DEBUG] Embedding cache - hits: {stats['hits']}, "
+                f"misses: {stats['misses']}, entries: {stats['entries']}"
+            )
@@ -0,0 +1,110 @@
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Iterable
+
+# Identifier-ish runs of letters, digits and underscores
+_WORD = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+# Boundaries inside camelCase / PascalCase / HTTPServer style identifiers
+_CAMEL = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Lower-cased terms, with identifiers also split into their parts.
+
+    ``getUserName`` yields ``getusername``, ``get``, ``user`` and ``name`` so
+    both exact identifiers and their words match.
+    """
+    terms = []
+    for word in _WORD.findall(text):
+        lowered = word.lower()
+        if len(lowered) > 1:
+            terms.append(lowered)
+        parts = [
+            part.lower()
+            for chunk in word.split("_")
+            for part in _CAMEL.findall(chunk)
+        ]
+        if len(parts) > 1:
+            terms.extend(part for part in parts if len(part) > 1)
+    return terms
+
+
+class BM25Index:
+    """In-memory inverted index with Okapi BM25 scoring.
+
+    Documents are added and removed in groups (all entries that came from one
+    file), so an index can be kept in step with the vectorstore as files
+    change without being rebuilt.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: dict[str, dict[str, int]] = defaultdict(dict)
+        self._lengths: dict[str, int] = {}
+        self._terms: dict[str, tuple[str, ...]] = {}  # doc id -> distinct terms
+        self._groups: dict[str, set[str]] = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def replace(self, group: str, documents: dict[str, str]) -> None:
+        """Replace every document of ``group`` with ``documents`` (id -> text)."""
+        tokenized = {doc_id: Counter(tokenize(text)) for doc_id, text in documents.items()}
+        with self._lock:
+            self._remove_group(group)
+            for doc_id, counts in tokenized.items():
+                for term, count in counts.items():
+                    self._postings[term][doc_id] = count
+                length = sum(counts.values())
+                self._lengths[doc_id] = length
+                self._terms[doc_id] = tuple(counts)
+                self._total_length += length
+            if tokenized:
+                self._groups[group] = set(tokenized)
+
+    def remove(self, groups: Iterable[str]) -> None:
+        with self._lock:
+            for group in groups:
+                self._remove_group(group)
+
+    def search(self, query: str, k: int = 10) -> list[tuple[str, float]]:
+        """Best ``k`` documents for the query, highest BM25 score first."""
+        terms = set(tokenize(query))
+        with self._lock:
+            count = len(self._lengths)
+            if not count or not terms:
+                return []
+            average = self._total_length / count
+            scores: dict[str, float] = defaultdict(float)
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, frequency in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / average)
+                    scores[doc_id] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def _remove_group(self, group: str) -> None:
+        for doc_id in self._groups.pop(group, ()):
+            for term in self._terms.pop(doc_id):
+                postings = self._postings[term]
+                del postings[doc_id]
+                if not postings:
+                    del self._postings[term]
+            self._total_length -= self._lengths.pop(doc_id)
+
+
+def reciprocal_rank_fusion(rankings: Iterable[list[str]], k: int = 60) -> list[str]:
+    """Merge ranked id lists, scoring each id by the sum of 1 / (k + rank)."""
+    scores: dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] += 1.0 / (k + rank)
+    return sorted(scores, key=lambda doc_id: scores[doc_id], reverse=True)
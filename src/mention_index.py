@@ -0,0 +1,187 @@
+import threading
+from collections import deque
+from dataclasses import dataclass
+from pathlib import PurePosixPath
+from typing import Iterable, Optional
+
+from .symbols import Symbol
+
+# Symbol names shorter than this are too common to treat as mentions
+MIN_SYMBOL_LENGTH = 4
+
+
+@dataclass(frozen=True)
+class Mention:
+    """Something a question can refer to, and the file it resolves to."""
+
+    pattern: str
+    relative_path: str
+    kind: str  # "file", "path", "module" or "symbol"
+    symbol: Optional[Symbol] = None
+
+    @property
+    def case_sensitive(self) -> bool:
+        # File names are matched loosely, identifiers exactly
+        return self.kind == "symbol"
+
+    @property
+    def bare(self) -> bool:
+        """A symbol name without its class, which may just be an English word."""
+        return self.kind == "symbol" and "." not in self.pattern
+
+
+def file_mentions(relative_path: str) -> list[Mention]:
+    """File name, relative path and (for Python) dotted module path of a file."""
+    path = PurePosixPath(relative_path)
+    mentions = [Mention(path.name, relative_path, "file")]
+    if len(path.parts) > 1:
+        mentions.append(Mention(relative_path, relative_path, "path"))
+    if path.suffix == ".py":
+        parts = path.with_suffix("").parts
+        if parts[-1] == "__init__":
+            parts = parts[:-1]
+        if len(parts) > 1:
+            mentions.append(Mention(".".join(parts), relative_path, "module"))
+    return mentions
+
+
+def symbol_mentions(symbols: Iterable[Symbol]) -> list[Mention]:
+    """Qualified names of every symbol, and bare names of top-level ones."""
+    mentions = []
+    for symbol in symbols:
+        names = {symbol.qualname}
+        if symbol.kind != "method":
+            names.add(symbol.qualname.rsplit(".", 1)[-1])
+        for name in names:
+            if len(name) >= MIN_SYMBOL_LENGTH:
+                mentions.append(Mention(name, symbol.relative_path, "symbol", symbol))
+    return mentions
+
+
+class MentionIndex:
+    """Finds every known file, module and symbol name in a text in one pass.
+
+    Patterns are compiled into an Aho-Corasick automaton, so matching costs
+    time proportional to the text, not to the number of files. Patterns are
+    kept in groups (one per file) that can be replaced as files change; the
+    automaton is rebuilt lazily on the next lookup after a change.
+    """
+
+    def __init__(self):
+        self._groups: dict[str, list[Mention]] = {}
+        self._lock = threading.Lock()
+        self._automaton: Optional[_Automaton] = None
+
+    def replace(self, group: str, mentions: list[Mention]) -> None:
+        with self._lock:
+            if mentions:
+                self._groups[group] = mentions
+            else:
+                self._groups.pop(group, None)
+            self._automaton = None
+
+    def remove(self, groups: Iterable[str]) -> None:
+        with self._lock:
+            for group in groups:
+                self._groups.pop(group, None)
+            self._automaton = None
+
+    def compile(self) -> "_Automaton":
+        """Build the automaton now rather than on the next lookup."""
+        with self._lock:
+            if self._automaton is None:
+                self._automaton = _Automaton(
+                    mention for mentions in self._groups.values() for mention in mentions
+                )
+            return self._automaton
+
+    def find(self, text: str) -> list[Mention]:
+        """Distinct mentions in ``text``, in order of first appearance.
+
+        A match only counts if it is not part of a longer identifier, so
+        ``a.py`` does not match inside ``data.py``. Bare symbol names must
+        also look like code (see ``_looks_like_code``), so a function called
+        ``main`` is not mentioned by "the main difference".
+        """
+        automaton = self.compile()
+        lowered = text.lower()
+        exact = len(lowered) == len(text)
+        found = {}
+        for end, mention in automaton.matches(lowered):
+            start = end - len(mention.pattern)
+            if not (_is_boundary(lowered, start - 1) and _is_boundary(lowered, end)):
+                continue
+            if mention.case_sensitive and exact and text[start:end] != mention.pattern:
+                continue
+            if mention.bare and not _looks_like_code(text if exact else lowered, start, end):
+                continue
+            found.setdefault(mention, None)
+        return list(found)
+
+
+def _is_boundary(text: str, index: int) -> bool:
+    if index < 0 or index >= len(text):
+        return True
+    char = text[index]
+    return not (char.isalnum() or char == "_")
+
+
+def _looks_like_code(text: str, start: int, end: int) -> bool:
+    """Whether ``text[start:end]`` reads as an identifier rather than a word.
+
+    It does if it contains an underscore or an inner capital (``load_data``,
+    ``RAGChain``), is called or dereferenced (``main()``, ``Planner.score``)
+    or is quoted in backticks.
+    """
+    name = text[start:end]
+    if "_" in name or any(char.isupper() for char in name[1:]):
+        return True
+    after = text[end:end + 2]
+    if after[:1] == "(" or (after[:1] == "." and not _is_boundary(after, 1)):
+        return True
+    return text[start - 1:start] == "`" and text[end:end + 1] == "`"
+
+
+class _Automaton:
+    """Aho-Corasick automaton over lower-cased patterns."""
+
+    def __init__(self, mentions: Iterable[Mention]):
+        self.goto: list[dict[str, int]] = [{}]
+        self.fail: list[int] = [0]
+        self.output: list[list[Mention]] = [[]]
+
+        for mention in mentions:
+            state = 0
+            for char in mention.pattern.lower():
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                state = next_state
+            self.output[state].append(mention)
+
+        # Breadth-first, so every state's fail link is final before its children
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                link = self.goto[fallback].get(char, 0)
+                self.fail[child] = link if link != child else 0
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def matches(self, text: str) -> Iterable[tuple[int, Mention]]:
+        """Yield ``(end_index, mention)`` for every pattern occurrence."""
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for mention in self.output[state]:
+                yield index + 1, mention
@@ -1,47 +1,95 @@
-from dataclasses import dataclass, field
-from datetime import datetime
-from langchain.prompts import ChatPromptTemplate
+import asyncio
+import time
+from contextlib import aclosing, closing
+from functools import lru_cache
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_ollama import ChatOllama
 from langchain.schema import StrOutputParser
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from langchain_core.runnables import RunnablePassthrough
 from langchain_chroma import Chroma
 
-from .search import WebSearcher
+from .answer_cache import AnswerCache, CachedAnswer
+from .router import KeywordRouter, Route
+from .search import DEFAULT_CACHE_DIR, WebSearcher, get_web_searcher
 from .document_processor import DocumentProcessor
-
-
-@dataclass
-class Message:
-    role: str
-    content: str
-    timestamp: datetime = field(default_factory=datetime.now)
-
-
-class ChatContext:
-    def __init__(self, max_messages: int = 10):
-        self.messages: list[Message] = []
-        self.max_messages = max_messages
-
-    def add_message(self, role: str, content: str, timestamp: datetime | None = None):
-        """Add a message with an optional specific timestamp."""
-        message = Message(
-            role=role, content=content, timestamp=timestamp or datetime.now()
-        )
-        self.messages.append(message)
-        print(f"[DEBUG] Added message to context - Role: {role}")
-        total_messages = len(self.messages)
-        active_messages = min(total_messages, self.max_messages)
-        print(
-            f"[DEBUG] Context size - Active: {active_messages}/{self.max_messages}, Total stored: {total_messages}"
-        )
-
-    def get_context_string(self) -> str:
-        return "\n".join(
-            [
-                f"{msg.role}: {msg.content}"
-                for msg in self.messages[-self.max_messages :]
-            ]
-        )
+from .context_packer import ContextPacker, PackedContext, TokenCounter
+from .history import ChatContext, Message, Summarizer
+from .reasoning import ReasoningSplitter, split_reasoning
+from .lexical_index import BM25Index, reciprocal_rank_fusion
+from .symbols import Symbol, extract_symbols, render_symbols
+
+class SentinelDetector:
+    """Incrementally decides whether a streamed local answer asks for a web search.
+
+    The local prompt tells the model to reply with exactly the sentinel when it
+    needs the web. Chunks are fed in as they stream; text that could still turn
+    out to be the sentinel is held back, everything else is released at once.
+    Reasoning inside a leading ``<think>`` block is released but never
+    matched, so the model musing about the sentinel does not trigger a search.
+    """
+
+    def __init__(self, sentinel: str = "NEED_WEB_SEARCH"):
+        self.sentinel = sentinel
+        self.text = ""
+        self.found = False
+        self._released = 0
+
+    @property
+    def released_any(self) -> bool:
+        return self._released > 0
+
+    def feed(self, chunk: str) -> str:
+        """Add a streamed chunk and return the text that is now safe to emit."""
+        self.text += chunk
+        if self.found:
+            return ""
+
+        stripped = self.text.lstrip()
+        if stripped.startswith("<think>"):
+            think_end = self.text.find("</think>")
+            if think_end == -1:
+                return self._release(len(self.text))
+            answer_start = think_end + len("</think>")
+        elif "<think>".startswith(stripped):
+            return ""  # may still be opening a reasoning block
+        else:
+            answer_start = 0
+
+        answer = self.text[answer_start:]
+        if self.sentinel in answer:
+            self.found = True
+            return ""
+        if self.sentinel.startswith(answer.strip().strip("\"'`*")):
+            # Could still be the sentinel, hold the answer back
+            return self._release(answer_start)
+        return self._release(len(self.text))
+
+    def flush(self) -> str:
+        """Release whatever is still held back once the stream has ended."""
+        return "" if self.found else self._release(len(self.text))
+
+    def _release(self, end: int) -> str:
+        released = self.text[self._released : end]
+        self._released = max(self._released, end)
+        return released
+
+
+@lru_cache()
+def get_chat_model(
+    model_name: str,
+    temperature: float = 0.6,
+    context_window: int = 8192,
+    keep_alive: Optional[str | int] = "30m",
+) -> ChatOllama:
+    """Process-wide chat model client, so sessions share its connection pool."""
+    return ChatOllama(
+        model=model_name,
+        temperature=temperature,
+        num_ctx=context_window,
+        keep_alive=keep_alive,
+    )
 
 
 class RAGChain:
@@ -54,231 +102,548 @@ class RAGChain:
         temperature: float = 0.6,
         max_history: int = 5,
         project_description: str = "No project description provided.",
+        prefetch_web: bool = False,
+        symbol_store: Optional[Chroma] = None,
+        k_symbols: int = 8,
+        context_window: int = 8192,
+        reserve_tokens: int = 1024,
+        context_shares: Optional[dict[str, float]] = None,
+        token_counter: Optional[TokenCounter] = None,
+        answer_cache: Optional[AnswerCache] = None,
+        web_searcher: Optional[WebSearcher] = None,
+        web_research: bool = False,
+        web_max_queries: int = 4,
+        web_concurrency: int = 3,
+        web_deadline: float = 8.0,
+        keep_alive: Optional[str | int] = "30m",
+        router: Optional[Any] = None,
+        history_tokens: Optional[int] = None,
+        summarizer: Optional[Summarizer] = None,
+        summary_tokens: int = 256,
     ):
         self.vectorstore = vectorstore
+        # Per-symbol index; when present, prompts carry matching symbols
+        # instead of whole files
+        self.symbol_store = symbol_store
+        self.k_symbols = k_symbols
         self.doc_processor = doc_processor
-        self.model = ChatOllama(model=model_name, temperature=temperature)
-        self.web_searcher = WebSearcher()
-        self.chat_context = ChatContext(max_messages=max_history)
+        # The same keep_alive on every request keeps the model, and with it
+        # the cached prompt prefix, loaded between turns
+        self.model = get_chat_model(model_name, temperature, context_window, keep_alive)
+        self.web_searcher = web_searcher or get_web_searcher(DEFAULT_CACHE_DIR)
+        # Search for each part of a compound question concurrently
+        self.web_research = web_research
+        self.web_options = {
+            "max_queries": web_max_queries,
+            "concurrency": web_concurrency,
+            "deadline": web_deadline,
+        }
         self.k_docs = k_docs
         self.project_description = project_description
         self.rag_enabled = True
-
-        # Initialize prompts as class attributes
-        self.local_prompt = ChatPromptTemplate.from_template("""
-        You are a helpful research assistant for a project associated with a Python codebase.
-
-        About this project:
-        {project_description}                                                     
-
-        First check if you can answer using just the local codebase context or your own knowledge.
-        If you can answer confidently using only this context, do so.
-        If you need a web search or external knowledge to provide a complete answer, respond with exactly "NEED_WEB_SEARCH".
-                                                             
-        Previous conversation:
-        {chat_history}
-        
-        Relevant code files (if any):
-        {code_context}
-        
-        Question about the project: {question}
-        
-        When answering:
-        1. Reference specific files and code structures you see in the context
-        2. If you describe functionality, make sure it matches the actual implementation shown
-        3. If you're unsure about something or can't find it in the context, say so
-        4. Focus on the actual code implementation rather than making assumptions
-        """)
-
-        self.web_prompt = ChatPromptTemplate.from_template("""
-        Answer the question using both the codebase context and web search results.
-        Make sure to consider both sources of information in your response.
-        
-        About this project:
-        {project_description}                                                  
-
-        Previous conversation:
-        {chat_history}
-        
-        Relevant code files:
-        {code_context}
-        
-        Web results:
-        {web_results}
-        
-        Question: {question}
-        """)
-
-        self.conversation_prompt = ChatPromptTemplate.from_template("""
-        You are a helpful AI assistant. Use the conversation history and your knowledge to provide informed responses.
-        
-        About this project:
-        {project_description}
-        
-        Previous conversation:
-        {chat_history}
-        
-        Question: {question}
-        """)
+        # Speculatively start a web search alongside retrieval in async mode
+        self.prefetch_web = prefetch_web
+        # Keeps every prompt inside the model's context window
+        self.packer = ContextPacker(
+            token_counter, context_window, reserve_tokens, context_shares
+        )
+        # Recent turns up to the history share of the window; older ones are
+        # summarised so long sessions keep a constant prompt size
+        if history_tokens is None:
+            shares = self.packer.shares
+            history_tokens = int(
+                (context_window - reserve_tokens)
+                * shares.get("history", 0.0)
+                / (sum(shares.values()) or 1.0)
+            )
+        self.chat_context = ChatContext(
+            max_messages=max_history,
+            max_tokens=history_tokens,
+            counter=self.packer.counter,
+            summarizer=summarizer,
+            summary_tokens=summary_tokens,
+        )
+        self.last_context: Optional[PackedContext] = None
+        # Answers to earlier standalone questions, shared by every session
+        self.answer_cache = answer_cache
+        self.model_name = model_name
+        self.last_sources: dict[str, Optional[str]] = {}
+
+        # Small, fast decisions (needs code? needs the web? follow-up?) are
+        # made by the router so the large model only writes answers
+        self.router = router or KeywordRouter()
+        self.last_route: Optional[Route] = None
+        # Code the user pinned for the session; it sits in the system prompt
+        self.pinned: list[str] = []
+
+        # Prompts are laid out so consecutive turns share a long prefix that
+        # Ollama can serve from its KV cache: a system message that only
+        # changes when a file is pinned, then the conversation as chat
+        # messages, then this turn's code and question.
+        rag_system = """You are a helpful research assistant for a project associated with a Python codebase.
+
+First check if you can answer using just the local codebase context or your own knowledge.
+If you can answer confidently using only this context, do so.
+If you need a web search or external knowledge to provide a complete answer, respond with exactly "NEED_WEB_SEARCH".
+
+When answering:
+1. Reference specific files and code structures you see in the context
+2. If you describe functionality, make sure it matches the actual implementation shown
+3. If you're unsure about something or can't find it in the context, say so
+4. Focus on the actual code implementation rather than making assumptions
+
+About this project:
+{project_description}
+
+Pinned code files:
+{pinned_code}"""
+        local_turn = """Relevant code files (if any):
+{code_context}
+
+Question about the project: {question}"""
+
+        self.local_prompt = ChatPromptTemplate.from_messages([
+            ("system", rag_system),
+            MessagesPlaceholder("chat_history"),
+            ("human", local_turn),
+        ])
+
+        # Extends the local prompt, so the web pass reuses its prefill
+        self.web_prompt = ChatPromptTemplate.from_messages([
+            ("system", rag_system),
+            MessagesPlaceholder("chat_history"),
+            ("human", local_turn),
+            ("human", """Web results:
+{web_results}
+
+Answer the question above using both the codebase context and these web results.
+Make sure to consider both sources of information in your response."""),
+        ])
+
+        self.conversation_prompt = ChatPromptTemplate.from_messages([
+            ("system", """You are a helpful AI assistant. Use the conversation history and your knowledge to provide informed responses.
+
+About this project:
+{project_description}"""),
+            MessagesPlaceholder("chat_history"),
+            ("human", "{question}"),
+        ])
 
         print(f"[DEBUG] Initialized RAGChain with {max_history} max history")
         self.chain = self._build_chain()
 
-    def _should_search_codebase(self, question: str) -> bool:
-        """Determine if a question likely needs codebase context."""
-        # Keywords that suggest code-related queries
-        code_indicators = {
-            "code",
-            "file",
-            "function",
-            "class",
-            "method",
-            "implementation",
-            "module",
-            "import",
-            "variable",
-            "define",
-            "declaration",
-            "return",
-            "parameter",
-            "argument",
-            "error",
-            "bug",
-            "issue",
-            "fix",
-            ".py",
-            "python",
-            "script",
-        }
-
-        question_lower = question.lower()
-
-        # Check for code-related keywords
-        has_code_keywords = any(
-            indicator in question_lower for indicator in code_indicators
-        )
-
-        # Check for specific file mentions
-        has_file_mention = any(
-            filename.lower() in question_lower
-            for filename in self.doc_processor.file_contents.keys()
+    def _route(self, question: str) -> Route:
+        """Decide what the question needs, using the configured router."""
+        previous = next(
+            (m.content for m in reversed(self.chat_context.messages) if m.role == "user"),
+            None,
         )
-
-        return has_code_keywords or has_file_mention
-
-    def _format_code_context(self, file_contents: dict[str, str]) -> str:
-        """Format multiple files into a readable context."""
-        if not file_contents:
+        route = self.router.route(question, previous)
+        # Mentions of specific files, modules or symbols always need code
+        if not route.needs_code and self.doc_processor.mention_index.find(question):
+            route.needs_code = True
+        if route.follow_up and previous:
+            # Retrieve for the conversation, not just "why does it do that?"
+            route.query = f"{previous}\n{question}"
+        self.last_route = route
+        print(f"[DEBUG] Route: {route}")
+        return route
+
+    def _format_code_context(self, sections: Optional[list[str]]) -> str:
+        """Format packed code sections into a readable context."""
+        if sections is None:
+            return "No code context needed for this question."
+        if not sections:
             return "No relevant code files found."
-
-        sections = []
-        for filename, content in file_contents.items():
-            sections.append(f"=== {filename} ===\n{content}\n")
         return "\n\n".join(sections)
 
+    def _code_sections(self, file_contents: dict[str, str]) -> list[str]:
+        """One section per retrieved file, in retrieval order."""
+        return [
+            f"=== {filename} ===\n{content}\n"
+            for filename, content in file_contents.items()
+        ]
+
     def _get_relevant_files(self, question: str) -> dict[str, str]:
-        """Get relevant files based on the question."""
-        # First check if any specific files are mentioned
-        lower_question = question.lower()
+        """Get relevant files based on the question, keyed by relative path."""
+        # First check if any specific files, modules or symbols are mentioned
+        mentions = self.doc_processor.mention_index.find(question)
         mentioned_files = {}
-
-        # Look for specifically mentioned files first
-        for filename in self.doc_processor.file_contents.keys():
-            if filename.lower() in lower_question:
-                content = self.doc_processor.get_full_content(filename)
+        mentioned_symbols: dict[str, list[Symbol]] = {}
+        for mention in mentions:
+            if mention.symbol is None:
+                content = self.doc_processor.get_full_content(mention.relative_path)
                 if content:
-                    mentioned_files[filename] = content
+                    mentioned_files[mention.relative_path] = content
+            else:
+                mentioned_symbols.setdefault(mention.relative_path, []).append(
+                    mention.symbol
+                )
+
+        # Symbols are only shown on their own when their file is not
+        mentioned_files.update(
+            self._render_symbols(
+                {
+                    path: symbols
+                    for path, symbols in mentioned_symbols.items()
+                    if path not in mentioned_files
+                }
+            )
+        )
 
         # If specific files were mentioned, prioritize those
         if mentioned_files:
             return mentioned_files
 
-        # Otherwise, use vector similarity to find relevant files
+        if self.symbol_store is not None:
+            relevant_symbols = self._get_relevant_symbols(question)
+            if relevant_symbols:
+                return relevant_symbols
+
+        # Otherwise, fuse vector similarity with exact identifier matches
         docs = self.vectorstore.as_retriever(
             search_type="similarity", search_kwargs={"k": self.k_docs}
         ).invoke(question)
 
+        vector = [
+            doc.metadata["relative_path"]
+            for doc in docs
+            if doc.metadata.get("relative_path")
+            and doc.metadata.get("full_content_available")
+        ]
+        lexical = self._lexical_search(self.doc_processor.file_index, question, self.k_docs)
+
         relevant_files = {}
-        for doc in docs:
-            filename = doc.metadata.get("file_name")
-            if filename and doc.metadata.get("full_content_available"):
-                content = self.doc_processor.get_full_content(filename)
-                if content:
-                    relevant_files[filename] = content
+        for relative_path in reciprocal_rank_fusion([vector, lexical])[: self.k_docs]:
+            content = self.doc_processor.get_full_content(relative_path)
+            if content:
+                relevant_files[relative_path] = content
 
         return relevant_files
 
+    def _lexical_search(self, index: BM25Index, question: str, k: int) -> list[str]:
+        """Ids of the best BM25 matches for the question."""
+        start = time.perf_counter()
+        results = [doc_id for doc_id, _ in index.search(question, k)]
+        print(
+            f"[DEBUG] Lexical search found {len(results)} matches in "
+            f"{(time.perf_counter() - start) * 1000:.2f}ms"
+        )
+        return results
+
+    def _get_relevant_symbols(self, question: str) -> dict[str, str]:
+        """Source of the classes and functions most similar to the question.
+
+        Matches are grouped by file and cut out of the cached file content,
+        keyed by a label naming the file and the symbols shown.
+        """
+        docs = self.symbol_store.similarity_search(question, k=self.k_symbols)
+        metadatas = {Symbol.from_metadata(doc.metadata).id: doc.metadata for doc in docs}
+        lexical = self._lexical_search(
+            self.doc_processor.symbol_index, question, self.k_symbols
+        )
+        ranked = reciprocal_rank_fusion([list(metadatas), lexical])[: self.k_symbols]
+
+        missing = [doc_id for doc_id in ranked if doc_id not in metadatas]
+        if missing:
+            stored = self.symbol_store.get(ids=missing, include=["metadatas"])
+            metadatas.update(zip(stored["ids"], stored["metadatas"]))
+
+        by_file: dict[str, list[Symbol]] = {}
+        for doc_id in ranked:
+            metadata = metadatas.get(doc_id)
+            if metadata:
+                symbol = Symbol.from_metadata(metadata)
+                by_file.setdefault(symbol.relative_path, []).append(symbol)
+
+        relevant_symbols = self._render_symbols(by_file)
+        print(
+            f"[DEBUG] Found {len(ranked)} relevant symbols "
+            f"in {len(relevant_symbols)} files"
+        )
+        return relevant_symbols
+
+    def _render_symbols(self, by_file: dict[str, list[Symbol]]) -> dict[str, str]:
+        """Cut symbols out of their files, keyed by file and symbol names."""
+        rendered = {}
+        for relative_path, symbols in by_file.items():
+            content = self.doc_processor.get_full_content(relative_path)
+            if not content:
+                continue
+            if self.doc_processor.content_store.changed(relative_path):
+                # Line spans are from the indexed version; find them again
+                current = {
+                    symbol.qualname: symbol
+                    for symbol in extract_symbols(content, relative_path)
+                }
+                symbols = [
+                    current[symbol.qualname]
+                    for symbol in symbols
+                    if symbol.qualname in current
+                ]
+                if not symbols:
+                    continue
+            names = ", ".join(symbol.qualname for symbol in symbols)
+            rendered[f"{relative_path} ({names})"] = render_symbols(content, symbols)
+        return rendered
+
+    def _prepare_turn(
+        self, question: str, route: Route
+    ) -> tuple[ChatPromptTemplate, dict]:
+        """Pick the prompt for this turn and gather its inputs.
+
+        Must run before the question is added to the chat context, so the
+        history does not contain the question twice.
+        """
+        self.last_sources = {}
+        if not self.rag_enabled:
+            # Simple conversation mode without RAG or web search
+            print("[DEBUG] RAG disabled, using conversation-only mode")
+            return self.conversation_prompt, self._pack_inputs(
+                self.conversation_prompt, question
+            )
+
+        code_sections = self._get_code_context(question, route)
+        return self.local_prompt, self._pack_inputs(
+            self.local_prompt, question, code_sections
+        )
+
+    def _get_code_context(
+        self, question: str, route: Optional[Route] = None
+    ) -> Optional[list[str]]:
+        """Retrieve ranked code sections, if the question seems code-related."""
+        route = route or self._route(question)
+        if not route.needs_code:
+            print(
+                "[DEBUG] Question doesn't appear code-related, skipping codebase search"
+            )
+            return None
+
+        print("[DEBUG] Question appears code-related, searching codebase...")
+        relevant_files = self._get_relevant_files(route.query or question)
+        self.last_sources = self._sources(relevant_files)
+        return self._code_sections(relevant_files)
+
+    def _sources(self, relevant_files: dict[str, str]) -> dict[str, Optional[str]]:
+        """Content hash of every file behind the retrieved sections."""
+        store = self.doc_processor.content_store
+        sources = {}
+        for label in relevant_files:
+            # Symbol sections are labelled "path (names)"
+            relative_path = label if label in store else label.rsplit(" (", 1)[0]
+            sources[relative_path] = store.current_hash(relative_path)
+        return sources
+
+    def _cache_scope(self) -> str:
+        return f"{self.model_name}:{'rag' if self.rag_enabled else 'conversation'}"
+
+    def _lookup_answer(
+        self, question: str, route: Route
+    ) -> tuple[Optional[CachedAnswer], Optional[list[float]]]:
+        """Cached answer to a similar earlier question, and the question's vector.
+
+        Follow-up questions depend on the conversation and are never cached.
+        """
+        if self.answer_cache is None or route.follow_up:
+            return None, None
+        try:
+            vector = self.answer_cache.embed(question)
+            cached = self.answer_cache.lookup(
+                question,
+                self._cache_scope(),
+                self.doc_processor.content_store.current_hash,
+                vector=vector,
+            )
+        except Exception as e:
+            print(f"[DEBUG] Answer cache lookup failed: {e}")
+            return None, None
+        if cached:
+            print(
+                f"[DEBUG] Answer cache hit ({cached.similarity:.3f}): "
+                f"{cached.question[:50]}"
+            )
+        return cached, vector
+
+    def _store_answer(
+        self, question: str, answer: str, vector: Optional[list[float]]
+    ) -> None:
+        """Remember a locally produced answer with the files it was based on."""
+        if self.answer_cache is None or vector is None:
+            return
+        if not self.last_sources:
+            return  # nothing to invalidate it by, so it could go stale unseen
+        if any(content_hash is None for content_hash in self.last_sources.values()):
+            return  # cannot tell later whether these files changed
+        try:
+            self.answer_cache.store(
+                question, answer, self._cache_scope(), self.last_sources, vector=vector
+            )
+        except Exception as e:
+            print(f"[DEBUG] Answer cache store failed: {e}")
+
+    def _pack_inputs(
+        self,
+        prompt: ChatPromptTemplate,
+        question: str,
+        code_sections: Optional[list[str]] = None,
+    ) -> dict:
+        """Fit description, history and code into the context window.
+
+        History is ranked summary first, then newest first, so the oldest
+        messages are the ones dropped. Pinned files rank ahead of retrieved code. With RAG on, the
+        web share is held back for a later search.
+        """
+        window = self.chat_context.messages
+        summary = self.chat_context.get_summary()
+        sections = {
+            "project_description": [self.project_description],
+            "history": ([summary] if summary else [])
+            + [msg.content for msg in reversed(window)],
+        }
+        pinned = []
+        if prompt is not self.conversation_prompt:
+            pinned = self._pinned_sections()
+            retrieved = [
+                section for section in code_sections or [] if section not in pinned
+            ]
+            sections["code"] = pinned + retrieved
+
+        fixed_text = "".join(
+            message.content
+            for message in prompt.format_messages(
+                **{
+                    name: [] if name == "chat_history" else ""
+                    for name in prompt.input_variables
+                }
+            )
+        ) + question
+        packed = self.packer.pack(
+            fixed_text, sections, reserve=("web",) if self.rag_enabled else ()
+        )
+        self.last_context = packed
+        print(f"[DEBUG] Context tokens: {packed.report()}")
+
+        kept_history = packed.items["history"]
+        lead = []
+        if summary and kept_history:
+            lead = [
+                SystemMessage(
+                    f"Summary of the earlier conversation:\n{kept_history[0]}"
+                )
+            ]
+            kept_history = kept_history[1:]
+        history = [
+            HumanMessage(content) if msg.role == "user" else AIMessage(content)
+            for msg, content in zip(reversed(window), kept_history)
+        ]
+        prompt_inputs = {
+            "question": question,
+            "chat_history": lead + history[::-1],
+            "project_description": "\n".join(packed.items["project_description"]),
+        }
+        if prompt is not self.conversation_prompt:
+            code = packed.items["code"]
+            prompt_inputs["pinned_code"] = (
+                "\n\n".join(code[: len(pinned)]) or "No files pinned."
+            )
+            prompt_inputs["code_context"] = self._format_code_context(
+                None if code_sections is None else code[len(pinned) :]
+            )
+        return prompt_inputs
+
+    def pin(self, relative_path: str) -> bool:
+        """Keep a file in the system prompt for the rest of the session."""
+        if relative_path in self.pinned:
+            return True
+        if not self.doc_processor.get_full_content(relative_path):
+            return False
+        self.pinned.append(relative_path)
+        return True
+
+    def unpin(self, relative_path: str) -> bool:
+        if relative_path not in self.pinned:
+            return False
+        self.pinned.remove(relative_path)
+        return True
+
+    def _pinned_sections(self) -> list[str]:
+        contents = {}
+        for relative_path in self.pinned:
+            content = self.doc_processor.get_full_content(relative_path)
+            if content:
+                contents[relative_path] = content
+        return self._code_sections(contents)
+
+    def _pack_web_results(self, results: list[dict]) -> str:
+        """Format web results into whatever budget the other sections left."""
+        items = [self.web_searcher.format_results([result]) for result in results]
+        packed = self.last_context
+        kept, tokens, dropped = self.packer.fit(items, packed.spare)
+        packed.items["web"] = kept
+        packed.tokens["web"] = tokens
+        packed.dropped["web"] = dropped
+        print(f"[DEBUG] Context tokens: {packed.report()}")
+        return "\n".join(kept)
+
     def process_response(self, inputs: dict) -> str:
         try:
             print("[DEBUG] Processing response...")
-            chat_history = self.chat_context.get_context_string()
+            route = self._route(inputs["question"])
+            cached, vector = self._lookup_answer(inputs["question"], route)
+            if cached:
+                self.chat_context.add_message("user", inputs["question"])
+                self.chat_context.add_message("assistant", cached.answer)
+                return cached.answer
+
+            prompt, prompt_inputs = self._prepare_turn(inputs["question"], route)
 
             # Store the user's question
             self.chat_context.add_message("user", inputs["question"])
 
-            if not self.rag_enabled:
-                # Simple conversation mode without RAG or web search
-                print("[DEBUG] RAG disabled, using conversation-only mode")
-                conversation_chain = (
-                    self.conversation_prompt | self.model | StrOutputParser()
-                )
-                final_response = conversation_chain.invoke(
-                    {
-                        "question": inputs["question"],
-                        "chat_history": chat_history,
-                        "project_description": self.project_description,
-                    }
-                )
+            local_chain = prompt | self.model | StrOutputParser()
+            if self.rag_enabled and route.web_only:
+                print("[DEBUG] Router sent the question to the web, skipping the local pass")
+                local_response, needs_web = "", True
+            elif self.rag_enabled:
+                # Stop generating as soon as the model asks for the web
+                detector = SentinelDetector()
+                with closing(iter(local_chain.stream(prompt_inputs))) as stream:
+                    for chunk in stream:
+                        detector.feed(chunk)
+                        if detector.found:
+                            break
+                local_response = detector.text
+                needs_web = detector.found
             else:
-                # Only search codebase if RAG is enabled and question seems code-related
-                code_context = "No code context needed for this question."
-                if self._should_search_codebase(inputs["question"]):
-                    print(
-                        "[DEBUG] Question appears code-related, searching codebase..."
-                    )
-                    relevant_files = self._get_relevant_files(inputs["question"])
-                    code_context = self._format_code_context(relevant_files)
-                else:
-                    print(
-                        "[DEBUG] Question doesn't appear code-related, skipping codebase search"
-                    )
-
-                local_chain = self.local_prompt | self.model | StrOutputParser()
-                local_response = local_chain.invoke(
-                    {
-                        "question": inputs["question"],
-                        "code_context": code_context,
-                        "chat_history": chat_history,
-                        "project_description": self.project_description,
-                    }
-                )
-
-                if "NEED_WEB_SEARCH" in local_response:
-                    print(
-                        "[DEBUG] Local context insufficient, performing web search..."
-                    )
-                    try:
-                        web_results = self.web_searcher.search(inputs["question"])
-                        formatted_results = self.web_searcher.format_results(
-                            web_results
+                local_response = local_chain.invoke(prompt_inputs)
+                needs_web = False
+
+            if needs_web:
+                print("[DEBUG] Local context insufficient, performing web search...")
+                try:
+                    if self.web_research:
+                        web_results = self.web_searcher.research(
+                            inputs["question"], **self.web_options
                         )
+                    else:
+                        web_results = self.web_searcher.search(inputs["question"])
+                    prompt_inputs["web_results"] = self._pack_web_results(web_results)
 
-                        web_chain = self.web_prompt | self.model | StrOutputParser()
-                        final_response = web_chain.invoke(
-                            {
-                                "question": inputs["question"],
-                                "code_context": code_context,
-                                "web_results": formatted_results,
-                                "chat_history": chat_history,
-                                "project_description": self.project_description,
-                            }
-                        )
-                    except Exception as e:
-                        final_response = f"Error during web search: {str(e)}"
-                else:
-                    final_response = local_response
+                    web_chain = self.web_prompt | self.model | StrOutputParser()
+                    reasoning, final_response = split_reasoning(
+                        web_chain.invoke(prompt_inputs)
+                    )
+                except Exception as e:
+                    reasoning = ""
+                    final_response = f"Error during web search: {str(e)}"
+            else:
+                reasoning, final_response = split_reasoning(local_response)
+                self._store_answer(inputs["question"], final_response, vector)
 
-            self.chat_context.add_message("assistant", final_response)
+            # Reasoning is kept with the message but never fed back to the model
+            self.chat_context.add_message(
+                "assistant", final_response, reasoning=reasoning or None
+            )
             return final_response
 
         except Exception as e:
@@ -286,6 +651,220 @@ class RAGChain:
             print(f"[DEBUG] {error_msg}")
             return error_msg
 
+    async def astream_response(self, question: str) -> AsyncIterator[dict[str, Any]]:
+        """Answer a question, yielding events as the model generates tokens.
+
+        Yields ``delta`` events with incremental answer text, ``reasoning``
+        events with the model's ``<think>`` text, a ``reset`` event if the
+        draft so far is discarded (the local pass asked for a web search), a
+        ``status`` event while searching and a final ``done`` event carrying
+        the full response, its reasoning and timing stats.
+
+        Codebase retrieval runs in a worker thread while the history is
+        formatted. With ``prefetch_web``, or when the router expects the
+        question to need the web, a web search is started at the same time
+        so its results are ready if the local pass asks for them. When that
+        expectation comes from the embedding or model router, the local pass
+        is skipped and the question goes straight to the web pass.
+        A standalone question similar enough to an earlier one, whose files
+        have not changed since, is answered from the answer cache instead.
+        """
+        start = time.perf_counter()
+        first_token_at = None
+        path = "local" if self.rag_enabled else "conversation"
+        stages: dict[str, float] = {}
+        # Prompt tokens Ollama actually evaluated (not served from its cache)
+        prefill: dict[str, dict[str, float]] = {}
+        self.last_sources = {}
+
+        route, stages["route"] = await _timed_thread(self._route, question)
+        cached, vector = None, None
+        if self.answer_cache is not None:
+            (cached, vector), stages["answer_cache"] = await _timed_thread(
+                self._lookup_answer, question, route
+            )
+        if cached:
+            self.chat_context.add_message("user", question)
+            self.chat_context.add_message("assistant", cached.answer)
+            yield {"type": "delta", "content": cached.answer}
+            end = time.perf_counter()
+            yield {
+                "type": "done",
+                "content": cached.answer,
+                "stats": {
+                    "path": "cache",
+                    "time_to_first_token": round(end - start, 3),
+                    "total_time": round(end - start, 3),
+                    "response_chars": len(cached.answer),
+                    "stages": {name: round(t, 3) for name, t in stages.items()},
+                    "similarity": round(cached.similarity, 3),
+                    "answer_cache": self.answer_cache.stats(),
+                },
+            }
+            return
+
+        # A classifier router's web decision skips the local pass; otherwise it
+        # only starts the search early and the local pass decides
+        web_only = self.rag_enabled and route.web_only
+        needs_web = False
+        web_prefetch = None
+        asked = answered = False
+        if self.rag_enabled and (self.prefetch_web or route.needs_web):
+            web_prefetch = asyncio.create_task(
+                _timed(self._search_web, question)
+            )
+        try:
+            if self.rag_enabled:
+                # Chroma is synchronous, keep retrieval off the event loop
+                retrieval = asyncio.create_task(
+                    _timed_thread(self._get_code_context, question, route)
+                )
+
+            history_start = time.perf_counter()
+            prompt = self.local_prompt if self.rag_enabled else self.conversation_prompt
+            # Measure the history (and warm the token cache) while retrieving
+            for message in self.chat_context.messages:
+                self.packer.counter.count(message.content)
+            stages["history"] = time.perf_counter() - history_start
+
+            code_sections = None
+            if self.rag_enabled:
+                code_sections, stages["retrieval"] = await retrieval
+            prompt_inputs = self._pack_inputs(prompt, question, code_sections)
+            stages["prepare"] = time.perf_counter() - start
+            self.chat_context.add_message("user", question)
+            asked = True
+
+            detector = SentinelDetector() if self.rag_enabled else None
+            splitter = ReasoningSplitter()
+            if web_only:
+                print("[DEBUG] Router sent the question to the web, skipping the local pass")
+                needs_web = True
+                final_response = ""
+            else:
+                local_pass_start = time.perf_counter()
+                stream = (prompt | self.model).astream(prompt_inputs)
+                async with aclosing(stream):
+                    async for message in stream:
+                        _note_prefill(prefill, "local_pass", message)
+                        reasoning, answer = splitter.feed(message.content)
+                        if reasoning:
+                            first_token_at = first_token_at or time.perf_counter()
+                            yield {"type": "reasoning", "content": reasoning}
+                        text = detector.feed(answer) if detector else answer
+                        if text:
+                            first_token_at = first_token_at or time.perf_counter()
+                            yield {"type": "delta", "content": text}
+                        if detector and detector.found:
+                            # Closing the stream aborts the Ollama request
+                            break
+                stages["local_pass"] = time.perf_counter() - local_pass_start
+
+                reasoning, answer = splitter.flush()
+                if reasoning:
+                    yield {"type": "reasoning", "content": reasoning}
+                text = detector.feed(answer) + detector.flush() if detector else answer
+                if text:
+                    first_token_at = first_token_at or time.perf_counter()
+                    yield {"type": "delta", "content": text}
+                needs_web = bool(detector and detector.found)
+                final_response = splitter.answer
+
+            if needs_web:
+                print("[DEBUG] Question needs the web, performing web search...")
+                path = "web"
+                if (detector and detector.released_any) or splitter.reasoning:
+                    yield {"type": "reset"}
+                yield {"type": "status", "content": "Searching the web..."}
+                try:
+                    wait_start = time.perf_counter()
+                    if web_prefetch:
+                        search = web_prefetch
+                        web_prefetch = None  # consumed, do not cancel
+                    else:
+                        search = _timed(self._search_web, question)
+                    web_results, stages["web_search"] = await search
+                    stages["web_wait"] = time.perf_counter() - wait_start
+                    prompt_inputs["web_results"] = self._pack_web_results(web_results)
+
+                    web_pass_start = time.perf_counter()
+                    splitter = ReasoningSplitter()
+                    web_chain = self.web_prompt | self.model
+                    async for message in web_chain.astream(prompt_inputs):
+                        _note_prefill(prefill, "web_pass", message)
+                        for event in _split_events(*splitter.feed(message.content)):
+                            first_token_at = first_token_at or time.perf_counter()
+                            yield event
+                    for event in _split_events(*splitter.flush()):
+                        yield event
+                    stages["web_pass"] = time.perf_counter() - web_pass_start
+                    final_response = splitter.answer
+                except Exception as e:
+                    splitter = ReasoningSplitter()
+                    final_response = f"Error during web search: {str(e)}"
+            answered = True
+        finally:
+            if web_prefetch:
+                # Speculation was not needed (or the turn was abandoned)
+                web_prefetch.cancel()
+                web_prefetch.add_done_callback(_discard_result)
+            if asked and not answered:
+                # Generation failed or was abandoned; keep the history in
+                # question/answer pairs
+                self.chat_context.add_message(
+                    "assistant", "[No response: generation failed or was interrupted]"
+                )
+
+        reasoning = splitter.reasoning.strip()
+        # Reasoning is kept with the message but never fed back to the model
+        self.chat_context.add_message(
+            "assistant", final_response, reasoning=reasoning or None
+        )
+        if path != "web":
+            await asyncio.to_thread(self._store_answer, question, final_response, vector)
+        end = time.perf_counter()
+
+        # Time the concurrent stages would have taken back to back, minus the
+        # time actually spent waiting for them
+        sequential = stages["history"] + stages.get("retrieval", 0.0)
+        waited = (
+            stages["prepare"] - stages["route"] - stages.get("answer_cache", 0.0)
+        )
+        if "web_search" in stages:
+            sequential += stages["web_search"]
+            waited += stages["web_wait"]
+        stats = {
+            "path": path,
+            "time_to_first_token": (
+                round(first_token_at - start, 3) if first_token_at else None
+            ),
+            "total_time": round(end - start, 3),
+            "response_chars": len(final_response),
+            "stages": {name: round(t, 3) for name, t in stages.items()},
+            "overlap_saved": round(max(sequential - waited, 0.0), 3),
+            "context_tokens": self.last_context.report(),
+            "prefill": prefill,
+            "route": {
+                "code": route.needs_code,
+                "web": route.needs_web,
+                "follow_up": route.follow_up,
+                "source": route.source,
+            },
+        }
+        if self.answer_cache is not None:
+            stats["answer_cache"] = self.answer_cache.stats()
+        yield {
+            "type": "done",
+            "content": final_response,
+            "reasoning": reasoning,
+            "stats": stats,
+        }
+
+    async def _search_web(self, question: str) -> list[dict]:
+        if self.web_research:
+            return await self.web_searcher.aresearch(question, **self.web_options)
+        return await self.web_searcher.asearch(question)
+
     def toggle_rag(self) -> bool:
         """Toggle RAG mode on/off."""
         self.rag_enabled = not self.rag_enabled
@@ -305,3 +884,46 @@ class RAGChain:
         response = self.chain.invoke({"question": question})
         print("[DEBUG] Response generated")
         return response
+
+
+async def _timed(
+    func: Callable[..., Awaitable[Any]], *args: Any
+) -> tuple[Any, float]:
+    """Await a coroutine function, returning its result and duration."""
+    start = time.perf_counter()
+    result = await func(*args)
+    return result, time.perf_counter() - start
+
+
+async def _timed_thread(func: Callable[..., Any], *args: Any) -> tuple[Any, float]:
+    """Run a blocking call in a worker thread, returning its result and duration."""
+    start = time.perf_counter()
+    result = await asyncio.to_thread(func, *args)
+    return result, time.perf_counter() - start
+
+
+def _split_events(reasoning: str, answer: str) -> list[dict[str, str]]:
+    """Stream events for the reasoning and answer text of one chunk."""
+    events = []
+    if reasoning:
+        events.append({"type": "reasoning", "content": reasoning})
+    if answer:
+        events.append({"type": "delta", "content": answer})
+    return events
+
+
+def _note_prefill(prefill: dict, stage: str, message: Any) -> None:
+    """Record prompt-eval tokens and time from a stream's final chunk."""
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        duration = message.response_metadata.get("prompt_eval_duration") or 0
+        prefill[stage] = {
+            "tokens": usage["input_tokens"],
+            "seconds": round(duration / 1e9, 3),
+        }
+
+
+def _discard_result(task: asyncio.Task) -> None:
+    """Retrieve a dropped task's outcome so its errors are not logged as unhandled."""
+    if not task.cancelled():
+        task.exception()
@@ -0,0 +1,80 @@
+class ReasoningSplitter:
+    """Separates a leading ``<think>...</think>`` block from a streamed answer.
+
+    Reasoning models such as deepseek-r1 think out loud before answering.
+    Chunks are fed in as they stream and come back split into reasoning and
+    answer text; a tag cut in half by a chunk boundary is held back until the
+    next chunk shows what it is.
+    """
+
+    OPEN = "<think>"
+    CLOSE = "</think>"
+
+    def __init__(self):
+        self.reasoning = ""
+        self.answer = ""
+        self._buffer = ""
+        self._state = "start"  # start -> (thinking -> after) -> answer
+
+    def feed(self, chunk: str) -> tuple[str, str]:
+        """Add a streamed chunk; return the new ``(reasoning, answer)`` text."""
+        self._buffer += chunk
+        reasoning = answer = ""
+
+        if self._state == "start":
+            stripped = self._buffer.lstrip()
+            if stripped.startswith(self.OPEN):
+                self._state = "thinking"
+                self._buffer = stripped[len(self.OPEN) :].lstrip()
+            elif self.OPEN.startswith(stripped):
+                return "", ""  # may still be opening a reasoning block
+            else:
+                self._state = "answer"
+
+        if self._state == "thinking":
+            end = self._buffer.find(self.CLOSE)
+            if end == -1:
+                keep = _partial_tag(self._buffer, self.CLOSE)
+                reasoning = self._buffer[: len(self._buffer) - keep]
+                self._buffer = self._buffer[len(self._buffer) - keep :]
+            else:
+                reasoning = self._buffer[:end]
+                self._buffer = self._buffer[end + len(self.CLOSE) :]
+                self._state = "after"
+
+        if self._state == "after":
+            self._buffer = self._buffer.lstrip()
+            if self._buffer:
+                self._state = "answer"
+
+        if self._state == "answer":
+            answer, self._buffer = self._buffer, ""
+
+        self.reasoning += reasoning
+        self.answer += answer
+        return reasoning, answer
+
+    def flush(self) -> tuple[str, str]:
+        """Release whatever is still held back once the stream has ended."""
+        rest, self._buffer = self._buffer, ""
+        if self._state == "thinking":
+            self.reasoning += rest
+            return rest, ""
+        self.answer += rest
+        return "", rest
+
+
+def split_reasoning(text: str) -> tuple[str, str]:
+    """Split a complete model response into ``(reasoning, answer)``."""
+    splitter = ReasoningSplitter()
+    splitter.feed(text)
+    splitter.flush()
+    return splitter.reasoning.strip(), splitter.answer
+
+
+def _partial_tag(text: str, tag: str) -> int:
+    """Length of the longest end of ``text`` that could be the start of ``tag``."""
+    for length in range(min(len(tag) - 1, len(text)), 0, -1):
+        if tag.startswith(text[-length:]):
+            return length
+    return 0
@@ -0,0 +1,221 @@
+import json
+import re
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_ollama import ChatOllama
+
+from .embeddings import get_embeddings
+from .utils import load_config
+
+# Keywords that suggest code-related queries
+CODE_INDICATORS = {
+    "code",
+    "file",
+    "function",
+    "class",
+    "method",
+    "implementation",
+    "module",
+    "import",
+    "variable",
+    "define",
+    "declaration",
+    "return",
+    "parameter",
+    "argument",
+    "error",
+    "bug",
+    "issue",
+    "fix",
+    ".py",
+    "python",
+    "script",
+}
+
+# Words that tie a question to the conversation so far
+FOLLOW_UP = re.compile(
+    r"\b(it|its|this|these|those|them|they|above|previous|earlier|again|instead)\b",
+    re.IGNORECASE,
+)
+
+ROUTER_PROMPT = """Classify the latest message sent to an assistant for a Python codebase.
+Reply with JSON only: {{"code": true or false, "web": true or false, "follow_up": true or false}}
+- code: answering needs the project's source code
+- web: answering needs current information from the internet (news, recent releases, external documentation)
+- follow_up: the message refers back to earlier messages
+
+Previous message: {previous}
+Latest message: {question}"""
+
+
+@dataclass
+class Route:
+    """What a question needs before the answering model sees it."""
+
+    needs_code: bool
+    needs_web: bool = False
+    follow_up: bool = False
+    source: str = "keywords"  # router that made the decision
+    query: Optional[str] = None  # retrieval query, when not the question itself
+
+    @property
+    def web_only(self) -> bool:
+        """Whether to answer from the web straight away, skipping the local pass.
+
+        Only the classifier routers' web decisions are trusted this far.
+        """
+        return self.needs_web and self.source in ("embedding", "model")
+
+
+class KeywordRouter:
+    """Keyword and pronoun heuristics; free, but never asks for the web."""
+
+    def route(self, question: str, previous: Optional[str] = None) -> Route:
+        question_lower = question.lower()
+        return Route(
+            needs_code=any(indicator in question_lower for indicator in CODE_INDICATORS),
+            follow_up=bool(previous) and bool(FOLLOW_UP.search(question)),
+        )
+
+
+class EmbeddingRouter:
+    """Nearest-example classifier over question embeddings.
+
+    Each decision in ``examples`` (``code``, ``web``, ``follow_up``) compares
+    the question with labelled positive and negative examples and picks the
+    side whose closest ``top_k`` examples are more similar on average. The
+    keyword heuristics still apply on top: a question they flag as needing
+    code or following up is routed that way whatever the examples say. Costs
+    one (usually cached) query embedding.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        examples: dict[str, tuple[list[str], list[str]]],
+        top_k: int = 3,
+    ):
+        self.embeddings = embeddings
+        self.examples = examples
+        self.top_k = top_k
+        self.keywords = KeywordRouter()
+        self._vectors: Optional[dict[str, tuple[np.ndarray, np.ndarray]]] = None
+        self._lock = threading.Lock()
+
+    def route(self, question: str, previous: Optional[str] = None) -> Route:
+        vectors = self._example_vectors()
+        query = _normalise(self.embeddings.embed_query(question))
+        decide = {
+            name: self._score(positive, query) > self._score(negative, query)
+            for name, (positive, negative) in vectors.items()
+        }
+        keywords = self.keywords.route(question, previous)
+        return Route(
+            needs_code=decide.get("code", False) or keywords.needs_code,
+            needs_web=decide.get("web", False),
+            follow_up=bool(previous)
+            and (decide.get("follow_up", False) or keywords.follow_up),
+            source="embedding",
+        )
+
+    def _score(self, examples: np.ndarray, query: np.ndarray) -> float:
+        similarities = np.sort(examples @ query)[::-1]
+        return float(similarities[: self.top_k].mean())
+
+    def _example_vectors(self) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = {
+                    name: (
+                        _normalise(self.embeddings.embed_documents(positive)),
+                        _normalise(self.embeddings.embed_documents(negative)),
+                    )
+                    for name, (positive, negative) in self.examples.items()
+                }
+            return self._vectors
+
+
+class ModelRouter:
+    """Asks a small chat model for the routing decision as JSON.
+
+    Falls back to ``fallback`` if the model is unreachable or its reply cannot
+    be parsed.
+    """
+
+    def __init__(self, model: BaseChatModel, fallback: Optional[KeywordRouter] = None):
+        self.model = model
+        self.fallback = fallback or KeywordRouter()
+
+    def route(self, question: str, previous: Optional[str] = None) -> Route:
+        prompt = ROUTER_PROMPT.format(previous=previous or "(none)", question=question)
+        try:
+            reply = self.model.invoke(prompt).content
+            decision = json.loads(reply[reply.index("{") : reply.rindex("}") + 1])
+        except Exception as e:
+            print(f"[DEBUG] Router model failed, using keywords: {e}")
+            return self.fallback.route(question, previous)
+        return Route(
+            needs_code=bool(decision.get("code")),
+            needs_web=bool(decision.get("web")),
+            follow_up=bool(previous) and bool(decision.get("follow_up")),
+            source="model",
+        )
+
+
+@lru_cache()
+def get_router(
+    kind: str = "keywords",
+    model: Optional[str] = None,
+    keep_alive: Optional[str | int] = "30m",
+    embedding_model: str = "nomic-embed-text",
+    cache_dir: Optional[str] = None,
+    max_cache_mb: int = 512,
+    examples_path: Optional[str] = None,
+):
+    """
+    Process-wide router, so sessions share its model and example vectors.
+
+    ``kind`` is ``keywords``, ``embedding`` (nearest labelled examples, read
+    from ``examples_path``) or ``model`` (a small chat model named by
+    ``model``).
+    """
+    if kind == "embedding" and examples_path:
+        return EmbeddingRouter(
+            get_embeddings(embedding_model, cache_dir=cache_dir, max_cache_mb=max_cache_mb),
+            load_examples(examples_path),
+        )
+    if kind == "model" and model:
+        return ModelRouter(
+            ChatOllama(
+                model=model,
+                temperature=0,
+                format="json",
+                num_predict=48,
+                keep_alive=keep_alive,
+            )
+        )
+    return KeywordRouter()
+
+
+def load_examples(path: str | Path) -> dict[str, tuple[list[str], list[str]]]:
+    """Labelled questions for ``EmbeddingRouter`` from a YAML file.
+
+    Each decision maps to ``positive`` and ``negative`` lists of questions.
+    """
+    return {
+        name: (lists["positive"], lists["negative"])
+        for name, lists in load_config(path).items()
+    }
+
+
+def _normalise(vectors) -> np.ndarray:
+    array = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(array, axis=-1, keepdims=True)
+    return array / np.where(norms == 0, 1, norms)
@@ -0,0 +1,188 @@
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+# Directories that never hold code worth indexing
+DEFAULT_EXCLUDES = (
+    ".git/",
+    ".hg/",
+    ".svn/",
+    ".venv/",
+    "venv/",
+    "node_modules/",
+    "__pycache__/",
+    ".mypy_cache/",
+    ".pytest_cache/",
+    ".ruff_cache/",
+    ".tox/",
+    ".nox/",
+    "build/",
+    "dist/",
+    "*.egg-info/",
+)
+
+
+@dataclass(frozen=True)
+class ScannedFile:
+    path: Path
+    relative_path: str  # POSIX path relative to the scanned root
+    size: int
+    mtime_ns: int
+
+
+@dataclass(frozen=True)
+class _Rule:
+    regex: re.Pattern
+    base: str  # relative directory of the ignore file that defined the rule
+    negate: bool
+    dir_only: bool
+
+
+def _translate(pattern: str) -> str:
+    """Translate a gitignore glob into a regular expression."""
+    out = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+            out.append("/.*")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif c == "*":
+            out.append("[^/]*")
+            i += 1
+        elif c == "?":
+            out.append("[^/]")
+            i += 1
+        elif c == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                out.append(re.escape(c))
+                i += 1
+            else:
+                body = pattern[i + 1 : end].replace("\\", "\\\\")
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = end + 1
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return "".join(out)
+
+
+class IgnoreRules:
+    """Gitignore-style include/exclude rules collected while walking a tree.
+
+    Supports comments, ``!`` negation, trailing ``/`` for directories, anchored
+    patterns (leading or inner ``/``) and ``*``, ``?``, ``[...]`` and ``**``
+    wildcards. Later rules win, as in git.
+    """
+
+    def __init__(self, patterns: Iterable[str] = ()):
+        self._rules: list[_Rule] = []
+        self.add_patterns(patterns)
+
+    def add_patterns(self, patterns: Iterable[str], base: str = "") -> None:
+        for line in patterns:
+            line = line.rstrip("\n").rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate or line.startswith("\\"):
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            anchored = "/" in line
+            line = line.lstrip("/")
+            prefix = "" if anchored else "(?:.*/)?"
+            regex = re.compile(f"{prefix}{_translate(line)}")
+            self._rules.append(_Rule(regex, base, negate, dir_only))
+
+    def add_ignore_file(self, ignore_file: Path, base: str = "") -> None:
+        """Add the rules of a ``.gitignore`` that lives in directory ``base``."""
+        try:
+            with open(ignore_file, "r", encoding="utf-8", errors="replace") as f:
+                self.add_patterns(f, base)
+        except OSError as e:
+            print(f"Error reading {ignore_file}: {e}")
+
+    def is_ignored(self, relative_path: str, is_dir: bool) -> bool:
+        ignored = False
+        for rule in self._rules:
+            if rule.dir_only and not is_dir:
+                continue
+            if rule.base:
+                if not relative_path.startswith(rule.base + "/"):
+                    continue
+                candidate = relative_path[len(rule.base) + 1 :]
+            else:
+                candidate = relative_path
+            if rule.regex.fullmatch(candidate):
+                ignored = not rule.negate
+        return ignored
+
+
+def scan_directory(
+    root: str | Path,
+    suffixes: Optional[Iterable[str]] = None,
+    exclude: Iterable[str] = (),
+    max_file_size: Optional[int] = None,
+    use_gitignore: bool = True,
+) -> Iterator[ScannedFile]:
+    """Walk a tree once, yielding files that pass the ignore and size rules.
+
+    Ignored directories are pruned rather than descended into, and nested
+    ``.gitignore`` files apply to the directory that contains them.
+    """
+    root = Path(root)
+    suffixes = set(suffixes) if suffixes is not None else None
+    rules = IgnoreRules(DEFAULT_EXCLUDES)
+    rules.add_patterns(exclude)
+
+    stack = [(root, "")]
+    while stack:
+        directory, rel_dir = stack.pop()
+        if use_gitignore and (directory / ".gitignore").is_file():
+            rules.add_ignore_file(directory / ".gitignore", rel_dir)
+
+        try:
+            entries = sorted(os.scandir(directory), key=lambda e: e.name)
+        except OSError as e:
+            print(f"Error scanning {directory}: {e}")
+            continue
+
+        subdirs = []
+        for entry in entries:
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if not rules.is_ignored(rel_path, is_dir=True):
+                        subdirs.append((Path(entry.path), rel_path))
+                    continue
+                if not entry.is_file():
+                    continue
+                if suffixes is not None and Path(entry.name).suffix not in suffixes:
+                    continue
+                if rules.is_ignored(rel_path, is_dir=False):
+                    continue
+                stat = entry.stat()
+            except OSError as e:
+                print(f"Error scanning {entry.path}: {e}")
+                continue
+            if max_file_size is not None and stat.st_size > max_file_size:
+                print(f"[DEBUG] Skipping {rel_path}: {stat.st_size} bytes exceeds limit")
+                continue
+            yield ScannedFile(Path(entry.path), rel_path, stat.st_size, stat.st_mtime_ns)
+
+        # Depth-first, in name order
+        stack.extend(reversed(subdirs))
@@ -0,0 +1,138 @@
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+
+class QueueFullError(Exception):
+    """Raised when the scheduler cannot accept another request."""
+
+
+@dataclass(eq=False)
+class _Ticket:
+    session_id: str
+    granted: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+class InferenceScheduler:
+    """Bounded, fair scheduler for requests to the local LLM.
+
+    At most ``max_concurrent`` requests hold a slot at once. Waiting requests
+    sit in a FIFO queue per session and sessions are served round-robin, so one
+    chatty session cannot starve the others; a session never has more than one
+    request running, which keeps its turns in order. Requests beyond the queue
+    limits are rejected with ``QueueFullError`` instead of piling up.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 1,
+        max_queue: int = 16,
+        max_queue_per_session: int = 4,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_queue_per_session = max_queue_per_session
+        self._queues: dict[str, deque[_Ticket]] = {}
+        self._order: deque[str] = deque()  # round-robin order of waiting sessions
+        self._running: set[str] = set()
+        self._changed = asyncio.Event()
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        session_id: str,
+        on_position: Optional[Callable[[int], Awaitable[None]]] = None,
+    ) -> AsyncIterator[None]:
+        """Wait for an inference slot, reporting queue position while waiting."""
+        ticket = self._enqueue(session_id)
+        try:
+            last_position = None
+            while not ticket.granted.is_set():
+                position = self._position(ticket)
+                if on_position and position != last_position:
+                    last_position = position
+                    await on_position(position)
+                    continue  # the queue may have moved while we reported
+                await self._changed.wait()
+            yield
+        finally:
+            if ticket.granted.is_set():
+                self._running.discard(session_id)
+            else:
+                self._remove(ticket)
+            self._dispatch()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "running": len(self._running),
+            "queued": self.queued,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+        }
+
+    def _enqueue(self, session_id: str) -> _Ticket:
+        queue = self._queues.get(session_id)
+        if self.queued >= self.max_queue:
+            raise QueueFullError("Server is busy, please try again shortly")
+        if queue and len(queue) >= self.max_queue_per_session:
+            raise QueueFullError("Too many pending requests for this session")
+
+        ticket = _Ticket(session_id)
+        if queue is None:
+            queue = self._queues[session_id] = deque()
+            self._order.append(session_id)
+        queue.append(ticket)
+        self._dispatch()
+        return ticket
+
+    def _remove(self, ticket: _Ticket) -> None:
+        queue = self._queues.get(ticket.session_id)
+        if queue and ticket in queue:
+            queue.remove(ticket)
+            if not queue:
+                del self._queues[ticket.session_id]
+                self._order.remove(ticket.session_id)
+
+    def _dispatch(self) -> None:
+        """Hand free slots to waiting sessions in round-robin order."""
+        for _ in range(len(self._order)):
+            if len(self._running) >= self.max_concurrent:
+                break
+            session_id = self._order.popleft()
+            if session_id in self._running:
+                self._order.append(session_id)
+                continue
+
+            queue = self._queues[session_id]
+            ticket = queue.popleft()
+            if queue:
+                self._order.append(session_id)
+            else:
+                del self._queues[session_id]
+            self._running.add(session_id)
+            ticket.granted.set()
+        self._notify()
+
+    def _notify(self) -> None:
+        """Wake every waiter so it can re-check its ticket and position."""
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _position(self, ticket: _Ticket) -> int:
+        """1-based position of a waiting ticket under round-robin service."""
+        queue = self._queues[ticket.session_id]
+        index = queue.index(ticket)
+        session_rank = self._order.index(ticket.session_id)
+        ahead = 0
+        for rank, session_id in enumerate(self._order):
+            waiting = len(self._queues[session_id])
+            ahead += min(waiting, index)
+            if rank < session_rank and waiting > index:
+                ahead += 1
+        return ahead + 1
@@ -1,27 +1,438 @@
-from tavily import TavilyClient
+import asyncio
+import hashlib
+import json
 import os
+import re
+import sqlite3
+import threading
+import time
 from functools import lru_cache
+from pathlib import Path
+from typing import Any, Awaitable, Optional
+
+import httpx
 from dotenv import load_dotenv
 load_dotenv()
 
+TAVILY_URL = "https://api.tavily.com"
+# Used by searchers that are not given a cache explicitly
+DEFAULT_CACHE_DIR = "./data/web_cache"
+
+# Results whose word sets overlap at least this much are the same page
+DUPLICATE_SIMILARITY = 0.8
+
+_QUESTION_WORD = (
+    r"(?:what|how|why|when|where|which|who|whose|is|are|does|do|did|can|could|"
+    r"should|would|will)"
+)
+# Sentence ends, semicolons, and "and"/"or"/"also" starting a new question
+_CLAUSE_BREAK = re.compile(
+    rf"\s*(?:[?;\n]+|,?\s+(?:and|or|also|plus)\s+(?={_QUESTION_WORD}\b))\s*",
+    re.IGNORECASE,
+)
+_WORDS = re.compile(r"\w+")
+
+
+def normalize_query(query: str) -> str:
+    """Cache key form of a query: lower-cased, single-spaced, no trailing punctuation."""
+    return re.sub(r"\s+", " ", query).strip().rstrip("?!.").strip().lower()
+
+
+def split_query(question: str, max_queries: int = 4) -> list[str]:
+    """The question itself, followed by each separate question it contains.
+
+    ``"What is Medicare Part D and how are premiums set?"`` yields the whole
+    question, ``"What is Medicare Part D"`` and ``"how are premiums set"``.
+    """
+    queries = {normalize_query(question): question.strip()}
+    for part in _CLAUSE_BREAK.split(question):
+        part = part.strip(" ,.")
+        if len(part.split()) >= 2:
+            queries.setdefault(normalize_query(part), part)
+    return list(queries.values())[:max_queries]
+
+
+def dedupe_results(
+    results: list[dict], threshold: float = DUPLICATE_SIMILARITY
+) -> list[dict]:
+    """Drop results whose URL or content repeats an earlier result."""
+    kept = []
+    urls = set()
+    word_sets = []
+    for result in results:
+        url = _canonical_url(result.get("url", ""))
+        if url and url in urls:
+            continue
+        words = set(_WORDS.findall(result.get("content", "").lower()))
+        if any(_jaccard(words, seen) >= threshold for seen in word_sets):
+            continue
+        urls.add(url)
+        word_sets.append(words)
+        kept.append(result)
+    return kept
+
+
+class SearchCache:
+    """
+    Disk-backed cache of search results, keyed by normalised query.
+
+    Results older than ``ttl_seconds`` are treated as missing and deleted; the
+    least recently used results are evicted once the cache grows past
+    ``max_bytes``. One cache file can be shared by every searcher in the
+    process and survives restarts.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str | Path,
+        ttl_seconds: float = 24 * 3600,
+        max_bytes: int = 32 * 1024 * 1024,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        cache_dir = Path(cache_dir)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(cache_dir / "search.sqlite3", check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                query_hash TEXT PRIMARY KEY,
+                query TEXT NOT NULL,
+                results TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "DELETE FROM results WHERE created < ?", (time.time() - ttl_seconds,)
+        )
+        self._conn.commit()
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(results)), 0) FROM results"
+        ).fetchone()[0]
+
+    def get(self, key: str) -> Optional[list[dict]]:
+        query_hash = _hash(key)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT results, created FROM results WHERE query_hash = ?",
+                (query_hash,),
+            ).fetchone()
+            if row and time.time() - row[1] <= self.ttl_seconds:
+                self.hits += 1
+                self._conn.execute(
+                    "UPDATE results SET last_used = ? WHERE query_hash = ?",
+                    (time.time(), query_hash),
+                )
+                self._conn.commit()
+                return json.loads(row[0])
+
+            self.misses += 1
+            if row:
+                self._total_bytes -= len(row[0])
+                self._conn.execute(
+                    "DELETE FROM results WHERE query_hash = ?", (query_hash,)
+                )
+                self._conn.commit()
+            return None
+
+    def put(self, key: str, results: list[dict]) -> None:
+        query_hash = _hash(key)
+        payload = json.dumps(results)
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute(
+                "SELECT LENGTH(results) FROM results WHERE query_hash = ?",
+                (query_hash,),
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results "
+                "(query_hash, query, results, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (query_hash, key, payload, now, now),
+            )
+            self._total_bytes += len(payload) - (old[0] if old else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Drop least-recently-used results until the cache is 90% of its cap."""
+        target = int(self.max_bytes * 0.9)
+        rows = self._conn.execute(
+            "SELECT query_hash, LENGTH(results) FROM results ORDER BY last_used"
+        )
+        doomed = []
+        for query_hash, size in rows:
+            if self._total_bytes <= target:
+                break
+            doomed.append((query_hash,))
+            self._total_bytes -= size
+        self._conn.executemany("DELETE FROM results WHERE query_hash = ?", doomed)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": entries,
+                "bytes": self._total_bytes,
+            }
+
 
 class WebSearcher:
-    def __init__(self, api_key: str | None = None):
+    """
+    Tavily search over a pooled async HTTP client.
+
+    Results are cached by normalised query, and concurrent searches for the
+    same query share one request. A request that has not answered within
+    ``hedge_after`` seconds is raced against a second one; failed requests
+    (timeouts, connection errors, 429 and 5xx responses) are retried, up to
+    ``max_attempts`` requests per search.
+    """
+
+    def __init__(
+        self,
+        api_key: str | None = None,
+        base_url: str = TAVILY_URL,
+        cache: Optional[SearchCache] = None,
+        timeout: float = 10.0,
+        hedge_after: float = 2.0,
+        max_attempts: int = 3,
+        max_results: int = 5,
+    ):
         self.api_key = api_key or os.getenv("TAVILY_API_KEY")
         if not self.api_key:
             raise ValueError("Tavily API key not found")
-        self.client = TavilyClient(api_key=self.api_key)
+        if max_attempts < 1:
+            raise ValueError(f"max_attempts must be at least 1, got {max_attempts}")
+        self.base_url = base_url.rstrip("/")
+        self.cache = cache
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.max_attempts = max_attempts
+        self.max_results = max_results
+        self.requests = 0  # HTTP requests actually sent
+        # Clients and in-flight searches belong to the event loop they run on
+        self._clients: dict[asyncio.AbstractEventLoop, httpx.AsyncClient] = {}
+        self._in_flight: dict[tuple[asyncio.AbstractEventLoop, str], asyncio.Task] = {}
+
+    async def asearch(self, query: str) -> list[dict]:
+        """Search results for ``query``, from the cache when possible."""
+        key = normalize_query(query)
+        if self.cache is not None:
+            cached = await asyncio.to_thread(self.cache.get, key)
+            if cached is not None:
+                return cached
+
+        loop = asyncio.get_running_loop()
+        task = self._in_flight.get((loop, key))
+        if task is None:
+            task = loop.create_task(self._fetch(query, key))
+            self._in_flight[(loop, key)] = task
+            task.add_done_callback(lambda done: self._forget(loop, key, done))
+        # One caller giving up must not cancel the request for the others
+        return await asyncio.shield(task)
 
-    @lru_cache(maxsize=100)
     def search(self, query: str) -> list[dict]:
+        """Blocking search, for callers without an event loop."""
+        return asyncio.run(self._run_and_close(self.asearch(query)))
+
+    async def aresearch(
+        self,
+        question: str,
+        max_queries: int = 4,
+        concurrency: int = 3,
+        deadline: float = 8.0,
+    ) -> list[dict]:
+        """Search for every part of a compound question at once.
+
+        Sub-queries run ``concurrency`` at a time; whatever has not answered
+        after ``deadline`` seconds is left out. Sub-queries still waiting for
+        a slot are never sent. Requests already sent keep running on the
+        event loop and fill the cache if it outlives the call, as the
+        server's does; ``research`` cancels them when its loop closes.
+        Results are interleaved by rank, so each sub-query's best result
+        comes first, and duplicates removed.
         """
-        Perform web search with caching for efficiency.
-        """
-        response = self.client.search(query=query)
-        return response['results']
+        queries = split_query(question, max_queries)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(query: str) -> list[dict]:
+            async with semaphore:
+                return await self.asearch(query)
+
+        tasks = [asyncio.create_task(run(query)) for query in queries]
+        done, pending = await asyncio.wait(tasks, timeout=deadline)
+        for task in pending:
+            task.cancel()
+        if pending:
+            print(f"[DEBUG] {len(pending)} of {len(tasks)} web searches missed the deadline")
+
+        ranked = []
+        errors = []
+        for query, task in zip(queries, tasks):
+            if task not in done:
+                continue
+            if task.exception() is not None:
+                print(f"[DEBUG] Web search for {query!r} failed: {task.exception()!r}")
+                errors.append(task.exception())
+            else:
+                ranked.append(task.result())
+        if errors and not ranked:
+            raise errors[0]
+
+        interleaved = [
+            results[rank]
+            for rank in range(max((len(results) for results in ranked), default=0))
+            for results in ranked
+            if rank < len(results)
+        ]
+        return dedupe_results(interleaved)
+
+    def research(self, question: str, **kwargs: Any) -> list[dict]:
+        """Blocking ``aresearch``, for callers without an event loop."""
+        return asyncio.run(self._run_and_close(self.aresearch(question, **kwargs)))
+
+    async def aclose(self) -> None:
+        """Close the connection pool of the running event loop."""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
 
     def format_results(self, results: list[dict]) -> str:
         """
         Format search results into readable text.
         """
         return "\n".join(f"- {r['title']}: {r['content']}" for r in results)
+
+    async def _run_and_close(self, search: Awaitable[list[dict]]) -> list[dict]:
+        try:
+            return await search
+        finally:
+            await self.aclose()
+
+    def _forget(
+        self, loop: asyncio.AbstractEventLoop, key: str, task: asyncio.Task
+    ) -> None:
+        self._in_flight.pop((loop, key), None)
+        # Every waiter may have given up; retrieve the outcome so a late
+        # failure is not reported as unhandled
+        if not task.cancelled():
+            task.exception()
+
+    async def _fetch(self, query: str, key: str) -> list[dict]:
+        results = await self._hedged(query)
+        if self.cache is not None:
+            await asyncio.to_thread(self.cache.put, key, results)
+        return results
+
+    async def _hedged(self, query: str) -> list[dict]:
+        """Race a backup request against a slow one and retry failures."""
+        pending: set[asyncio.Task] = set()
+        last_error: Optional[BaseException] = None
+        attempts = 0
+        try:
+            while pending or attempts < self.max_attempts:
+                if attempts < self.max_attempts:
+                    if attempts and not pending:
+                        await asyncio.sleep(0.1 * 2 ** (attempts - 1))  # back off
+                    pending.add(asyncio.create_task(self._request(query)))
+                    attempts += 1
+                    timeout = self.hedge_after if attempts < self.max_attempts else None
+                else:
+                    timeout = None
+
+                done, pending = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    error = task.exception()
+                    if error is None:
+                        return task.result()
+                    if not _is_retryable(error):
+                        raise error
+                    print(f"[DEBUG] Web search attempt failed: {error!r}")
+                    last_error = error
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _request(self, query: str) -> list[dict]:
+        self.requests += 1
+        response = await self._client().post(
+            f"{self.base_url}/search",
+            json={
+                "api_key": self.api_key,
+                "query": query,
+                "max_results": self.max_results,
+            },
+        )
+        response.raise_for_status()
+        return response.json()["results"]
+
+    def _client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 5.0)),
+                limits=httpx.Limits(max_connections=16, max_keepalive_connections=8),
+            )
+            self._clients[loop] = client
+        return client
+
+
+def _is_retryable(error: BaseException) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(error, httpx.TransportError)
+
+
+def _canonical_url(url: str) -> str:
+    """URL without scheme, ``www.``, fragment or trailing slash."""
+    url = re.sub(r"^[a-z]+://(www\.)?", "", url.strip().lower())
+    return url.split("#", 1)[0].rstrip("/")
+
+
+def _jaccard(a: set[str], b: set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _hash(key: str) -> str:
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+@lru_cache()
+def get_web_searcher(
+    cache_dir: str | None = None,
+    ttl_hours: float = 24,
+    max_cache_mb: int = 32,
+    **kwargs: Any,
+) -> WebSearcher:
+    """
+    Process-wide web searcher, so sessions share its cache and connections.
+
+    When ``cache_dir`` is given results are kept on disk across restarts.
+    """
+    cache = None
+    if cache_dir:
+        cache = SearchCache(
+            cache_dir,
+            ttl_seconds=ttl_hours * 3600,
+            max_bytes=max_cache_mb * 1024 * 1024,
+        )
+    return WebSearcher(cache=cache, **kwargs)
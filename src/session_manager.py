@@ -0,0 +1,258 @@
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+
+class SessionLimitError(Exception):
+    """Raised when every live session is connected and no more are allowed."""
+
+
+@dataclass(eq=False)
+class _Entry:
+    session: Any
+    connections: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class SessionManager:
+    """Live chat sessions, bounded by count, estimated memory and idle time.
+
+    Sessions are created on first use by ``factory(session_id)`` and kept in
+    least-recently-used order. A session with no open connection is evicted
+    once it has been idle for ``idle_ttl`` seconds, or earlier when there are
+    more than ``max_sessions`` sessions or their estimated size exceeds
+    ``max_bytes``. Evicting closes the session, which persists it; asking for
+    the same ID again rehydrates it through the factory. Connected sessions
+    are never evicted: a new session that would exceed ``max_sessions`` with
+    nothing idle to evict is refused with ``SessionLimitError``.
+
+    Sessions provide ``estimated_bytes()``, ``close()`` and a ``resumed``
+    flag that is true when they were restored from storage. ``close()`` may
+    block for a while, so it runs outside the lock; a session being closed
+    is not handed out again until its close has finished.
+
+    A connection switching to another session ``reserve()``s its ID first;
+    nobody else can acquire it until the switch is completed by ``rekey()``
+    or abandoned with ``unreserve()``.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[str], Any],
+        max_sessions: int = 32,
+        max_bytes: int = 256 * 1024 * 1024,
+        idle_ttl: float = 1800.0,
+    ):
+        self.factory = factory
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.created = 0
+        self.rehydrated = 0
+        self.evicted = 0
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        # Evicted sessions still being persisted, by ID
+        self._closing: dict[str, asyncio.Task] = {}
+        # IDs a connection is switching to, set once the switch is over
+        self._reserved: dict[str, asyncio.Event] = {}
+        # Creation and eviction are serialised so a session is never built
+        # twice or closed while being handed out
+        self._lock = asyncio.Lock()
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, session_id: str) -> Optional[Any]:
+        entry = self._entries.get(session_id)
+        return entry.session if entry else None
+
+    async def acquire(self, session_id: str) -> Any:
+        """The live session for ``session_id``, creating or rehydrating it."""
+        while True:
+            # Rehydrate from the journal only once it has been persisted
+            closing = self._closing.get(session_id)
+            if closing is not None:
+                await asyncio.shield(closing)
+            reserved = self._reserved.get(session_id)
+            if reserved is not None:
+                await reserved.wait()
+            async with self._lock:
+                if session_id in self._closing or session_id in self._reserved:
+                    continue
+                entry = self._entries.get(session_id)
+                if entry is None:
+                    self._evict_lru(lambda: len(self._entries) >= self.max_sessions)
+                    if len(self._entries) >= self.max_sessions:
+                        raise SessionLimitError(
+                            f"All {self.max_sessions} sessions are in use, try again later"
+                        )
+                    session = await asyncio.to_thread(self.factory, session_id)
+                    entry = _Entry(session)
+                    self._entries[session_id] = entry
+                    self.created += 1
+                    if getattr(session, "resumed", False):
+                        self.rehydrated += 1
+                entry.connections += 1
+                self._touch(session_id, entry)
+                self._evict_lru(lambda: self.estimated_bytes() > self.max_bytes)
+                return entry.session
+
+    def release(self, session: Any) -> None:
+        """A connection to ``session`` closed; it may now go idle.
+
+        Sessions are looked up by identity rather than ID, so a connection
+        releases the right entry even after another one rekeyed it.
+        """
+        found = self._find(session)
+        if found is not None:
+            session_id, entry = found
+            entry.connections = max(entry.connections - 1, 0)
+            self._touch(session_id, entry)
+
+    def touch(self, session: Any) -> None:
+        found = self._find(session)
+        if found is not None:
+            self._touch(*found)
+
+    def rekey(self, session: Any, new_id: str) -> None:
+        """Follow a session that switched IDs (e.g. by loading another one).
+
+        Completes a ``reserve(new_id)``. Raises ``ValueError`` if another
+        live session already has ``new_id``.
+        """
+        found = self._find(session)
+        if found is not None and found[0] != new_id:
+            if new_id in self._entries:
+                raise ValueError(f"Session {new_id} is already live")
+            self._entries[new_id] = self._entries.pop(found[0])
+        self.unreserve(new_id)
+
+    async def reserve(self, session_id: str) -> bool:
+        """Claim ``session_id`` for a connection about to switch to it.
+
+        An idle live copy is evicted, and persisted before this returns, so
+        the switching session is the only one writing its journal. False if
+        the ID is connected or already reserved.
+        """
+        async with self._lock:
+            entry = self._entries.get(session_id)
+            if session_id in self._reserved or (entry is not None and entry.connections):
+                return False
+            if entry is not None:
+                self._evict(session_id)
+            self._reserved[session_id] = asyncio.Event()
+            closing = self._closing.get(session_id)
+        if closing is not None:
+            await asyncio.shield(closing)
+        return True
+
+    def unreserve(self, session_id: str) -> None:
+        """Give up a reservation, letting waiting connections acquire the ID."""
+        reserved = self._reserved.pop(session_id, None)
+        if reserved is not None:
+            reserved.set()
+
+    async def evict_idle(self) -> int:
+        """Evict sessions idle for longer than ``idle_ttl``, then enforce caps.
+
+        Returns once the evicted sessions have been persisted.
+        """
+        async with self._lock:
+            cutoff = time.monotonic() - self.idle_ttl
+            expired = [
+                session_id
+                for session_id, entry in self._entries.items()
+                if not entry.connections and entry.last_used <= cutoff
+            ]
+            closing = [self._evict(session_id) for session_id in expired]
+            closing += self._evict_lru(
+                lambda: len(self._entries) > self.max_sessions
+                or self.estimated_bytes() > self.max_bytes
+            )
+        await asyncio.gather(*closing)
+        return len(closing)
+
+    async def run(self, interval: float = 60.0) -> None:
+        """Sweep for idle sessions every ``interval`` seconds until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                evicted = await self.evict_idle()
+            except Exception as e:
+                print(f"[DEBUG] Session sweep failed: {e}")
+                continue
+            if evicted:
+                print(f"[DEBUG] Evicted {evicted} idle sessions: {self.stats()}")
+
+    async def close_all(self) -> None:
+        async with self._lock:
+            for session_id in list(self._entries):
+                self._evict(session_id)
+            closing = list(self._closing.values())
+        await asyncio.gather(*closing)
+
+    def estimated_bytes(self) -> int:
+        return sum(entry.session.estimated_bytes() for entry in self._entries.values())
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "sessions": len(self._entries),
+            "connected": sum(1 for entry in self._entries.values() if entry.connections),
+            "estimated_bytes": self.estimated_bytes(),
+            "max_sessions": self.max_sessions,
+            "max_bytes": self.max_bytes,
+            "created": self.created,
+            "rehydrated": self.rehydrated,
+            "evicted": self.evicted,
+        }
+
+    def _find(self, session: Any) -> Optional[tuple[str, _Entry]]:
+        for session_id, entry in self._entries.items():
+            if entry.session is session:
+                return session_id, entry
+        return None
+
+    def _touch(self, session_id: str, entry: _Entry) -> None:
+        entry.last_used = time.monotonic()
+        self._entries.move_to_end(session_id)
+
+    def _evict_lru(self, over_limit: Callable[[], bool]) -> list[asyncio.Task]:
+        """Evict idle sessions, least recently used first, while over a limit."""
+        closing = []
+        while over_limit():
+            victim = next(
+                (
+                    session_id
+                    for session_id, entry in self._entries.items()
+                    if not entry.connections
+                ),
+                None,
+            )
+            if victim is None:
+                break
+            closing.append(self._evict(victim))
+        return closing
+
+    def _evict(self, session_id: str) -> asyncio.Task:
+        """Drop a session and close it in the background; call under the lock."""
+        entry = self._entries.pop(session_id)
+        self.evicted += 1
+        task = asyncio.create_task(self._close(session_id, entry.session))
+        self._closing[session_id] = task
+        task.add_done_callback(lambda _: self._closed(session_id, task))
+        return task
+
+    async def _close(self, session_id: str, session: Any) -> None:
+        try:
+            await asyncio.to_thread(session.close)
+        except Exception as e:
+            print(f"[DEBUG] Could not persist evicted session {session_id}: {e}")
+
+    def _closed(self, session_id: str, task: asyncio.Task) -> None:
+        if self._closing.get(session_id) is task:
+            del self._closing[session_id]
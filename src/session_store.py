@@ -0,0 +1,315 @@
+import base64
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Optional
+
+from .history import Message
+
+# Records are written with "type" first, so message lines can be told apart
+# without parsing them
+_MESSAGE_PREFIX = b'{"type": "message"'
+
+# Session IDs become file names, and arrive from clients
+_SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def valid_session_id(session_id: str) -> bool:
+    return bool(_SESSION_ID.match(session_id))
+
+
+class SessionJournal:
+    """
+    Append-only JSONL log of one chat session.
+
+    Every message is written as it is added, so persisting a turn costs the
+    same however long the session is, and nothing depends on an explicit
+    save. Lines are flushed to the OS on every write; ``fsync`` is batched to
+    every ``sync_every`` records or ``sync_interval`` seconds, whichever comes
+    first, and on ``sync``/``close``. A timer started by the first unsynced
+    record makes sure it is synced within ``sync_interval`` even if nothing
+    else is written.
+
+    Only the byte offsets of live message lines are kept in memory; messages
+    are parsed on demand by ``page`` and ``tail``. ``clear`` and summary
+    updates are appended as records too, and ``snapshot`` rewrites the file
+    with just the current state once enough of it is dead.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        session_id: str,
+        start_time: Optional[datetime] = None,
+        model_name: Optional[str] = None,
+        sync_every: int = 8,
+        sync_interval: float = 1.0,
+    ):
+        if not valid_session_id(session_id):
+            raise ValueError(f"Invalid session ID: {session_id!r}")
+        self.directory = Path(directory)
+        self.session_id = session_id
+        self.path = self.directory / f"session_{session_id}.jsonl"
+        self.start_time = start_time or datetime.now()
+        self.model_name = model_name
+        self.summary = ""
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self._offsets: list[int] = []  # live message lines
+        self._records = 0  # lines in the file, live or not
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._timer: Optional[threading.Timer] = None
+        self._file = None
+        self._lock = threading.Lock()
+        if self.path.exists():
+            self._scan()
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    @property
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def append(self, message: Message) -> None:
+        self._write(
+            {
+                "type": "message",
+                "role": message.role,
+                "content": message.content,
+                "timestamp": message.timestamp.isoformat(),
+                **({"reasoning": message.reasoning} if message.reasoning else {}),
+            }
+        )
+
+    def record_summary(self, summary: str) -> None:
+        if summary != self.summary:
+            self._write({"type": "summary", "summary": summary})
+
+    def clear(self) -> None:
+        if self._offsets or self.summary:
+            self._write({"type": "clear"})
+
+    def page(self, start: int, count: int) -> list[Message]:
+        """Messages ``start`` to ``start + count``, oldest first."""
+        with self._lock:
+            offsets = self._offsets[max(start, 0) : max(start, 0) + count]
+            if not offsets:
+                return []
+            self._flush()
+            with open(self.path, "rb") as f:
+                return [_message(json.loads(_read_line(f, offset))) for offset in offsets]
+
+    def tail(self, count: int) -> list[Message]:
+        return self.page(max(len(self._offsets) - count, 0), count)
+
+    def sync(self) -> None:
+        """Flush and fsync everything written so far."""
+        with self._lock:
+            self._sync()
+
+    def snapshot(self, min_dead: int = 64) -> bool:
+        """Rewrite the journal as header, summary and live messages.
+
+        Skipped unless at least ``min_dead`` records (cleared messages and
+        superseded summaries) would be dropped and they outnumber the live
+        ones. Returns whether the file was rewritten.
+        """
+        with self._lock:
+            live = len(self._offsets) + 1 + bool(self.summary)
+            dead = self._records - live
+            if dead < max(min_dead, 1) or dead < live:
+                self._sync()
+                return False
+            self._flush()
+            temporary = self.path.with_suffix(".jsonl.tmp")
+            with open(self.path, "rb") as source, open(temporary, "wb") as target:
+                target.write(_encode(self._header()))
+                if self.summary:
+                    target.write(_encode({"type": "summary", "summary": self.summary}))
+                for offset in self._offsets:
+                    target.write(_read_line(source, offset))
+                target.flush()
+                os.fsync(target.fileno())
+            self._close_file()
+            os.replace(temporary, self.path)
+            _sync_directory(self.directory)
+            self._scan()
+            return True
+
+    def close(self) -> None:
+        with self._lock:
+            self._sync()
+            self._close_file()
+
+    def _header(self) -> dict[str, Any]:
+        return {
+            "type": "session",
+            "session_id": self.session_id,
+            "start_time": self.start_time.isoformat(),
+            "model_name": self.model_name,
+        }
+
+    def _write(self, record: dict[str, Any]) -> None:
+        with self._lock:
+            if self._file is None:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                new = not self.path.exists()
+                self._file = open(self.path, "ab")
+                if new:
+                    self._file.write(_encode(self._header()))
+                    self._records += 1
+            offset = self._file.tell()
+            self._file.write(_encode(record))
+            self._file.flush()
+            self._records += 1
+            if record["type"] == "message":
+                self._offsets.append(offset)
+            elif record["type"] == "summary":
+                self.summary = record["summary"]
+            elif record["type"] == "clear":
+                self._offsets.clear()
+                self.summary = ""
+            self._unsynced += 1
+            if (
+                self._unsynced >= self.sync_every
+                or time.monotonic() - self._last_sync >= self.sync_interval
+            ):
+                self._sync()
+            elif self._timer is None:
+                delay = self.sync_interval - (time.monotonic() - self._last_sync)
+                self._timer = threading.Timer(max(delay, 0), self.sync)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _scan(self) -> None:
+        """Index the file's message lines; only control records are parsed."""
+        self._offsets = []
+        self._records = 0
+        self.summary = ""
+        with open(self.path, "rb") as f:
+            offset = 0
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # torn final write from a crash
+                self._records += 1
+                if line.startswith(_MESSAGE_PREFIX):
+                    self._offsets.append(offset)
+                else:
+                    record = json.loads(line)
+                    if record["type"] == "session":
+                        self.start_time = datetime.fromisoformat(record["start_time"])
+                        self.model_name = record.get("model_name")
+                    elif record["type"] == "summary":
+                        self.summary = record["summary"]
+                    elif record["type"] == "clear":
+                        self._offsets.clear()
+                        self.summary = ""
+                offset += len(line)
+        if offset != self.path.stat().st_size:
+            with open(self.path, "r+b") as f:
+                f.truncate(offset)
+
+    def _flush(self) -> None:
+        if self._file is not None:
+            self._file.flush()
+
+    def _sync(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._file is not None and self._unsynced:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def list_sessions(directory: str | Path) -> list[dict[str, Any]]:
+    """Saved sessions, most recently active first; reads only each header."""
+    sessions = []
+    for path in Path(directory).glob("session_*.jsonl"):
+        try:
+            with open(path, "rb") as f:
+                header = json.loads(f.readline())
+            updated = path.stat().st_mtime
+        except (OSError, ValueError):
+            continue
+        if header.get("type") != "session":
+            continue
+        sessions.append(
+            {
+                "session_id": header["session_id"],
+                "start_time": header["start_time"],
+                "model_name": header.get("model_name"),
+                "updated": datetime.fromtimestamp(updated).isoformat(),
+            }
+        )
+    return sorted(sessions, key=lambda session: session["updated"], reverse=True)
+
+
+def encode_page(messages: list[Message], compress_min_bytes: int = 1024) -> dict[str, Any]:
+    """Messages for the wire, deflated and base64-encoded once they are large.
+
+    Returns either ``{"messages": [...]}`` or ``{"encoding": "deflate",
+    "data": ...}``, where ``data`` inflates to the same JSON list.
+    """
+    records = [
+        {
+            "role": message.role,
+            "content": message.content,
+            "reasoning": message.reasoning,
+            "timestamp": message.timestamp.isoformat(),
+        }
+        for message in messages
+    ]
+    raw = json.dumps(records, ensure_ascii=False).encode("utf-8")
+    if len(raw) < compress_min_bytes:
+        return {"messages": records}
+    return {
+        "encoding": "deflate",
+        "data": base64.b64encode(zlib.compress(raw)).decode("ascii"),
+    }
+
+
+def _encode(record: dict[str, Any]) -> bytes:
+    return (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def _read_line(f, offset: int) -> bytes:
+    f.seek(offset)
+    return f.readline()
+
+
+def _message(record: dict[str, Any]) -> Message:
+    return Message(
+        role=record["role"],
+        content=record["content"],
+        timestamp=datetime.fromisoformat(record["timestamp"]),
+        reasoning=record.get("reasoning"),
+    )
+
+
+def _sync_directory(directory: Path) -> None:
+    """Make a rename durable; not supported on every platform."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
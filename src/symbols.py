@@ -0,0 +1,159 @@
+import ast
+import textwrap
+from dataclasses import dataclass
+from langchain.docstore.document import Document
+
+
+@dataclass(frozen=True)
+class Symbol:
+    """A class, method or top-level function and where it lives in its file."""
+
+    relative_path: str
+    qualname: str  # dotted path within the module, e.g. ``Parser.parse``
+    kind: str  # "class", "method" or "function"
+    signature: str
+    docstring: str
+    start_line: int  # 1-based, first decorator included
+    end_line: int  # 1-based, inclusive
+    parent_line: int = 0  # header line of the enclosing class, for methods
+
+    @property
+    def id(self) -> str:
+        return f"{self.relative_path}::{self.qualname}"
+
+    def to_document(self, file_name: str) -> Document:
+        """Searchable entry for the symbol index."""
+        text = f"{self.kind} {self.signature}\nFile: {self.relative_path}"
+        if self.docstring:
+            text += f"\n\n{self.docstring}"
+        return Document(
+            page_content=text,
+            metadata={
+                "relative_path": self.relative_path,
+                "file_name": file_name,
+                "qualname": self.qualname,
+                "kind": self.kind,
+                "signature": self.signature,
+                "start_line": self.start_line,
+                "end_line": self.end_line,
+                "parent_line": self.parent_line,
+            },
+        )
+
+    @classmethod
+    def from_metadata(cls, metadata: dict) -> "Symbol":
+        return cls(
+            relative_path=metadata["relative_path"],
+            qualname=metadata["qualname"],
+            kind=metadata["kind"],
+            signature=metadata["signature"],
+            docstring="",
+            start_line=metadata["start_line"],
+            end_line=metadata["end_line"],
+            parent_line=metadata.get("parent_line", 0),
+        )
+
+
+def extract_symbols(content: str, relative_path: str) -> list[Symbol]:
+    """Walk a module's AST and list its classes, methods and functions."""
+    try:
+        tree = ast.parse(content)
+    except SyntaxError as e:
+        print(f"Error extracting symbols from {relative_path}: {e}")
+        return []
+
+    symbols = []
+
+    def visit(body: list[ast.stmt], prefix: str, parent_line: int) -> None:
+        for node in body:
+            if isinstance(node, ast.ClassDef):
+                kind = "class"
+                bases = ", ".join(ast.unparse(base) for base in node.bases)
+                signature = f"{prefix}{node.name}({bases})" if bases else f"{prefix}{node.name}"
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                kind = "method" if parent_line else "function"
+                signature = f"{prefix}{node.name}({ast.unparse(node.args)})"
+                if node.returns:
+                    signature += f" -> {ast.unparse(node.returns)}"
+            else:
+                continue
+
+            start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+            symbols.append(
+                Symbol(
+                    relative_path=relative_path,
+                    qualname=f"{prefix}{node.name}",
+                    kind=kind,
+                    signature=signature,
+                    docstring=ast.get_docstring(node) or "",
+                    start_line=start,
+                    end_line=node.end_lineno or node.lineno,
+                    parent_line=parent_line,
+                )
+            )
+            if isinstance(node, ast.ClassDef):
+                visit(node.body, f"{prefix}{node.name}.", node.lineno)
+
+    visit(tree.body, "", 0)
+    return symbols
+
+
+def render_symbols(content: str, symbols: list[Symbol]) -> str:
+    """Cut the source of the given symbols out of one file, with line numbers.
+
+    Functions and methods are shown in full, methods under their class header.
+    Classes are shown as an outline (header, docstring and attributes up to the
+    first method, then method signatures). Symbols nested inside one that is
+    already shown in full are skipped.
+    """
+    lines = content.splitlines()
+    sections = []
+    shown: list[tuple[int, int]] = []
+    headers_shown = set()
+
+    for symbol in sorted(symbols, key=lambda s: (s.start_line, -s.end_line)):
+        if any(start <= symbol.start_line and symbol.end_line <= end for start, end in shown):
+            continue
+
+        if symbol.kind == "class":
+            headers_shown.add(symbol.start_line)
+            snippet = _outline_class(lines, symbol)
+        else:
+            shown.append((symbol.start_line, symbol.end_line))
+            snippet = _numbered(lines, symbol.start_line, symbol.end_line)
+            if symbol.parent_line and symbol.parent_line not in headers_shown:
+                headers_shown.add(symbol.parent_line)
+                header = _numbered(lines, symbol.parent_line, symbol.parent_line)
+                snippet = f"{header}\n    ...\n{snippet}"
+        sections.append(snippet)
+
+    return "\n    ...\n".join(sections)
+
+
+def _numbered(lines: list[str], start: int, end: int) -> str:
+    return "\n".join(
+        f"{number:>5}| {lines[number - 1]}"
+        for number in range(start, min(end, len(lines)) + 1)
+    )
+
+
+def _outline_class(lines: list[str], symbol: Symbol) -> str:
+    """Class header and body up to its first method, then method signatures."""
+    source = textwrap.dedent("\n".join(lines[symbol.start_line - 1 : symbol.end_line]))
+    try:
+        node = next(n for n in ast.parse(source).body if isinstance(n, ast.ClassDef))
+    except (SyntaxError, StopIteration):
+        return _numbered(lines, symbol.start_line, symbol.end_line)
+
+    offset = symbol.start_line - 1
+    methods = [
+        n for n in node.body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))
+    ]
+    if not methods:
+        return _numbered(lines, symbol.start_line, symbol.end_line)
+
+    first = min([methods[0].lineno] + [d.lineno for d in methods[0].decorator_list])
+    parts = [_numbered(lines, symbol.start_line, first + offset - 1)]
+    for method in methods:
+        parts.append(_numbered(lines, method.lineno + offset, method.lineno + offset))
+    return "\n".join(parts)
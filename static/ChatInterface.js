@@ -1,4 +1,21 @@
-const { useState, useEffect, useRef } = React;
+const { useState, useEffect, useLayoutEffect, useRef } = React;
+
+// History pages arrive as plain JSON or, when large, deflated and base64-encoded
+const decodePage = async (page) => {
+  if (page.encoding !== 'deflate') return page.messages;
+  const bytes = Uint8Array.from(atob(page.data), c => c.charCodeAt(0));
+  const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('deflate'));
+  return JSON.parse(await new Response(stream).text());
+};
+
+const toChatMessages = (records) => records.map(msg => ({
+  role: msg.role,
+  content: msg.content,
+  reasoning: msg.reasoning,
+  timestamp: msg.timestamp
+}));
+
+const newSessionId = () => new Date().getTime().toString();
 
 const AutoResizingTextarea = ({ value, onChange, disabled, placeholder }) => {
   const textareaRef = useRef(null);
@@ -30,19 +47,58 @@ const ChatInterface = () => {
   const [isConnected, setIsConnected] = useState(false);
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState(null);
+  const [status, setStatus] = useState(null);
   const wsRef = useRef(null);
-  const sessionId = useRef(new Date().getTime().toString());
+  // The session lives on the server; reloading the page or reconnecting
+  // resumes it by ID instead of uploading anything. The ID is kept per tab,
+  // so two tabs never share a session unless one loads it explicitly
+  const sessionId = useRef(sessionStorage.getItem('sessionId') || newSessionId());
+  const [connectionKey, setConnectionKey] = useState(0);
   const messagesEndRef = useRef(null);
+  const messagesRef = useRef(null);
   const [ragEnabled, setRagEnabled] = useState(true);
+  const [sessions, setSessions] = useState(null);
+  // Index in the server's history of the oldest message shown
+  const historyStart = useRef(0);
+  const fetchingHistory = useRef(false);
+  const prependOffset = useRef(null);
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
   };
 
-  useEffect(() => {
+  useLayoutEffect(() => {
+    // Keep the view still when older messages are added above it
+    if (prependOffset.current !== null && messagesRef.current) {
+      messagesRef.current.scrollTop = messagesRef.current.scrollHeight - prependOffset.current;
+      prependOffset.current = null;
+      return;
+    }
     scrollToBottom();
   }, [messages]);
 
+  const showHistory = (data, records, notice) => {
+    historyStart.current = data.start;
+    fetchingHistory.current = false;
+    setMessages([
+      ...toChatMessages(records),
+      { role: 'system', content: notice, timestamp: data.timestamp }
+    ]);
+  };
+
+  const handleScroll = () => {
+    const container = messagesRef.current;
+    if (!container || container.scrollTop > 50) return;
+    if (historyStart.current <= 0 || fetchingHistory.current) return;
+    if (wsRef.current?.readyState !== WebSocket.OPEN) return;
+    fetchingHistory.current = true;
+    wsRef.current.send(JSON.stringify({
+      type: 'command',
+      command: 'history',
+      data: { before: historyStart.current }
+    }));
+  };
+
   useEffect(() => {
     // Trigger highlight.js after content updates
     document.querySelectorAll('pre code').forEach((block) => {
@@ -52,6 +108,9 @@ const ChatInterface = () => {
 
   useEffect(() => {
     console.log('Initializing WebSocket connection...');
+    sessionStorage.setItem('sessionId', sessionId.current);
+    let closing = false;
+    let retryTimer = null;
     wsRef.current = new WebSocket(`ws://localhost:8000/ws/${sessionId.current}`);
 
     wsRef.current.onopen = () => {
@@ -63,8 +122,11 @@ const ChatInterface = () => {
     wsRef.current.onclose = () => {
       console.log('Disconnected from server');
       setIsConnected(false);
-      setError('Connection lost');
       setIsLoading(false);
+      if (closing) return;
+      // Reconnect to the same session; the server restores it by ID
+      setError('Connection lost, reconnecting...');
+      retryTimer = setTimeout(() => setConnectionKey(key => key + 1), 2000);
     };
 
     wsRef.current.onerror = (event) => {
@@ -81,21 +143,81 @@ const ChatInterface = () => {
         setIsConnected(true);
         setError(null);
         setRagEnabled(data.rag_enabled);
-        setMessages(msgs => [...msgs, {
-          role: 'system',
-          content: data.content,
-          timestamp: data.timestamp
-        }]);
+        decodePage(data).then(records => showHistory(data, records, data.content));
         setIsLoading(false);
-      } else if (data.type === 'response') {
-        setMessages(msgs => [...msgs, {
-          role: 'assistant',
-          content: data.content,
-          timestamp: data.timestamp
-        }]);
+      } else if (data.type === 'history_page') {
+        decodePage(data).then(records => {
+          historyStart.current = data.start;
+          fetchingHistory.current = false;
+          if (messagesRef.current) {
+            prependOffset.current = messagesRef.current.scrollHeight - messagesRef.current.scrollTop;
+          }
+          setMessages(msgs => [...toChatMessages(records), ...msgs]);
+        });
+      } else if (data.type === 'session_list') {
+        setSessions(data.sessions);
+        setIsLoading(false);
+      } else if (data.type === 'queued') {
+        setStatus(data.content);
+      } else if (data.type === 'delta') {
+        setStatus(null);
+        // Append streamed tokens to the in-progress assistant message
+        setMessages(msgs => {
+          const last = msgs[msgs.length - 1];
+          if (last && last.streaming) {
+            return [...msgs.slice(0, -1), { ...last, content: last.content + data.content }];
+          }
+          return [...msgs, {
+            role: 'assistant',
+            content: data.content,
+            reasoning: '',
+            timestamp: data.timestamp,
+            streaming: true
+          }];
+        });
+      } else if (data.type === 'reasoning') {
+        setStatus(null);
+        // Reasoning streams on its own channel, shown in a collapsible block
+        setMessages(msgs => {
+          const last = msgs[msgs.length - 1];
+          if (last && last.streaming) {
+            return [...msgs.slice(0, -1), { ...last, reasoning: last.reasoning + data.content }];
+          }
+          return [...msgs, {
+            role: 'assistant',
+            content: '',
+            reasoning: data.content,
+            timestamp: data.timestamp,
+            streaming: true
+          }];
+        });
+      } else if (data.type === 'reset') {
+        // The server discarded the draft (e.g. it is switching to a web search)
+        setMessages(msgs => {
+          const last = msgs[msgs.length - 1];
+          return last && last.streaming ? msgs.slice(0, -1) : msgs;
+        });
+      } else if (data.type === 'status') {
+        setStatus(data.content);
+      } else if (data.type === 'done') {
+        setMessages(msgs => {
+          const last = msgs[msgs.length - 1];
+          const finalMessage = {
+            role: 'assistant',
+            content: data.content,
+            reasoning: data.reasoning,
+            timestamp: data.timestamp,
+            stats: data.stats
+          };
+          return last && last.streaming
+            ? [...msgs.slice(0, -1), finalMessage]
+            : [...msgs, finalMessage];
+        });
+        setStatus(null);
         setIsLoading(false);
       } else if (data.type === 'error') {
         setError(data.content);
+        setStatus(null);
         setIsLoading(false);
       } else if (data.type === 'system') {
         setMessages(msgs => [...msgs, {
@@ -113,34 +235,46 @@ const ChatInterface = () => {
         }]);
         setIsLoading(false);
       } else if (data.type === 'session_loaded') {
-        console.log('Loading session messages:', data.messages);
-        // First add a system message about the loaded session
-        const systemMessage = {
-          role: 'system',
-          content: `Loaded session ${data.session_info?.session_id || 'unknown'}`,
-          timestamp: data.timestamp
-        };
-
-        // Then add all the loaded messages
-        const loadedMessages = data.messages.map(msg => ({
-          role: msg.role,
-          content: msg.content,
-          timestamp: msg.timestamp
-        }));
-
-        // Update the messages state with system message and loaded messages
-        setMessages([systemMessage, ...loadedMessages]);
+        // This connection now continues the loaded session
+        sessionId.current = data.session_info.session_id;
+        sessionStorage.setItem('sessionId', sessionId.current);
+        decodePage(data).then(records => showHistory(
+          data,
+          records,
+          `Loaded session ${sessionId.current} (${data.session_info.total} messages)`
+        ));
+        setSessions(null);
         setIsLoading(false);
         setError(null);
       }
     };
 
     return () => {
+      closing = true;
+      clearTimeout(retryTimer);
       if (wsRef.current) {
         wsRef.current.close();
       }
     };
-  }, []);
+  }, [connectionKey]);
+
+  const startNewSession = () => {
+    sessionId.current = newSessionId();
+    historyStart.current = 0;
+    setMessages([]);
+    setSessions(null);
+    setConnectionKey(key => key + 1);
+  };
+
+  const loadSession = (id) => {
+    wsRef.current.send(JSON.stringify({
+      type: 'command',
+      command: 'load',
+      data: { session_id: id }
+    }));
+    setIsLoading(true);
+    setError(null);
+  };
 
   const handleCommand = (command) => {
     if (!isConnected || isLoading) return;
@@ -294,43 +428,29 @@ const ChatInterface = () => {
               </svg>
               Save
             </button>
-            <label
-              className="px-3 py-1 bg-gray-100 hover:bg-gray-200 rounded-lg text-sm flex items-center cursor-pointer"
+            <button
+              onClick={() => handleCommand('sessions')}
+              className="px-3 py-1 bg-gray-100 hover:bg-gray-200 rounded-lg text-sm flex items-center"
+              disabled={!isConnected || isLoading}
             >
-              <input
-                type="file"
-                accept=".json"
-                className="hidden"
-                onChange={(e) => {
-                  const file = e.target.files?.[0];
-                  if (file) {
-                    const reader = new FileReader();
-                    reader.onload = (event) => {
-                      try {
-                        const session = JSON.parse(event.target.result);
-                        wsRef.current.send(JSON.stringify({
-                          type: 'command',
-                          command: 'load',
-                          data: session
-                        }));
-                      } catch (error) {
-                        setError('Invalid session file format');
-                      }
-                    };
-                    reader.readAsText(file);
-                  }
-                  // Reset the input so the same file can be selected again
-                  e.target.value = '';
-                }}
-                disabled={!isConnected || isLoading}
-              />
               <svg className="w-4 h-4 mr-1" viewBox="0 0 24 24" fill="none" stroke="currentColor" strokeWidth="2">
                 <path d="M21 15v4a2 2 0 0 1-2 2H5a2 2 0 0 1-2-2v-4" />
                 <polyline points="17 8 12 3 7 8" />
                 <line x1="12" y1="3" x2="12" y2="15" />
               </svg>
               Load
-            </label>
+            </button>
+            <button
+              onClick={startNewSession}
+              className="px-3 py-1 bg-gray-100 hover:bg-gray-200 rounded-lg text-sm flex items-center"
+              disabled={isLoading}
+            >
+              <svg className="w-4 h-4 mr-1" viewBox="0 0 24 24" fill="none" stroke="currentColor" strokeWidth="2">
+                <line x1="12" y1="5" x2="12" y2="19" />
+                <line x1="5" y1="12" x2="19" y2="12" />
+              </svg>
+              New Chat
+            </button>
             <button
               onClick={() => handleCommand('debug')}
               className="px-3 py-1 bg-gray-100 hover:bg-gray-200 rounded-lg text-sm flex items-center"
@@ -363,6 +483,30 @@ const ChatInterface = () => {
           </div>
         </div>
 
+        {/* Saved sessions, listed by the server */}
+        {sessions && (
+          <div className="px-4 py-2 m-4 bg-gray-50 rounded-lg">
+            <div className="flex justify-between mb-2">
+              <span className="font-medium text-sm">Saved sessions</span>
+              <button onClick={() => setSessions(null)} className="text-sm text-gray-500">Close</button>
+            </div>
+            {sessions.length === 0 && (
+              <div className="text-sm text-gray-500">No saved sessions</div>
+            )}
+            {sessions.map(session => (
+              <button
+                key={session.session_id}
+                onClick={() => loadSession(session.session_id)}
+                className="block w-full text-left px-2 py-1 hover:bg-gray-200 rounded text-sm"
+                disabled={!isConnected || isLoading || session.session_id === sessionId.current}
+              >
+                {session.session_id} · started {new Date(session.start_time).toLocaleString()}
+                {' · '}last active {new Date(session.updated).toLocaleString()}
+              </button>
+            ))}
+          </div>
+        )}
+
         {/* Error message */}
         {error && (
           <div className="px-4 py-2 m-4 bg-red-50 text-red-700 rounded-lg">
@@ -372,7 +516,11 @@ const ChatInterface = () => {
 
         {/* Messages */}
         <div className="p-4">
-          <div className="space-y-4 mb-4 max-h-[calc(100vh-300px)] overflow-y-auto">
+          <div
+            ref={messagesRef}
+            onScroll={handleScroll}
+            className="space-y-4 mb-4 max-h-[calc(100vh-300px)] overflow-y-auto"
+          >
             {messages.map((message, index) => (
               <div
                 key={index}
@@ -389,12 +537,36 @@ const ChatInterface = () => {
                     {new Date(message.timestamp).toLocaleTimeString()}
                   </span>
                 </div>
+                {message.reasoning && (
+                  <details
+                    className="bg-yellow-50 p-4 mb-4 rounded-lg border-l-4 border-yellow-500"
+                    open={message.streaming && !message.content}
+                  >
+                    <summary className="font-semibold text-yellow-800 cursor-pointer">
+                      Thinking Process
+                    </summary>
+                    <div
+                      className="prose max-w-none text-yellow-900 mt-2"
+                      dangerouslySetInnerHTML={formatContent(message.reasoning)}
+                    />
+                  </details>
+                )}
                 <div
                   className="prose max-w-none message-content"
                   dangerouslySetInnerHTML={formatContent(message.content)}
                 />
+                {message.stats && (
+                  <div className="text-xs text-gray-400 mt-2">
+                    {message.stats.time_to_first_token !== null &&
+                      `First token ${message.stats.time_to_first_token.toFixed(1)}s · `}
+                    {`${message.stats.total_time.toFixed(1)}s total`}
+                  </div>
+                )}
               </div>
             ))}
+            {status && (
+              <div className="text-sm text-gray-500 italic px-4">{status}</div>
+            )}
             <div ref={messagesEndRef} />
           </div>
 
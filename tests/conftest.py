@@ -0,0 +1,61 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+import pytest
+
+# respond(body, index) -> (status, content type, payload)
+Responder = Callable[[dict, int], tuple[int, str, bytes]]
+
+
+class HTTPStub:
+    """Local HTTP server answering JSON POSTs with ``respond(body, index)``.
+
+    ``index`` counts requests from zero; bodies are kept in ``requests``.
+    Requests are served on their own threads, so responders may sleep.
+    """
+
+    def __init__(self, respond: Responder):
+        self.requests: list[dict] = []
+        lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with lock:
+                    index = len(stub.requests)
+                    stub.requests.append(body)
+                status, content_type, payload = respond(body, index)
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def http_stub():
+    """Start stubs with ``http_stub(respond)``; they are shut down after the test."""
+    stubs = []
+
+    def start(respond: Responder) -> HTTPStub:
+        stub = HTTPStub(respond)
+        stubs.append(stub)
+        return stub
+
+    yield start
+    for stub in stubs:
+        stub.close()
@@ -0,0 +1,65 @@
+import time
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from src.answer_cache import AnswerCache
+
+
+class LooseEmbedding(DeterministicFakeEmbedding):
+    """Embeds questions differing only in case and punctuation identically."""
+
+    def embed_query(self, text):
+        return super().embed_query("".join(c for c in text.lower() if c.isalnum()))
+
+
+def make_cache(tmp_path, **kwargs):
+    return AnswerCache(tmp_path, LooseEmbedding(size=32), **kwargs)
+
+
+def test_similar_question_is_answered_from_cache(tmp_path):
+    cache = make_cache(tmp_path)
+    hashes = {"pkg/plan.py": "abc"}
+    cache.store("How is the fit score computed?", "By the graph.", "m:rag", hashes)
+
+    hit = cache.lookup("how is the fit score computed", "m:rag", hashes.get)
+
+    assert hit.answer == "By the graph."
+    assert hit.similarity > 0.99
+    assert cache.lookup("What is a premium?", "m:rag", hashes.get) is None
+    assert cache.lookup("How is the fit score computed?", "m:chat", hashes.get) is None
+    assert cache.stats() == {"hits": 1, "misses": 2, "hit_rate": 1 / 3, "entries": 1}
+
+
+def test_changed_source_file_invalidates_answer(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.store("Where are plans scored?", "plan.py", "m:rag", {"pkg/plan.py": "abc"})
+    cache.store("Where are drugs loaded?", "drugs.py", "m:rag", {"pkg/drugs.py": "def"})
+    current = {"pkg/plan.py": "changed", "pkg/drugs.py": "def"}
+
+    assert cache.lookup("Where are plans scored?", "m:rag", current.get) is None
+    assert cache.stats()["entries"] == 1
+    assert cache.prune(current.get) == 0
+    current["pkg/drugs.py"] = "removed"
+    assert cache.prune(current.get) == 1
+    assert cache.stats()["entries"] == 0
+
+
+def test_answers_persist_and_are_evicted(tmp_path):
+    cache = make_cache(tmp_path, max_entries=2)
+    for i in range(3):
+        cache.store(f"question {i}", f"answer {i}", "m:rag", {})
+    cache.lookup("question 1", "m:rag", {}.get)
+
+    reopened = make_cache(tmp_path, max_entries=2)
+
+    assert reopened.stats()["entries"] == 2
+    assert reopened.lookup("question 0", "m:rag", {}.get) is None
+    assert reopened.lookup("question 2", "m:rag", {}.get).answer == "answer 2"
+
+
+def test_expired_answers_are_dropped(tmp_path):
+    cache = make_cache(tmp_path, ttl_seconds=0.05)
+    cache.store("question", "answer", "m:rag", {})
+    time.sleep(0.1)
+
+    assert cache.lookup("question", "m:rag", {}.get) is None
+    assert make_cache(tmp_path, ttl_seconds=0.05).stats()["entries"] == 0
@@ -0,0 +1,102 @@
+import os
+import tempfile
+from pathlib import Path
+import pytest
+from src.content_store import MMAP_THRESHOLD, ContentStore, read_text
+
+
+@pytest.fixture
+def tree():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        root = Path(tmpdirname)
+        (root / "pkg").mkdir()
+        (root / "utils.py").write_text("top = 1\n")
+        (root / "pkg" / "utils.py").write_text("nested = 2\n")
+        yield root
+
+
+def register(store, root, relative_path, content=None):
+    path = root / relative_path
+    stat = path.stat()
+    store.add(relative_path, path, "hash", stat.st_mtime_ns, stat.st_size, content)
+
+
+def test_same_file_name_in_different_directories(tree):
+    store = ContentStore()
+    register(store, tree, "utils.py")
+    register(store, tree, "pkg/utils.py")
+
+    assert store.get("utils.py") == "top = 1\n"
+    assert store.get("pkg/utils.py") == "nested = 2\n"
+
+
+def test_reads_lazily_and_serves_edits(tree):
+    reads = []
+
+    def reader(path):
+        reads.append(path)
+        return read_text(path)
+
+    store = ContentStore(reader)
+    register(store, tree, "utils.py")
+    assert store.get("utils.py") == "top = 1\n"
+    assert store.get("utils.py") == "top = 1\n"
+    assert len(reads) == 1
+
+    path = tree / "utils.py"
+    path.write_text("top = 100\n")
+    os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 10**9))
+    assert store.get("utils.py") == "top = 100\n"
+
+
+def test_changed_since_indexed(tree):
+    store = ContentStore()
+    register(store, tree, "utils.py")
+    assert not store.changed("utils.py")
+
+    path = tree / "utils.py"
+    path.write_text("top = 100\n")
+    assert store.changed("utils.py")
+    assert not store.changed("missing.py")
+
+
+def test_cache_is_bounded(tree):
+    store = ContentStore(max_bytes=12)
+    register(store, tree, "utils.py", "top = 1\n")
+    register(store, tree, "pkg/utils.py", "nested = 2\n")
+
+    assert store.stats()["cached_files"] == 1
+    assert store.stats()["cached_bytes"] <= 12
+    # Evicted files are still served from disk
+    assert store.get("utils.py") == "top = 1\n"
+
+
+def test_removed_and_deleted_files(tree):
+    store = ContentStore()
+    register(store, tree, "utils.py")
+    register(store, tree, "pkg/utils.py")
+
+    store.remove(["utils.py"])
+    assert store.get("utils.py") is None
+    (tree / "pkg" / "utils.py").unlink()
+    assert store.get("pkg/utils.py") is None
+
+
+def test_reads_large_files_through_a_memory_map(tree):
+    path = tree / "big.txt"
+    path.write_bytes("é".encode() * MMAP_THRESHOLD + b"\xff")
+
+    text = read_text(path)
+
+    assert len(text) == MMAP_THRESHOLD + 1
+    assert text.endswith("é�")
+
+
+def test_current_hash_is_dropped_once_the_file_changes(tree):
+    store = ContentStore()
+    register(store, tree, "utils.py")
+    assert store.current_hash("utils.py") == "hash"
+
+    (tree / "utils.py").write_text("top = 100\n")
+    assert store.current_hash("utils.py") is None
+    assert store.content_hash("utils.py") == "hash"
@@ -0,0 +1,58 @@
+from src.context_packer import ContextPacker, TokenCounter, TRUNCATION_MARKER
+
+
+def word_counter():
+    calls = []
+
+    def tokenize(text):
+        calls.append(text)
+        return len(text.split())
+
+    return TokenCounter(tokenize), calls
+
+
+def test_token_counts_are_cached():
+    counter, calls = word_counter()
+    assert counter.count("one two three") == 3
+    assert counter.count("one two three") == 3
+    assert calls == ["one two three"]
+
+
+def test_sections_stay_within_budget():
+    counter, _ = word_counter()
+    packer = ContextPacker(counter, context_window=400, reserve_tokens=100)
+    code = [f"=== file{i}.py ===\n" + "\n".join(["token " * 10] * 10) for i in range(5)]
+    history = ["user: " + "word " * 50 for _ in range(6)]
+
+    packed = packer.pack("question here", {"code": code, "history": history})
+
+    assert packed.budget == 298
+    assert sum(packed.tokens.values()) <= packed.budget
+    assert packed.dropped["code"] > 0
+    assert packed.items["code"][0] == code[0]
+
+
+def test_unused_share_goes_to_other_sections():
+    counter, _ = word_counter()
+    packer = ContextPacker(counter, context_window=1000, reserve_tokens=0)
+    code = ["word " * 700]
+
+    packed = packer.pack("", {"project_description": ["short"], "code": code})
+
+    # Far above the code share of the budget, since nothing else needs it
+    assert packed.items["code"] == code
+    assert packed.dropped["code"] == 0
+
+
+def test_reserved_section_keeps_its_share():
+    counter, _ = word_counter()
+    packer = ContextPacker(
+        counter, context_window=1000, reserve_tokens=0, shares={"code": 0.5, "web": 0.5}
+    )
+    code = ["\n".join(["word"] * 900)]
+
+    packed = packer.pack("", {"code": code}, reserve=["web"])
+
+    assert packed.tokens["code"] <= 500
+    assert packed.items["code"][0].endswith(TRUNCATION_MARKER)
+    assert packed.spare >= 500
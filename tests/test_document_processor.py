@@ -66,4 +66,18 @@ def test_refresh_vectorstore(processor, temp_dir):
         
         processor.refresh_vectorstore(temp_dir, vectorstore)
         results = vectorstore.similarity_search("new_function")
-        assert len(results) > 0
\ No newline at end of file
+        assert len(results) > 0
+
+def test_load_directory_in_parallel(monkeypatch):
+    monkeypatch.setattr("src.document_processor.PARALLEL_THRESHOLD", 4)
+    processor = DocumentProcessor(workers=2)
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        for i in range(8):
+            (Path(tmpdirname) / f"mod{i}.py").write_text(f"def func{i}():\n    pass")
+        docs = processor.load_directory(tmpdirname)
+        assert "def func3" in processor.get_full_content("mod3.py")
+
+    assert sorted(doc.metadata["relative_path"] for doc in docs) == [
+        f"mod{i}.py" for i in range(8)
+    ]
+    assert all("def func" in doc.page_content for doc in docs)
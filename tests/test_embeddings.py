@@ -1,5 +1,8 @@
+import hashlib
+
 import numpy as np
-from src.embeddings import get_embeddings
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from src.embeddings import CachedEmbeddings, get_embeddings
 
 
 def test_embeddings_creation():
@@ -38,3 +41,58 @@ def test_embeddings_caching():
     emb1 = get_embeddings()
     emb2 = get_embeddings()
     assert emb1 is emb2
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    calls: int = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        self.calls += 1
+        return super().embed_query(text)
+
+
+def test_cached_embeddings_skip_model_on_hit(tmp_path):
+    underlying = CountingEmbeddings(size=8)
+    cached = CachedEmbeddings(underlying, tmp_path)
+
+    first = cached.embed_documents(["alpha", "beta"])
+    second = cached.embed_documents(["beta", "alpha"])
+    assert underlying.calls == 1
+    assert second == [first[1], first[0]]
+
+    cached.embed_query("question")
+    cached.embed_query("question")
+    assert underlying.calls == 2
+    assert cached.stats()["hits"] == 3
+    assert cached.stats()["misses"] == 3
+
+
+def test_cached_embeddings_persist_to_disk(tmp_path):
+    underlying = CountingEmbeddings(size=8)
+    vector = CachedEmbeddings(underlying, tmp_path).embed_query("persisted")
+
+    reopened = CachedEmbeddings(underlying, tmp_path)
+    assert np.allclose(reopened.embed_query("persisted"), vector)
+    assert underlying.calls == 1
+
+
+def test_cached_embeddings_evict_by_size(tmp_path):
+    # Each 8-dim float32 vector takes 32 bytes
+    cached = CachedEmbeddings(CountingEmbeddings(size=8), tmp_path, max_bytes=100)
+    cached.embed_documents([f"text {i}" for i in range(10)])
+    stats = cached.stats()
+    assert stats["bytes"] <= 100
+    assert stats["entries"] == stats["bytes"] // 32
+
+
+def test_cached_embeddings_count_replaced_rows_once(tmp_path):
+    cached = CachedEmbeddings(CountingEmbeddings(size=8), tmp_path)
+    cached.embed_documents(["same"])
+    # A second miss for the same text, as when two threads race on it
+    text_hash = hashlib.sha256(b"same").hexdigest()
+    cached._store("document", cached._lookup("document", {text_hash}))
+    assert cached.stats()["bytes"] == 32
@@ -0,0 +1,57 @@
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from src.history import ChatContext, Message, ModelSummarizer
+
+
+def test_history_is_evicted_in_blocks():
+    context = ChatContext(max_messages=4)
+    for i in range(4):
+        context.add_message("user", f"m{i}")
+    assert context.get_context_string() == "user: m0\nuser: m1\nuser: m2\nuser: m3"
+
+    context.add_message("user", "m4")
+    assert [m.content for m in context.messages] == ["m3", "m4"]
+    assert context.evicted == 3
+    context.add_message("assistant", "m5")
+    assert [m.content for m in context.messages] == ["m3", "m4", "m5"]
+    assert context.get_context_string().endswith("user: m3\nuser: m4\nassistant: m5")
+
+
+def test_token_budget_bounds_history_and_summary():
+    context = ChatContext(max_messages=1000, max_tokens=100, summary_tokens=20)
+    for i in range(200):
+        context.add_message("user", f"question number {i} " + "word " * 10)
+        context.add_message("assistant", "answer " * 10)
+
+    assert context.tokens <= 100
+    assert context.evicted + len(context.messages) == 400
+    assert len(context.get_summary()) <= 80
+    assert "question number 19" in context.get_summary()
+
+
+def test_summarizer_folds_evicted_messages_in_background():
+    calls = []
+
+    def summarizer(summary, messages):
+        calls.append([m.content for m in messages])
+        return (summary + " " if summary else "") + "+".join(m.content for m in messages)
+
+    context = ChatContext(max_messages=2, summarizer=summarizer)
+    for i in range(5):
+        context.add_message("user", f"m{i}")
+    context.wait(timeout=5)
+
+    assert calls == [["m0", "m1"], ["m2", "m3"]]
+    assert context.get_summary() == "m0+m1 m2+m3"
+
+    context.clear()
+    assert context.get_summary() == "" and context.messages == []
+
+
+def test_model_summarizer_drops_reasoning():
+    model = GenericFakeChatModel(
+        messages=iter([AIMessage(content="<think>what matters?</think>\nUser asked about x")])
+    )
+    summarizer = ModelSummarizer(model)
+
+    assert summarizer("", [Message("user", "what is x?")]) == "User asked about x"
@@ -0,0 +1,61 @@
+import threading
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from src.ingest import Pipeline
+
+
+def test_pipeline_runs_stages_in_order():
+    results = []
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        report = (
+            Pipeline(queue_size=4)
+            .add_stage("double", lambda x: x * 2, pool)
+            .add_stage("drop_tens", lambda x: None if x % 10 == 0 else x)
+            .add_batch_stage("batch", lambda batch: list(batch), batch_size=3)
+            .add_stage("collect", results.extend)
+            .run(range(20))
+        )
+
+    assert [x for x in results] == [x * 2 for x in range(20) if (x * 2) % 10]
+    assert report["stages"]["discover"]["items"] == 20
+    assert report["stages"]["double"]["items"] == 20
+    assert report["stages"]["batch"]["items"] == 16
+
+
+def test_pipeline_applies_backpressure():
+    release = threading.Event()
+    produced = []
+
+    def source():
+        for i in range(100):
+            produced.append(i)
+            yield i
+
+    def slow(item):
+        release.wait()
+        return item
+
+    pipeline = Pipeline(queue_size=2).add_stage("slow", slow)
+    runner = threading.Thread(target=pipeline.run, args=(source(),))
+    runner.start()
+    try:
+        runner.join(timeout=0.2)
+        # One item in the stage, a full queue and one blocked put
+        assert len(produced) <= 4
+    finally:
+        release.set()
+        runner.join()
+    assert len(produced) == 100
+
+
+def test_pipeline_reraises_stage_errors():
+    def explode(item):
+        if item == 5:
+            raise ValueError("boom")
+        return item
+
+    pipeline = Pipeline(queue_size=2).add_stage("explode", explode).add_stage(
+        "sink", lambda item: None
+    )
+    with pytest.raises(ValueError, match="boom"):
+        pipeline.run(range(50))
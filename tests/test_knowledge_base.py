@@ -0,0 +1,165 @@
+import pytest
+from pathlib import Path
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from src.document_processor import DocumentProcessor
+from src.knowledge_base import KnowledgeBase
+from src.index_manifest import IndexManifest
+import tempfile
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    """Fake embeddings that record how many texts were embedded."""
+
+    model: str = "fake-embed"
+    embedded: list[str] = []
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.embedded.extend(texts)
+        return super().embed_documents(texts)
+
+    @property
+    def summaries(self) -> list[str]:
+        """Embedded file summaries, leaving out symbol entries."""
+        return [text for text in self.embedded if text.startswith("File:")]
+
+
+@pytest.fixture
+def embeddings():
+    return CountingEmbeddings(size=16, embedded=[])
+
+
+@pytest.fixture
+def codebase():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        (Path(tmpdirname) / "module.py").write_text("def helper():\n    pass")
+        (Path(tmpdirname) / "notes.txt").write_text("Some project notes")
+        yield tmpdirname
+
+
+@pytest.fixture
+def vector_dir():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        yield tmpdirname
+
+
+def test_builds_index_once(embeddings, codebase, vector_dir):
+    kb = KnowledgeBase(codebase, vector_dir, embeddings=embeddings)
+    assert len(embeddings.summaries) == 2
+    assert "module.py" in kb.content_store
+    assert kb.processor.get_full_content("module.py") == "def helper():\n    pass"
+    assert sorted(kb.vectorstore.get()["ids"]) == ["module.py", "notes.txt"]
+
+
+def test_ingestion_reports_stage_throughput(embeddings, codebase, vector_dir):
+    processor = DocumentProcessor(embeddings=embeddings, batch_size=1, workers=1)
+    kb = KnowledgeBase(codebase, vector_dir, processor=processor)
+
+    stages = kb.processor.last_report["stages"]
+    assert list(stages) == ["discover", "load", "summarise", "index"]
+    assert stages["discover"]["items"] == 2
+    assert stages["index"]["items"] == 2
+
+
+def test_warm_start_makes_no_embedding_calls(embeddings, codebase, vector_dir):
+    KnowledgeBase(codebase, vector_dir, embeddings=embeddings)
+    embeddings.embedded.clear()
+
+    kb = KnowledgeBase(codebase, vector_dir, embeddings=embeddings)
+    assert embeddings.embedded == []
+    assert len(kb.vectorstore.get()["ids"]) == 2
+
+
+def test_warm_start_reembeds_only_changed_files(embeddings, codebase, vector_dir):
+    KnowledgeBase(codebase, vector_dir, embeddings=embeddings)
+    embeddings.embedded.clear()
+
+    (Path(codebase) / "module.py").write_text("def changed():\n    pass")
+    (Path(codebase) / "notes.txt").unlink()
+    kb = KnowledgeBase(codebase, vector_dir, embeddings=embeddings)
+
+    assert len(embeddings.summaries) == 1
+    assert "changed" in embeddings.summaries[0]
+    assert kb.vectorstore.get()["ids"] == ["module.py"]
+    assert list(IndexManifest.load(vector_dir).files) == ["module.py"]
+
+
+def test_model_change_rebuilds_collection(embeddings, codebase, vector_dir):
+    KnowledgeBase(codebase, vector_dir, embeddings=embeddings)
+    embeddings.embedded.clear()
+
+    other = CountingEmbeddings(size=16, model="other-embed", embedded=[])
+    kb = KnowledgeBase(codebase, vector_dir, embeddings=other)
+    assert len(other.summaries) == 2
+    assert len(kb.vectorstore.get()["ids"]) == 2
+    assert IndexManifest.load(vector_dir).embedding_model == "other-embed"
+
+
+def test_refresh_only_embeds_diff(embeddings, codebase, vector_dir):
+    kb = KnowledgeBase(codebase, vector_dir, embeddings=embeddings)
+    embeddings.embedded.clear()
+
+    kb.refresh()
+    assert embeddings.embedded == []
+
+    (Path(codebase) / "module.py").write_text("def changed():\n    pass")
+    (Path(codebase) / "notes.txt").unlink()
+    (Path(codebase) / "new.py").write_text("def added():\n    pass")
+    kb.refresh()
+
+    assert len(embeddings.summaries) == 2
+    assert sorted(kb.vectorstore.get()["ids"]) == ["module.py", "new.py"]
+    assert "notes.txt" not in kb.content_store
+    assert sorted(IndexManifest.load(vector_dir).files) == ["module.py", "new.py"]
+
+
+def test_refresh_is_idempotent(embeddings, codebase, vector_dir):
+    kb = KnowledgeBase(codebase, vector_dir, embeddings=embeddings)
+    (Path(codebase) / "module.py").write_text("def changed():\n    pass")
+    kb.refresh()
+    kb.refresh()
+
+    results = kb.vectorstore.similarity_search("changed", k=5)
+    paths = [doc.metadata["relative_path"] for doc in results]
+    assert sorted(paths) == ["module.py", "notes.txt"]
+
+
+def test_symbol_index_follows_file_changes(embeddings, codebase, vector_dir):
+    kb = KnowledgeBase(codebase, vector_dir, embeddings=embeddings)
+    assert kb.symbol_store.get()["ids"] == ["module.py::helper"]
+
+    (Path(codebase) / "module.py").write_text(
+        "class Tool:\n    def run(self):\n        pass"
+    )
+    kb.refresh()
+    assert sorted(kb.symbol_store.get()["ids"]) == ["module.py::Tool", "module.py::Tool.run"]
+
+    (Path(codebase) / "module.py").unlink()
+    kb.refresh()
+    assert kb.symbol_store.get()["ids"] == []
+
+
+def test_enabling_symbol_index_rebuilds(embeddings, codebase, vector_dir):
+    KnowledgeBase(codebase, vector_dir, embeddings=embeddings, symbol_index=False)
+    embeddings.embedded.clear()
+
+    kb = KnowledgeBase(codebase, vector_dir, embeddings=embeddings)
+    assert kb.symbol_store.get()["ids"] == ["module.py::helper"]
+
+
+def test_lexical_indexes_follow_the_vectorstore(embeddings, codebase, vector_dir):
+    KnowledgeBase(codebase, vector_dir, embeddings=embeddings)
+    # Warm start: nothing re-summarised, symbols come from the stored index
+    kb = KnowledgeBase(codebase, vector_dir, embeddings=embeddings)
+    processor = kb.processor
+    assert processor.file_index.search("helper")[0][0] == "module.py"
+    assert processor.symbol_index.search("helper")[0][0] == "module.py::helper"
+
+    (Path(codebase) / "module.py").write_text("def renamed_thing():\n    pass")
+    kb.refresh()
+    assert processor.symbol_index.search("helper") == []
+    assert processor.symbol_index.search("renamed_thing")[0][0] == "module.py::renamed_thing"
+
+    (Path(codebase) / "module.py").unlink()
+    kb.refresh()
+    assert processor.file_index.search("renamed_thing") == []
+    assert processor.symbol_index.search("renamed_thing") == []
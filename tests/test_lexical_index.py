@@ -0,0 +1,38 @@
+from src.lexical_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+
+def test_tokenize_splits_identifiers():
+    terms = tokenize("getUserName load_directory HTTPServer")
+    assert {"getusername", "get", "user", "name"} <= set(terms)
+    assert {"load_directory", "load", "directory"} <= set(terms)
+    assert {"httpserver", "http", "server"} <= set(terms)
+
+
+def test_search_prefers_exact_identifier():
+    index = BM25Index()
+    index.replace("a.py", {"a.py": "def load_directory(path):\n    return scan(path)"})
+    index.replace("b.py", {"b.py": "def load_config(path):\n    return yaml(path)"})
+    index.replace("c.md", {"c.md": "Notes about the directory layout"})
+
+    results = index.search("where is load_directory defined?", k=3)
+    assert results[0][0] == "a.py"
+
+
+def test_replace_and_remove_groups():
+    index = BM25Index()
+    index.replace("mod.py", {"mod.py::old": "def alpha_task(): pass"})
+    index.replace("mod.py", {"mod.py::new": "def beta_job(): pass"})
+
+    assert index.search("alpha_task") == []
+    assert index.search("beta_job")[0][0] == "mod.py::new"
+
+    index.remove(["mod.py"])
+    assert len(index) == 0
+    assert index.search("beta_job") == []
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a", "d"]])
+    assert fused[0] == "a"
+    assert set(fused) == {"a", "b", "c", "d"}
+    assert fused.index("c") < fused.index("b")
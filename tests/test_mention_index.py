@@ -0,0 +1,67 @@
+from src.mention_index import MentionIndex, file_mentions, symbol_mentions
+from src.symbols import extract_symbols
+
+
+def build_index():
+    index = MentionIndex()
+    for path in ["src/rag_chain.py", "src/utils.py", "tests/utils.py", "pkg/__init__.py"]:
+        index.replace(path, file_mentions(path))
+    symbols = extract_symbols("class RAGChain:\n    def process_response(self):\n        pass\n", "src/rag_chain.py")
+    index.replace("src/rag_chain.py#symbols", symbol_mentions(symbols))
+    return index
+
+
+def found(index, text):
+    return {(m.kind, m.pattern, m.relative_path) for m in index.find(text)}
+
+
+def test_finds_files_paths_modules_and_symbols():
+    index = build_index()
+
+    assert found(index, "What does RAG_CHAIN.PY do?") == {
+        ("file", "rag_chain.py", "src/rag_chain.py")
+    }
+    assert ("path", "src/rag_chain.py", "src/rag_chain.py") in found(
+        index, "see src/rag_chain.py"
+    )
+    assert found(index, "import src.rag_chain") == {
+        ("module", "src.rag_chain", "src/rag_chain.py")
+    }
+    assert found(index, "is the pkg package used?") == set()
+    assert ("symbol", "RAGChain.process_response", "src/rag_chain.py") in found(
+        index, "How does RAGChain.process_response stream?"
+    )
+
+
+def test_ambiguous_file_names_resolve_to_every_file():
+    paths = {m.relative_path for m in build_index().find("what is in utils.py")}
+    assert paths == {"src/utils.py", "tests/utils.py"}
+
+
+def test_respects_identifier_boundaries_and_symbol_case():
+    index = build_index()
+    assert found(index, "look at my_utils.py") == set()
+    assert found(index, "the ragchain class") == set()
+
+
+def test_replacing_and_removing_groups():
+    index = build_index()
+    index.remove(["src/utils.py"])
+    assert {m.relative_path for m in index.find("utils.py")} == {"tests/utils.py"}
+
+    index.replace("src/rag_chain.py#symbols", [])
+    assert found(index, "RAGChain") == set()
+
+
+def test_bare_symbol_names_must_look_like_code():
+    index = MentionIndex()
+    symbols = extract_symbols(
+        "def main():\n    pass\n\n\ndef load_data():\n    pass\n\n\nclass Search:\n    pass\n",
+        "app.py",
+    )
+    index.replace("app.py#symbols", symbol_mentions(symbols))
+
+    assert found(index, "What is the main difference between Search engines?") == set()
+    assert found(index, "Where is main() called?") == {("symbol", "main", "app.py")}
+    assert found(index, "What does `Search` return?") == {("symbol", "Search", "app.py")}
+    assert found(index, "Who calls load_data?") == {("symbol", "load_data", "app.py")}
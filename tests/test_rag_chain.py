@@ -1,8 +1,22 @@
+import asyncio
+import json
 import pytest
-from unittest.mock import patch, MagicMock
-from src.rag_chain import RAGChain
+from unittest.mock import patch, AsyncMock, MagicMock
+from src.rag_chain import Message, RAGChain, ReasoningSplitter, SentinelDetector
 from dotenv import load_dotenv
 from langchain_core.messages import AIMessage
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_ollama import ChatOllama
+from langchain_core.documents import Document
+from src.symbols import extract_symbols
+from src.context_packer import ContextPacker
+from src.lexical_index import BM25Index
+from src.mention_index import MentionIndex, file_mentions, symbol_mentions
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from src.answer_cache import AnswerCache
+from src.content_store import ContentStore
+from src.router import Route
+from src.search import DEFAULT_CACHE_DIR
 
 load_dotenv()
 
@@ -54,4 +68,522 @@ def test_chain_error_handling(mock_vectorstore):
         "Test error"
     )
     with pytest.raises(Exception):
-        chain("test question")
\ No newline at end of file
+        chain("test question")
+
+@pytest.fixture
+def streaming_chain(mock_vectorstore, mock_web_results):
+    doc_processor = MagicMock()
+    doc_processor.content_store.changed.return_value = False
+    with patch("src.rag_chain.get_web_searcher") as get_web_searcher:
+        searcher = get_web_searcher.return_value
+        searcher.search.return_value = mock_web_results
+        searcher.asearch = AsyncMock(return_value=mock_web_results)
+        searcher.aresearch = AsyncMock(return_value=mock_web_results)
+        searcher.format_results.return_value = "- Web Result 1"
+        chain = RAGChain(mock_vectorstore, doc_processor)
+    return chain
+
+
+def test_default_web_searcher_uses_the_shared_cache(mock_vectorstore):
+    with patch("src.rag_chain.get_web_searcher") as get_web_searcher:
+        chain = RAGChain(mock_vectorstore, MagicMock())
+
+    get_web_searcher.assert_called_once_with(DEFAULT_CACHE_DIR)
+    assert chain.web_searcher is get_web_searcher.return_value
+
+
+def collect_events(chain, question):
+    async def run():
+        return [event async for event in chain.astream_response(question)]
+
+    return asyncio.run(run())
+
+
+def test_stream_local_response(streaming_chain):
+    streaming_chain.model = GenericFakeChatModel(
+        messages=iter([AIMessage(content="Streamed local answer")])
+    )
+    events = collect_events(streaming_chain, "what is this project?")
+
+    deltas = [e["content"] for e in events if e["type"] == "delta"]
+    assert len(deltas) > 1
+    assert "".join(deltas) == "Streamed local answer"
+
+    done = events[-1]
+    assert done["type"] == "done"
+    assert done["content"] == "Streamed local answer"
+    assert done["stats"]["path"] == "local"
+    assert done["stats"]["time_to_first_token"] is not None
+    assert streaming_chain.chat_context.messages[-1].content == "Streamed local answer"
+
+
+def test_stream_web_response(streaming_chain):
+    streaming_chain.model = GenericFakeChatModel(
+        messages=iter(
+            [AIMessage(content="NEED_WEB_SEARCH"), AIMessage(content="Web answer")]
+        )
+    )
+    events = collect_events(streaming_chain, "latest python release?")
+
+    types = [e["type"] for e in events]
+    # The sentinel is held back, so there is no draft to discard
+    assert "reset" not in types
+    assert "status" in types
+    assert events[-1]["content"] == "Web answer"
+    assert events[-1]["stats"]["path"] == "web"
+
+
+def test_stream_aborts_local_pass_on_sentinel(streaming_chain):
+    streaming_chain.model = GenericFakeChatModel(
+        messages=iter(
+            [
+                AIMessage(content="<think> I lack context </think> NEED_WEB_SEARCH " * 50),
+                AIMessage(content="Web answer"),
+            ]
+        )
+    )
+    events = collect_events(streaming_chain, "latest python release?")
+
+    assert [e["type"] for e in events].count("reset") == 1
+    assert events[-1]["content"] == "Web answer"
+
+
+def test_sentinel_detector_holds_back_possible_sentinel():
+    detector = SentinelDetector()
+    assert detector.feed("NEED") == ""
+    assert detector.feed("_WEB") == ""
+    assert detector.feed("_SEARCH") == ""
+    assert detector.found
+
+
+def test_sentinel_detector_releases_real_answer():
+    detector = SentinelDetector()
+    assert detector.feed("NE") == ""
+    assert detector.feed("W features: ") == "NEW features: "
+    assert detector.feed("the answer") == "the answer"
+    assert not detector.found
+
+
+def test_sentinel_detector_ignores_reasoning():
+    detector = SentinelDetector()
+    released = detector.feed("<think>Maybe NEED_WEB_SEARCH?")
+    released += detector.feed("</think>\n\nThe file defines a class.")
+    assert not detector.found
+    assert released == "<think>Maybe NEED_WEB_SEARCH?</think>\n\nThe file defines a class."
+
+
+def test_stream_reports_stage_timings(streaming_chain):
+    streaming_chain.model = GenericFakeChatModel(
+        messages=iter([AIMessage(content="Local answer")])
+    )
+    events = collect_events(streaming_chain, "which function loads the config?")
+
+    stages = events[-1]["stats"]["stages"]
+    assert {"history", "retrieval", "prepare", "local_pass"} <= set(stages)
+    assert "web_search" not in stages
+
+
+def test_stream_uses_web_prefetch(streaming_chain):
+    streaming_chain.prefetch_web = True
+    streaming_chain.model = GenericFakeChatModel(
+        messages=iter(
+            [AIMessage(content="NEED_WEB_SEARCH"), AIMessage(content="Web answer")]
+        )
+    )
+    events = collect_events(streaming_chain, "latest python release?")
+
+    assert events[-1]["content"] == "Web answer"
+    assert streaming_chain.web_searcher.asearch.call_count == 1
+    stats = events[-1]["stats"]
+    assert {"web_search", "web_wait", "web_pass"} <= set(stats["stages"])
+    assert stats["overlap_saved"] >= 0
+
+
+def test_stream_fans_out_web_research(streaming_chain):
+    streaming_chain.web_research = True
+    streaming_chain.model = GenericFakeChatModel(
+        messages=iter(
+            [AIMessage(content="NEED_WEB_SEARCH"), AIMessage(content="Web answer")]
+        )
+    )
+    events = collect_events(streaming_chain, "what is new in python and how fast is it?")
+
+    assert events[-1]["content"] == "Web answer"
+    streaming_chain.web_searcher.aresearch.assert_awaited_once_with(
+        "what is new in python and how fast is it?",
+        max_queries=4,
+        concurrency=3,
+        deadline=8.0,
+    )
+    streaming_chain.web_searcher.asearch.assert_not_called()
+
+
+def test_code_context_uses_matching_symbols(streaming_chain):
+    content = "def wanted():\n    return 1\n\n\ndef unrelated():\n    return 2\n"
+    wanted = extract_symbols(content, "pkg/big.py")[0]
+    streaming_chain.doc_processor.get_full_content.return_value = content
+    streaming_chain.symbol_store = MagicMock()
+    streaming_chain.symbol_store.similarity_search.return_value = [
+        wanted.to_document("big.py")
+    ]
+
+    context = "\n".join(
+        streaming_chain._get_code_context("how does the wanted function work?")
+    )
+
+    assert "=== pkg/big.py (wanted) ===" in context
+    assert "return 1" in context
+    assert "unrelated" not in context
+    streaming_chain.vectorstore.as_retriever.return_value.invoke.assert_not_called()
+
+
+def test_prompt_is_packed_into_context_window(streaming_chain):
+    streaming_chain.packer = ContextPacker(context_window=2048, reserve_tokens=256)
+    huge = "\n".join(f"value_{i} = {i}" for i in range(5000))
+    streaming_chain.doc_processor.mention_index = MentionIndex()
+    streaming_chain.doc_processor.mention_index.replace("big.py", file_mentions("big.py"))
+    streaming_chain.doc_processor.get_full_content.return_value = huge
+    streaming_chain.model = GenericFakeChatModel(messages=iter([AIMessage(content="ok")]))
+
+    events = collect_events(streaming_chain, "what does big.py define?")
+
+    tokens = events[-1]["stats"]["context_tokens"]
+    assert 0 < tokens["code"] <= tokens["budget"]
+    assert sum(v for k, v in tokens.items() if k != "budget") <= tokens["budget"]
+    assert streaming_chain.last_context.dropped["code"] == 1
+
+
+def test_lexical_matches_are_fused_into_retrieval(streaming_chain):
+    source = "class QuotaExceeded(Exception):\n    pass\n"
+    streaming_chain.doc_processor.file_index = BM25Index()
+    streaming_chain.doc_processor.file_index.replace(
+        "pkg/errors.py", {"pkg/errors.py": source}
+    )
+    streaming_chain.doc_processor.get_full_content.side_effect = (
+        lambda path: source if path == "pkg/errors.py" else None
+    )
+    streaming_chain.vectorstore.as_retriever.return_value.invoke.return_value = []
+
+    files = streaming_chain._get_relevant_files("which code raises QuotaExceeded?")
+
+    assert files == {"pkg/errors.py": source}
+
+
+def test_lexical_only_matches_are_fused_once(streaming_chain):
+    sources = {
+        "pkg/a.py": "def alpha():\n    pass\n",
+        "pkg/b.py": "def beta():\n    pass\n",
+        "pkg/errors.py": "class QuotaExceeded(Exception):\n    pass\n",
+    }
+    streaming_chain.k_docs = 2
+    streaming_chain.doc_processor.file_index = BM25Index()
+    streaming_chain.doc_processor.file_index.replace(
+        "pkg/errors.py", {"pkg/errors.py": sources["pkg/errors.py"]}
+    )
+    streaming_chain.doc_processor.get_full_content.side_effect = sources.get
+    streaming_chain.vectorstore.as_retriever.return_value.invoke.return_value = [
+        Document(
+            page_content=path,
+            metadata={"relative_path": path, "full_content_available": True},
+        )
+        for path in ("pkg/a.py", "pkg/b.py")
+    ]
+
+    files = streaming_chain._get_relevant_files("which code raises QuotaExceeded?")
+
+    # A lexical-only hit ties with the top vector hit instead of outranking it
+    assert list(files) == ["pkg/a.py", "pkg/errors.py"]
+
+
+def test_mentioned_symbols_are_shown_without_their_file(streaming_chain):
+    content = "class Planner:\n    def score(self):\n        return 1\n\n\ndef other():\n    pass\n"
+    index = MentionIndex()
+    index.replace("plan.py#symbols", symbol_mentions(extract_symbols(content, "pkg/plan.py")))
+    streaming_chain.doc_processor.mention_index = index
+    streaming_chain.doc_processor.get_full_content.return_value = content
+
+    files = streaming_chain._get_relevant_files("Why does Planner.score return 1?")
+
+    assert list(files) == ["pkg/plan.py (Planner, Planner.score)"]
+    assert "return 1" in files["pkg/plan.py (Planner, Planner.score)"]
+    assert "def other" not in files["pkg/plan.py (Planner, Planner.score)"]
+
+
+def test_symbols_of_edited_files_are_found_again(streaming_chain):
+    indexed = "def score():\n    return 1\n"
+    edited = "import math\n\n\ndef helper():\n    pass\n\n\ndef score():\n    return 2\n"
+    index = MentionIndex()
+    index.replace("plan.py#symbols", symbol_mentions(extract_symbols(indexed, "pkg/plan.py")))
+    streaming_chain.doc_processor.mention_index = index
+    streaming_chain.doc_processor.get_full_content.return_value = edited
+    streaming_chain.doc_processor.content_store.changed.return_value = True
+
+    files = streaming_chain._get_relevant_files("Why does score() return that?")
+
+    assert "return 2" in files["pkg/plan.py (score)"]
+    assert "def helper" not in files["pkg/plan.py (score)"]
+
+
+def test_common_words_do_not_short_circuit_retrieval(streaming_chain):
+    index = MentionIndex()
+    index.replace("app.py#symbols", symbol_mentions(extract_symbols("def main():\n    pass\n", "pkg/app.py")))
+    streaming_chain.doc_processor.mention_index = index
+    streaming_chain.doc_processor.file_index = BM25Index()
+    streaming_chain.doc_processor.get_full_content.return_value = "code"
+    streaming_chain.vectorstore.as_retriever.return_value.invoke.return_value = [
+        Document(page_content="", metadata={"relative_path": "pkg/search.py", "full_content_available": True})
+    ]
+
+    files = streaming_chain._get_relevant_files("What is the main difference between the engines?")
+
+    assert list(files) == ["pkg/search.py"]
+
+
+def index_file(path, content_hash):
+    """Content store holding ``path`` as pkg/plan.py, indexed as it is now."""
+    path.write_text("def score():\n    return 1\n")
+    stat = path.stat()
+    store = ContentStore()
+    store.add("pkg/plan.py", path, content_hash, stat.st_mtime_ns, stat.st_size)
+    return store
+
+
+def test_repeated_question_is_answered_from_cache(streaming_chain, tmp_path):
+    streaming_chain.answer_cache = AnswerCache(tmp_path, DeterministicFakeEmbedding(size=16))
+    store = index_file(tmp_path / "plan.py", "v1")
+    streaming_chain.doc_processor.content_store = store
+    streaming_chain._get_relevant_files = MagicMock(return_value={"pkg/plan.py": "code"})
+    streaming_chain.model = GenericFakeChatModel(
+        messages=iter([AIMessage(content="Plans are scored in plan.py")])
+    )
+
+    first = collect_events(streaming_chain, "Which code scores plans?")
+    second = collect_events(streaming_chain, "Which code scores plans?")
+
+    assert first[-1]["stats"]["path"] == "local"
+    assert second[-1]["stats"]["path"] == "cache"
+    assert second[-1]["content"] == "Plans are scored in plan.py"
+    assert len(streaming_chain.chat_context.messages) == 4
+
+    # Once the file changes, the cached answer is no longer used
+    stat = (tmp_path / "plan.py").stat()
+    store.add("pkg/plan.py", tmp_path / "plan.py", "v2", stat.st_mtime_ns, stat.st_size)
+    streaming_chain.model = GenericFakeChatModel(messages=iter([AIMessage(content="new")]))
+    third = collect_events(streaming_chain, "Which code scores plans?")
+    assert third[-1]["stats"]["path"] == "local"
+
+
+def test_files_edited_since_indexing_invalidate_cached_answers(streaming_chain, tmp_path):
+    streaming_chain.answer_cache = AnswerCache(tmp_path, DeterministicFakeEmbedding(size=16))
+    path = tmp_path / "plan.py"
+    streaming_chain.doc_processor.content_store = index_file(path, "v1")
+    streaming_chain._get_relevant_files = MagicMock(return_value={"pkg/plan.py": "code"})
+    streaming_chain.model = GenericFakeChatModel(
+        messages=iter([AIMessage(content="old"), AIMessage(content="new")])
+    )
+    collect_events(streaming_chain, "Which code scores plans?")
+
+    # Edited on disk, but not re-indexed yet
+    path.write_text("def score():\n    return 2  # edited\n")
+    second = collect_events(streaming_chain, "Which code scores plans?")
+
+    assert second[-1]["stats"]["path"] == "local"
+    assert second[-1]["content"] == "new"
+
+
+def test_answers_without_sources_are_not_cached(streaming_chain, tmp_path):
+    streaming_chain.answer_cache = AnswerCache(tmp_path, DeterministicFakeEmbedding(size=16))
+    streaming_chain._get_relevant_files = MagicMock(return_value={})
+    streaming_chain.model = GenericFakeChatModel(
+        messages=iter([AIMessage(content="first"), AIMessage(content="second")])
+    )
+
+    collect_events(streaming_chain, "What is a fit score?")
+    second = collect_events(streaming_chain, "What is a fit score?")
+
+    assert second[-1]["stats"]["path"] == "local"
+    assert second[-1]["content"] == "second"
+
+
+class StubOllama:
+    """/api/chat answers that, like Ollama, only evaluate prompt tokens past
+    the prefix shared with the previous request (plus its answer)."""
+
+    def __init__(self, http_stub):
+        self.prompt_eval_counts = []
+        self._cached: list[str] = []
+        self.stub = http_stub(self.respond)
+        self.url = self.stub.url
+        self.requests = self.stub.requests
+
+    def respond(self, body: dict, index: int) -> tuple[int, str, bytes]:
+        tokens = [
+            token
+            for message in body["messages"]
+            for token in [f"<{message['role']}>", *message["content"].split()]
+        ]
+        shared = 0
+        while (
+            shared < min(len(tokens), len(self._cached))
+            and tokens[shared] == self._cached[shared]
+        ):
+            shared += 1
+        answer = f"answer {index + 1}"
+        self._cached = tokens + ["<assistant>", *answer.split()]
+        self.prompt_eval_counts.append(len(tokens) - shared)
+
+        lines = [
+            {"model": body["model"], "created_at": "2024-01-01T00:00:00Z",
+             "message": {"role": "assistant", "content": answer}, "done": False},
+            {"model": body["model"], "created_at": "2024-01-01T00:00:00Z",
+             "message": {"role": "assistant", "content": ""}, "done": True,
+             "done_reason": "stop", "prompt_eval_count": len(tokens) - shared,
+             "prompt_eval_duration": (len(tokens) - shared) * 1000,
+             "eval_count": 2, "eval_duration": 1000},
+        ]
+        payload = "".join(json.dumps(line) + "\n" for line in lines).encode()
+        return 200, "application/x-ndjson", payload
+
+
+def test_follow_up_turns_reuse_the_cached_prompt_prefix(streaming_chain, http_stub):
+    stub = StubOllama(http_stub)
+    streaming_chain.model = ChatOllama(model="stub", base_url=stub.url, keep_alive="30m")
+    streaming_chain.project_description = " ".join(f"word{i}" for i in range(300))
+    code = {"first": "=== a.py ===\nx = 1\n", "second": "=== b.py ===\ny = 2\n"}
+    streaming_chain._get_code_context = lambda question, route=None: [
+        code[question.split()[0]]
+    ]
+
+    first = collect_events(streaming_chain, "first question about a.py")
+    second = collect_events(streaming_chain, "second question about b.py")
+
+    assert [r["keep_alive"] for r in stub.requests] == ["30m", "30m"]
+    total, follow_up = stub.prompt_eval_counts
+    assert total > 300
+    assert follow_up < 40
+    assert second[-1]["stats"]["prefill"]["local_pass"]["tokens"] == follow_up
+    assert first[-1]["content"] == "answer 1"
+    # The second prompt carries the first turn as plain chat messages
+    roles = [m["role"] for m in stub.requests[1]["messages"]]
+    assert roles == ["system", "user", "assistant", "user"]
+    assert stub.requests[1]["messages"][1]["content"] == "first question about a.py"
+
+
+def test_summary_of_evicted_turns_leads_the_history(streaming_chain):
+    streaming_chain.chat_context.max_messages = 4
+    for i in range(5):
+        streaming_chain.chat_context.add_message("user", f"question {i}")
+
+    inputs = streaming_chain._pack_inputs(
+        streaming_chain.conversation_prompt, "next question"
+    )
+    history = inputs["chat_history"]
+
+    assert history[0].type == "system"
+    assert "question 2" in history[0].content
+    assert [m.content for m in history[1:]] == ["question 3", "question 4"]
+
+
+def test_reasoning_splitter_handles_tags_split_across_chunks():
+    splitter = ReasoningSplitter()
+    chunks = ["<th", "ink>\nweigh ", "options</th", "ink>\n\nUse ", "X"]
+    outputs = [splitter.feed(chunk) for chunk in chunks]
+    outputs.append(splitter.flush())
+
+    assert "".join(r for r, _ in outputs) == "weigh options"
+    assert "".join(a for _, a in outputs) == "Use X"
+
+
+def test_stream_keeps_reasoning_out_of_history(streaming_chain):
+    streaming_chain.model = GenericFakeChatModel(
+        messages=iter(
+            [AIMessage(content="<think>\nThe user wants a greeting.\n</think>\n\nHello there")]
+        )
+    )
+    events = collect_events(streaming_chain, "say hello")
+
+    reasoning = "".join(e["content"] for e in events if e["type"] == "reasoning")
+    answer = "".join(e["content"] for e in events if e["type"] == "delta")
+    assert reasoning.strip() == "The user wants a greeting."
+    assert answer == "Hello there"
+    assert events[-1]["content"] == "Hello there"
+    assert events[-1]["reasoning"] == "The user wants a greeting."
+    stored = streaming_chain.chat_context.messages[-1]
+    assert stored.content == "Hello there"
+    assert stored.reasoning == "The user wants a greeting."
+
+
+def test_keyword_web_decision_prefetches_but_local_pass_answers(streaming_chain):
+    streaming_chain.router = MagicMock()
+    streaming_chain.router.route.return_value = Route(needs_code=False, needs_web=True)
+    streaming_chain.model = GenericFakeChatModel(
+        messages=iter([AIMessage(content="Local answer")])
+    )
+    events = collect_events(streaming_chain, "what is the newest pandas release?")
+
+    assert events[-1]["content"] == "Local answer"
+    stats = events[-1]["stats"]
+    assert stats["path"] == "local"
+    assert stats["route"]["web"] is True
+    assert "local_pass" in stats["stages"]
+    # The search was started early, in case the local pass asked for it
+    streaming_chain.web_searcher.asearch.assert_called_once()
+
+
+def test_keyword_web_decision_results_serve_the_sentinel(streaming_chain):
+    streaming_chain.router = MagicMock()
+    streaming_chain.router.route.return_value = Route(needs_code=False, needs_web=True)
+    streaming_chain.model = GenericFakeChatModel(
+        messages=iter([AIMessage(content="NEED_WEB_SEARCH"), AIMessage(content="Web answer")])
+    )
+    events = collect_events(streaming_chain, "what is the newest pandas release?")
+
+    assert events[-1]["content"] == "Web answer"
+    assert events[-1]["stats"]["path"] == "web"
+    streaming_chain.web_searcher.asearch.assert_awaited_once()
+
+
+def test_classifier_web_decision_skips_the_local_pass(streaming_chain):
+    streaming_chain.router = MagicMock()
+    streaming_chain.router.route.return_value = Route(
+        needs_code=False, needs_web=True, source="embedding"
+    )
+    streaming_chain.model = GenericFakeChatModel(messages=iter([AIMessage(content="Web answer")]))
+    events = collect_events(streaming_chain, "what is the newest pandas release?")
+
+    # Nothing is drafted locally, so there is nothing to reset
+    assert events[0]["type"] == "status"
+    assert {e["type"] for e in events} == {"status", "delta", "done"}
+    assert events[-1]["content"] == "Web answer"
+    stats = events[-1]["stats"]
+    assert stats["path"] == "web"
+    assert "local_pass" not in stats["stages"]
+    streaming_chain.web_searcher.asearch.assert_awaited_once()
+
+
+def test_classifier_web_decision_skips_the_local_pass_when_not_streaming(streaming_chain):
+    streaming_chain.router = MagicMock()
+    streaming_chain.router.route.return_value = Route(
+        needs_code=False, needs_web=True, source="model"
+    )
+    streaming_chain.model = GenericFakeChatModel(messages=iter([AIMessage(content="Web answer")]))
+
+    answer = streaming_chain.process_response({"question": "what is the newest pandas release?"})
+
+    assert answer == "Web answer"
+    streaming_chain.web_searcher.search.assert_called_once()
+
+
+def test_failed_stream_still_answers_the_question_in_history(streaming_chain):
+    def broken():
+        raise RuntimeError("model went away")
+        yield
+
+    streaming_chain.model = GenericFakeChatModel(messages=broken())
+
+    with pytest.raises(RuntimeError):
+        collect_events(streaming_chain, "what is this project?")
+
+    roles = [m.role for m in streaming_chain.chat_context.messages]
+    assert roles == ["user", "assistant"]
+    assert "No response" in streaming_chain.chat_context.messages[-1].content
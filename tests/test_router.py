@@ -0,0 +1,95 @@
+import hashlib
+from pathlib import Path
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from src.router import EmbeddingRouter, KeywordRouter, ModelRouter, Route, load_examples
+
+
+class WordEmbeddings(Embeddings):
+    """Bag-of-words vectors, so questions sharing words are similar."""
+
+    def embed_query(self, text):
+        vector = [0.0] * 64
+        for word in text.lower().replace("?", "").split():
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % 64] += 1.0
+        return vector
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+def test_keyword_router_needs_previous_message_for_follow_up():
+    router = KeywordRouter()
+
+    assert router.route("Which function computes the score?").needs_code
+    assert not router.route("What is Medicare?").needs_code
+    assert not router.route("Why does it do that?").follow_up
+    assert router.route("Why does it do that?", previous="What is x?").follow_up
+
+
+def test_embedding_router_picks_the_closer_examples():
+    examples = {
+        "code": (
+            ["which function computes the score", "where is the loader class"],
+            ["hello how are you", "what is the weather like"],
+        ),
+        "web": (
+            ["latest release news today", "newest version released"],
+            ["which function computes the score", "hello how are you"],
+        ),
+    }
+    router = EmbeddingRouter(WordEmbeddings(), examples, top_k=1)
+
+    code = router.route("Which function computes the premium score?")
+    web = router.route("What is the newest version released?")
+
+    assert code.needs_code and not code.needs_web
+    assert web.needs_web and not web.needs_code
+    assert code.source == "embedding"
+
+
+def test_embedding_router_keeps_keyword_signals():
+    examples = {
+        "code": (["where is the loader class"], ["hello how are you"]),
+        "follow_up": (["tell me more"], ["where is the loader class"]),
+    }
+    router = EmbeddingRouter(WordEmbeddings(), examples, top_k=1)
+
+    routed = router.route("hello, how are you fixing this bug?", previous="hi")
+
+    assert routed.needs_code and routed.follow_up
+
+
+def test_shipped_router_examples_load():
+    examples = load_examples(Path(__file__).parent.parent / "router_examples.yaml")
+
+    assert set(examples) == {"code", "web", "follow_up"}
+    assert all(positive and negative for positive, negative in examples.values())
+
+
+def test_model_router_parses_json_and_falls_back_to_keywords():
+    model = GenericFakeChatModel(
+        messages=iter(
+            [
+                AIMessage(content='{"code": false, "web": true, "follow_up": true}'),
+                AIMessage(content="I think you need code"),
+            ]
+        )
+    )
+    router = ModelRouter(model)
+
+    routed = router.route("What changed in pandas 3?", previous="hi")
+    fallback = router.route("Which function computes the score?")
+
+    assert (routed.needs_code, routed.needs_web, routed.follow_up) == (False, True, True)
+    assert routed.source == "model"
+    assert fallback.needs_code and fallback.source == "keywords"
+
+
+def test_only_classifier_web_decisions_skip_the_local_pass():
+    assert Route(needs_code=False, needs_web=True, source="embedding").web_only
+    assert Route(needs_code=False, needs_web=True, source="model").web_only
+    assert not Route(needs_code=False, needs_web=True).web_only
+    assert not Route(needs_code=True, source="model").web_only
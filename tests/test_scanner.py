@@ -0,0 +1,64 @@
+import pytest
+from pathlib import Path
+from src.scanner import IgnoreRules, scan_directory
+import tempfile
+
+
+@pytest.fixture
+def temp_dir():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        create_test_files(tmpdirname)
+        yield tmpdirname
+
+
+def create_test_files(temp_dir):
+    test_files = {
+        "app.py": "print('app')",
+        "README.md": "# Readme",
+        "notes.log": "not indexed",
+        ".gitignore": "generated/\n*.tmp.py\n!keep.tmp.py\n",
+        "generated/output.py": "x = 1",
+        "scratch.tmp.py": "x = 2",
+        "keep.tmp.py": "x = 3",
+        ".venv/lib/site.py": "x = 4",
+        "node_modules/pkg/index.txt": "x",
+        "pkg/.gitignore": "/local.py\n",
+        "pkg/local.py": "x = 5",
+        "pkg/sub/local.py": "x = 6",
+        "big.txt": "x" * 2048,
+    }
+    for filepath, content in test_files.items():
+        full_path = Path(temp_dir) / filepath
+        full_path.parent.mkdir(parents=True, exist_ok=True)
+        full_path.write_text(content)
+
+
+def scanned_paths(root, **kwargs):
+    return sorted(f.relative_path for f in scan_directory(root, **kwargs))
+
+
+def test_scan_honours_gitignore_and_defaults(temp_dir):
+    paths = scanned_paths(temp_dir, suffixes={".py", ".md", ".txt"})
+    assert paths == ["README.md", "app.py", "big.txt", "keep.tmp.py", "pkg/sub/local.py"]
+
+
+def test_scan_applies_excludes_and_size_limit(temp_dir):
+    paths = scanned_paths(
+        temp_dir, suffixes={".py", ".txt"}, exclude=["pkg/"], max_file_size=1024
+    )
+    assert paths == ["app.py", "keep.tmp.py"]
+
+
+def test_scan_can_ignore_gitignore(temp_dir):
+    paths = scanned_paths(temp_dir, suffixes={".py"}, use_gitignore=False)
+    assert "generated/output.py" in paths
+    assert ".venv/lib/site.py" not in paths
+
+
+def test_ignore_rules_patterns():
+    rules = IgnoreRules(["docs/*.md", "**/fixtures", "build/", "!build/keep"])
+    assert rules.is_ignored("docs/intro.md", is_dir=False)
+    assert not rules.is_ignored("docs/deep/intro.md", is_dir=False)
+    assert rules.is_ignored("a/b/fixtures", is_dir=True)
+    assert rules.is_ignored("build", is_dir=True)
+    assert not rules.is_ignored("build", is_dir=False)
@@ -0,0 +1,131 @@
+import asyncio
+import pytest
+from src.scheduler import InferenceScheduler, QueueFullError
+
+
+def test_limits_concurrent_requests():
+    scheduler = InferenceScheduler(max_concurrent=2)
+    running = 0
+    peak = 0
+
+    async def request(session_id):
+        nonlocal running, peak
+        async with scheduler.slot(session_id):
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    async def run():
+        await asyncio.gather(*(request(f"s{i}") for i in range(6)))
+
+    asyncio.run(run())
+    assert peak == 2
+    assert scheduler.stats()["running"] == 0
+    assert scheduler.stats()["queued"] == 0
+
+
+def test_sessions_are_served_round_robin():
+    scheduler = InferenceScheduler(max_concurrent=1)
+    served = []
+
+    async def request(session_id, label):
+        async with scheduler.slot(session_id):
+            served.append(label)
+            await asyncio.sleep(0)
+
+    async def run():
+        blocker = asyncio.Event()
+
+        async def hold():
+            async with scheduler.slot("busy"):
+                await blocker.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        tasks = [
+            asyncio.create_task(request("a", "a1")),
+            asyncio.create_task(request("a", "a2")),
+            asyncio.create_task(request("a", "a3")),
+            asyncio.create_task(request("b", "b1")),
+        ]
+        await asyncio.sleep(0)
+        blocker.set()
+        await asyncio.gather(holder, *tasks)
+
+    asyncio.run(run())
+    assert served == ["a1", "b1", "a2", "a3"]
+
+
+def test_reports_queue_position():
+    scheduler = InferenceScheduler(max_concurrent=1)
+    positions = []
+
+    async def run():
+        release = asyncio.Event()
+
+        async def hold():
+            async with scheduler.slot("first"):
+                await release.wait()
+
+        async def report(position):
+            positions.append(position)
+
+        async def waiter():
+            async with scheduler.slot("second", on_position=report):
+                pass
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(waiter())
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(holder, queued)
+
+    asyncio.run(run())
+    assert positions == [1]
+
+
+def test_rejects_when_queue_is_full():
+    scheduler = InferenceScheduler(max_concurrent=1, max_queue=1)
+
+    async def run():
+        release = asyncio.Event()
+
+        async def hold(session_id):
+            async with scheduler.slot(session_id):
+                await release.wait()
+
+        tasks = [asyncio.create_task(hold("a")), asyncio.create_task(hold("b"))]
+        await asyncio.sleep(0)
+        with pytest.raises(QueueFullError):
+            async with scheduler.slot("c"):
+                pass
+        release.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+
+
+def test_cancelled_waiter_leaves_queue():
+    scheduler = InferenceScheduler(max_concurrent=1)
+
+    async def run():
+        release = asyncio.Event()
+
+        async def hold(session_id):
+            async with scheduler.slot(session_id):
+                await release.wait()
+
+        holder = asyncio.create_task(hold("a"))
+        waiter = asyncio.create_task(hold("b"))
+        await asyncio.sleep(0)
+        assert scheduler.stats()["queued"] == 1
+
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert scheduler.stats()["queued"] == 0
+        release.set()
+        await holder
+
+    asyncio.run(run())
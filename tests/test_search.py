@@ -1,5 +1,9 @@
+import asyncio
+import json
+import time
+import httpx
 import pytest
-from src.search import WebSearcher
+from src.search import SearchCache, WebSearcher, split_query
 from dotenv import load_dotenv
 
 @pytest.fixture(scope="module")
@@ -37,4 +41,169 @@ def test_search_caching(web_searcher):
 @pytest.mark.skip(reason="Only run when testing error handling")
 def test_invalid_api_key():
     with pytest.raises(ValueError):
-        WebSearcher(api_key="invalid_key")
\ No newline at end of file
+        WebSearcher(api_key="invalid_key")
+
+def test_max_attempts_must_be_positive():
+    with pytest.raises(ValueError):
+        WebSearcher("key", max_attempts=0)
+
+class StandInSearch:
+    """Tavily-style /search answers, scripted per request or per query."""
+
+    def __init__(self, http_stub):
+        self.delays = []  # seconds to stall each successive request
+        self.statuses = []  # status to answer each successive request with
+        self.query_delays = {}  # seconds to stall requests for a query
+        self.results = {}  # results to answer a query with
+        self.stub = http_stub(self.respond)
+        self.url = self.stub.url
+
+    @property
+    def requests(self) -> list[str]:
+        return [body["query"] for body in self.stub.requests]
+
+    def respond(self, body: dict, index: int) -> tuple[int, str, bytes]:
+        if index < len(self.delays):
+            time.sleep(self.delays[index])
+        time.sleep(self.query_delays.get(body["query"], 0))
+        status = self.statuses[index] if index < len(self.statuses) else 200
+        results = self.results.get(
+            body["query"], [{"title": body["query"], "content": f"answer {index}"}]
+        )
+        return status, "application/json", json.dumps({"results": results}).encode()
+
+
+@pytest.fixture
+def stand_in(http_stub):
+    return StandInSearch(http_stub)
+
+
+def test_results_are_cached_on_disk_by_normalised_query(stand_in, tmp_path):
+    searcher = WebSearcher("key", stand_in.url, cache=SearchCache(tmp_path))
+    first = searcher.search("What is  Python?")
+    reopened = WebSearcher("key", stand_in.url, cache=SearchCache(tmp_path))
+
+    assert reopened.search("what is python") == first
+    assert stand_in.requests == ["What is  Python?"]
+
+
+def test_expired_results_are_fetched_again(stand_in, tmp_path):
+    searcher = WebSearcher("key", stand_in.url, cache=SearchCache(tmp_path, ttl_seconds=0.05))
+    searcher.search("python")
+    time.sleep(0.1)
+    searcher.search("python")
+
+    assert len(stand_in.requests) == 2
+
+
+def test_concurrent_identical_searches_share_one_request(stand_in):
+    stand_in.delays = [0.2]
+    searcher = WebSearcher("key", stand_in.url)
+
+    async def run():
+        try:
+            return await asyncio.gather(*(searcher.asearch("python") for _ in range(5)))
+        finally:
+            await searcher.aclose()
+
+    results = asyncio.run(run())
+
+    assert len(stand_in.requests) == 1
+    assert all(result == results[0] for result in results)
+
+
+def test_slow_request_is_hedged(stand_in):
+    stand_in.delays = [2.0]
+    searcher = WebSearcher("key", stand_in.url, hedge_after=0.1)
+    start = time.perf_counter()
+    results = searcher.search("python")
+
+    assert time.perf_counter() - start < 1.5
+    assert results[0]["content"] == "answer 1"
+
+
+def test_failed_requests_are_retried(stand_in):
+    stand_in.statuses = [503, 200]
+    assert WebSearcher("key", stand_in.url).search("python")[0]["content"] == "answer 1"
+
+    stand_in.statuses += [400]
+    with pytest.raises(httpx.HTTPStatusError):
+        WebSearcher("key", stand_in.url).search("other")
+    assert len(stand_in.requests) == 3
+
+
+def test_compound_question_is_split_into_sub_queries():
+    assert split_query("What is Medicare Part D and how are premiums set?") == [
+        "What is Medicare Part D and how are premiums set?",
+        "What is Medicare Part D",
+        "how are premiums set",
+    ]
+    assert split_query("Compare pandas and polars performance") == [
+        "Compare pandas and polars performance"
+    ]
+
+
+def test_sub_queries_run_concurrently(stand_in):
+    question = "What is Part D and how are premiums set?"
+    for query in (question, "What is Part D", "how are premiums set"):
+        stand_in.query_delays[query] = 0.4
+    searcher = WebSearcher("key", stand_in.url)
+
+    start = time.perf_counter()
+    results = searcher.research(question)
+
+    assert time.perf_counter() - start < 1.0
+    assert len(stand_in.requests) == 3
+    assert len(results) == 3
+
+
+def test_slow_sub_queries_are_dropped_at_the_deadline(stand_in):
+    stand_in.query_delays["how are premiums set"] = 2.0
+    searcher = WebSearcher("key", stand_in.url)
+
+    start = time.perf_counter()
+    results = searcher.research("What is Part D and how are premiums set?", deadline=0.5)
+
+    assert time.perf_counter() - start < 1.5
+    assert {r["title"] for r in results} == {
+        "What is Part D and how are premiums set?",
+        "What is Part D",
+    }
+
+
+def test_late_sub_queries_fill_the_cache_on_a_running_loop(stand_in, tmp_path):
+    stand_in.query_delays["how are premiums set"] = 0.5
+    cache = SearchCache(tmp_path)
+    searcher = WebSearcher("key", stand_in.url, cache=cache)
+
+    async def run():
+        try:
+            results = await searcher.aresearch(
+                "What is Part D and how are premiums set?", deadline=0.2
+            )
+            await asyncio.sleep(0.6)
+            return results
+        finally:
+            await searcher.aclose()
+
+    results = asyncio.run(run())
+
+    assert "how are premiums set" not in {r["title"] for r in results}
+    assert cache.get("how are premiums set") is not None
+
+
+def test_research_results_are_deduplicated(stand_in):
+    page = {"url": "https://www.cms.gov/part-d/", "title": "Part D", "content": "Drug plans"}
+    copy = {"url": "https://mirror.example/d", "title": "Copy", "content": "drug plans!"}
+    other = {"url": "https://example.com/premiums", "title": "Premiums", "content": "Set yearly"}
+    stand_in.results = {
+        "What is Part D and how are premiums set?": [page, other],
+        "What is Part D": [{**page, "url": "http://cms.gov/part-d#top"}, copy],
+        "how are premiums set": [other],
+    }
+
+    results = WebSearcher("key", stand_in.url).research(
+        "What is Part D and how are premiums set?"
+    )
+
+    assert [r["title"] for r in results] == ["Part D", "Premiums"]
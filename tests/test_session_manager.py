@@ -0,0 +1,159 @@
+import asyncio
+import time
+
+import pytest
+from src.session_manager import SessionLimitError, SessionManager
+
+
+class FakeSession:
+    def __init__(self, session_id, saved, size=100):
+        self.session_id = session_id
+        self.resumed = session_id in saved
+        self.size = size
+        self.saved = saved
+
+    def estimated_bytes(self):
+        return self.size
+
+    def close(self):
+        self.saved.add(self.session_id)
+
+
+def make_manager(saved, **kwargs):
+    return SessionManager(lambda session_id: FakeSession(session_id, saved), **kwargs)
+
+
+def test_idle_sessions_are_evicted_and_rehydrated():
+    saved = set()
+    manager = make_manager(saved, idle_ttl=0.05)
+
+    async def run():
+        first = await manager.acquire("a")
+        await manager.acquire("b")
+        manager.release(first)
+        await asyncio.sleep(0.1)
+        assert await manager.evict_idle() == 1
+        assert "a" not in manager and "b" in manager
+        assert saved == {"a"}
+
+        again = await manager.acquire("a")
+        assert again is not first and again.resumed
+
+    asyncio.run(run())
+    assert manager.stats()["rehydrated"] == 1
+    assert manager.stats()["connected"] == 2
+
+
+def test_caps_evict_least_recently_used_idle_sessions():
+    saved = set()
+    manager = make_manager(saved, max_sessions=2)
+
+    async def run():
+        a, b = [await manager.acquire(session_id) for session_id in ("a", "b")]
+        manager.release(a)
+        manager.release(b)
+        manager.touch(a)
+        await manager.acquire("c")
+        assert list(manager._entries) == ["a", "c"]
+
+        await manager.acquire("a")
+        with pytest.raises(SessionLimitError):
+            await manager.acquire("d")
+        await asyncio.gather(*manager._closing.values())
+
+    asyncio.run(run())
+    assert saved == {"b"}
+
+
+def test_memory_cap_evicts_idle_sessions():
+    saved = set()
+    manager = make_manager(saved, max_bytes=250)
+
+    async def run():
+        for session_id in ("a", "b"):
+            manager.release(await manager.acquire(session_id))
+        await manager.acquire("c")
+        await asyncio.gather(*manager._closing.values())
+
+    asyncio.run(run())
+    assert saved == {"a"}
+    assert manager.stats()["estimated_bytes"] == 200
+
+
+class SlowSession(FakeSession):
+    def close(self):
+        time.sleep(0.3)
+        super().close()
+
+
+def test_closing_a_session_does_not_block_others():
+    saved = set()
+    manager = SessionManager(lambda session_id: SlowSession(session_id, saved), idle_ttl=0)
+
+    async def run():
+        manager.release(await manager.acquire("a"))
+        sweep = asyncio.create_task(manager.evict_idle())
+        await asyncio.sleep(0.05)
+
+        start = time.perf_counter()
+        await manager.acquire("b")
+        assert time.perf_counter() - start < 0.2
+        # The evicted session is only handed out again once it is persisted
+        again = await manager.acquire("a")
+        assert "a" in saved and again.resumed
+        assert await sweep == 1
+
+    asyncio.run(run())
+
+
+def test_release_follows_a_rekeyed_session():
+    manager = make_manager(set())
+
+    async def run():
+        session = await manager.acquire("a")
+        assert await manager.acquire("a") is session  # a second socket
+        manager.rekey(session, "b")
+        manager.release(session)
+        manager.release(session)
+
+    asyncio.run(run())
+    assert list(manager._entries) == ["b"]
+    assert manager.stats()["connected"] == 0
+
+
+def test_reserved_ids_wait_for_the_switch():
+    saved = set()
+    manager = make_manager(saved)
+
+    async def run():
+        idle = await manager.acquire("b")
+        manager.release(idle)
+        session = await manager.acquire("a")
+
+        assert await manager.reserve("b")
+        assert "b" in saved and "b" not in manager  # persisted and dropped
+        assert not await manager.reserve("b")
+
+        # Another socket asking for "b" now gets the session switching to it
+        other = asyncio.create_task(manager.acquire("b"))
+        await asyncio.sleep(0.01)
+        assert not other.done()
+        manager.rekey(session, "b")
+        assert await other is session
+
+    asyncio.run(run())
+    assert list(manager._entries) == ["b"]
+
+
+def test_connected_sessions_cannot_be_reserved_or_overwritten():
+    manager = make_manager(set())
+
+    async def run():
+        first = await manager.acquire("a")
+        second = await manager.acquire("b")
+        assert not await manager.reserve("b")
+        with pytest.raises(ValueError):
+            manager.rekey(first, "b")
+        assert manager.get("a") is first and manager.get("b") is second
+
+    asyncio.run(run())
@@ -0,0 +1,98 @@
+import base64
+import json
+import os
+import time
+import zlib
+from datetime import datetime
+
+import pytest
+from src.history import ChatContext, Message
+from src.session_store import SessionJournal, encode_page, list_sessions
+
+
+def test_messages_are_journaled_as_added_and_paged_back(tmp_path):
+    journal = SessionJournal(tmp_path, "s1", model_name="m")
+    context = ChatContext(max_messages=4, journal=journal)
+    for i in range(10):
+        context.add_message("user" if i % 2 == 0 else "assistant", f"m{i}")
+
+    # A fresh reader sees everything without an explicit save
+    reopened = SessionJournal(tmp_path, "s1")
+    assert len(reopened) == 10
+    assert reopened.model_name == "m"
+    assert [m.content for m in reopened.page(2, 3)] == ["m2", "m3", "m4"]
+    assert [m.content for m in reopened.tail(2)] == ["m8", "m9"]
+    assert reopened.summary == context.get_summary() != ""
+
+
+def test_trailing_records_are_synced_after_the_interval(tmp_path, monkeypatch):
+    synced = []
+    monkeypatch.setattr(os, "fsync", synced.append)
+    journal = SessionJournal(tmp_path, "s1", sync_every=100, sync_interval=0.05)
+
+    journal.append(Message("user", "last words"))
+    assert synced == []
+    time.sleep(0.3)
+
+    assert len(synced) == 1
+    journal.close()
+    assert len(synced) == 1  # nothing left to sync
+
+
+def test_clear_and_snapshot_compact_the_journal(tmp_path):
+    journal = SessionJournal(tmp_path, "s1")
+    for i in range(5):
+        journal.append(Message("user", f"old {i}"))
+    journal.clear()
+    journal.append(Message("user", "new", reasoning="why"))
+
+    assert not journal.snapshot(min_dead=100)
+    assert journal.snapshot(min_dead=1)
+    assert len(journal.path.read_text().splitlines()) == 2  # header and message
+
+    reopened = SessionJournal(tmp_path, "s1")
+    assert [(m.content, m.reasoning) for m in reopened.page(0, 10)] == [("new", "why")]
+    journal.append(Message("assistant", "after snapshot"))
+    assert len(SessionJournal(tmp_path, "s1")) == 2
+
+
+def test_torn_final_line_is_dropped(tmp_path):
+    journal = SessionJournal(tmp_path, "s1", start_time=datetime(2024, 1, 2))
+    journal.append(Message("user", "kept"))
+    journal.close()
+    with open(journal.path, "ab") as f:
+        f.write(b'{"type": "message", "role": "us')
+
+    reopened = SessionJournal(tmp_path, "s1")
+    reopened.append(Message("assistant", "next"))
+
+    assert reopened.start_time == datetime(2024, 1, 2)
+    assert [m.content for m in SessionJournal(tmp_path, "s1").page(0, 5)] == ["kept", "next"]
+
+
+def test_sessions_are_listed_from_their_headers(tmp_path):
+    for session_id in ("older", "newer"):
+        SessionJournal(tmp_path, session_id, model_name="m").append(Message("user", "hi"))
+    SessionJournal(tmp_path, "empty")  # never written, so never listed
+    older = tmp_path / "session_older.jsonl"
+    os.utime(older, (older.stat().st_atime, older.stat().st_mtime - 60))
+
+    sessions = list_sessions(tmp_path)
+
+    assert [s["session_id"] for s in sessions] == ["newer", "older"]
+    assert sessions[0]["model_name"] == "m"
+    with pytest.raises(ValueError):
+        SessionJournal(tmp_path, "../escape")
+
+
+def test_large_pages_are_deflated():
+    messages = [Message("assistant", "word " * 100) for _ in range(5)]
+
+    small = encode_page(messages[:1], compress_min_bytes=10_000)
+    large = encode_page(messages, compress_min_bytes=1024)
+
+    assert small["messages"][0]["content"] == messages[0].content
+    assert large["encoding"] == "deflate"
+    records = json.loads(zlib.decompress(base64.b64decode(large["data"])))
+    assert [r["content"] for r in records] == [m.content for m in messages]
+    assert len(large["data"]) < len(json.dumps(records)) / 4
@@ -0,0 +1,61 @@
+from src.symbols import extract_symbols, render_symbols
+
+SOURCE = '''import os
+
+
+class Parser(Base):
+    """Parses things."""
+
+    strict = True
+
+    @property
+    def name(self) -> str:
+        return "parser"
+
+    async def parse(self, text, *, limit=10):
+        """Parse some text."""
+        return text[:limit]
+
+
+def helper(x):
+    return x
+'''
+
+
+def test_extract_symbols():
+    symbols = {symbol.qualname: symbol for symbol in extract_symbols(SOURCE, "pkg/parse.py")}
+
+    assert list(symbols) == ["Parser", "Parser.name", "Parser.parse", "helper"]
+    assert symbols["Parser"].kind == "class"
+    assert symbols["Parser"].signature == "Parser(Base)"
+    assert symbols["Parser"].docstring == "Parses things."
+    assert symbols["Parser.name"].kind == "method"
+    assert symbols["Parser.name"].signature == "Parser.name(self) -> str"
+    # Decorators are part of the span
+    assert (symbols["Parser.name"].start_line, symbols["Parser.name"].end_line) == (9, 11)
+    assert symbols["Parser.parse"].parent_line == 4
+    assert symbols["helper"].kind == "function"
+    assert symbols["helper"].id == "pkg/parse.py::helper"
+
+
+def test_extract_symbols_ignores_syntax_errors():
+    assert extract_symbols("def broken(:\n", "broken.py") == []
+
+
+def test_render_method_under_class_header():
+    symbols = {symbol.qualname: symbol for symbol in extract_symbols(SOURCE, "parse.py")}
+    rendered = render_symbols(SOURCE, [symbols["Parser.parse"]])
+
+    assert "class Parser(Base):" in rendered
+    assert "return text[:limit]" in rendered
+    assert "helper" not in rendered
+    assert 'return "parser"' not in rendered
+
+
+def test_render_class_as_outline():
+    symbols = {symbol.qualname: symbol for symbol in extract_symbols(SOURCE, "parse.py")}
+    rendered = render_symbols(SOURCE, [symbols["Parser"]])
+
+    assert "strict = True" in rendered
+    assert "async def parse(self, text, *, limit=10):" in rendered
+    assert "return text[:limit]" not in rendered